@@ -0,0 +1,183 @@
+"""Compare the previous multi-pass data docs index update with the single-pass one in update_gx_data_docs.
+
+The synthetic index page is rendered by GX's own SiteIndexPageRenderer, with one expectation suite and one validation
+result per table, so its size grows with --tables just like a real data docs site.
+
+Usage: python src/py/benchmarks/bench_data_docs_index.py [--tables 100 1000 5000] [--repeat 3]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+from datetime import timezone
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+from great_expectations.render.renderer.site_index_page_renderer import SiteIndexPageRenderer
+from great_expectations.render.view import DefaultJinjaIndexPageView
+from jinja2 import Environment
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_gx_data_docs  # noqa: E402
+
+CURRENT_DATE_STR = datetime.now().strftime("%Y%m%d")
+
+
+def render_synthetic_index(input_tables):
+    """Render a GX data docs index page listing an expectation suite & a validation result for each table."""
+    run_time = datetime.now(timezone.utc)
+    index_links_dict = {
+        "site_name": "local_site",
+        "expectations_links": [
+            {"expectation_suite_name": f"{CURRENT_DATE_STR}_{table}", "filepath": f"expectations/{table}.html"}
+            for table in input_tables
+        ],
+        "validations_links": [
+            {
+                "validation_success": True,
+                "run_time": run_time,
+                "run_name": run_time.strftime("%Y%m%dT%H%M%S.%fZ"),
+                "batch_identifier": f"{table}-batch",
+                "batch_kwargs": {},
+                "batch_spec": {},
+                "expectation_suite_name": f"{CURRENT_DATE_STR}_{table}",
+                "expectation_suite_filepath": f"expectations/{table}.html",
+                "filepath": f"validations/{table}.html",
+                "asset_name": table,
+            }
+            for table in input_tables
+        ],
+    }
+    return DefaultJinjaIndexPageView().render(SiteIndexPageRenderer.render(index_links_dict))
+
+
+def legacy_update_index_page(index_file_path, template_file_path, input_tables):
+    """A condensed copy of the previous implementation: 3 prettify passes, whole-document regexes & a Jinja render
+    of the whole page, with the index read & written 6 times."""
+
+    def prettify_html(file_path):
+        with open(file_path, encoding="utf-8") as file:
+            prettified_html = BeautifulSoup(file.read(), "html.parser").prettify()
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(prettified_html)
+        return prettified_html
+
+    prettified_html = prettify_html(index_file_path)
+
+    html_pattern = r"</script>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*</div>\s*<footer>\s*<p>\s*Stay current on everything GX with our newsletter"  # noqa
+    js_pattern = r'\$\(document\)\.ready\(function\(\)\s*\{\s*\$\("#section-1-content-block-2-2-body-table"\)\.on\(\'click-row\.bs\.table\',\s*function\(e,\s*row,\s*\$element\)\s*\{\s*window\.location\s*=\s*\$element\.data\("href"\);\s*\}\)\s*}\s*\);\s*'  # noqa
+    assert re.search(html_pattern, prettified_html, re.DOTALL)
+    assert re.search(js_pattern, prettified_html, re.DOTALL)
+    assert re.search(js_pattern + html_pattern, prettified_html, re.DOTALL)
+
+    with open(
+        os.path.join(update_gx_data_docs.TEMPLATES_DIR, update_gx_data_docs.PROFILING_RESULTS_TAB_TEMPLATE)
+    ) as file:
+        target_html = (
+            '$(document).ready(function() {\n  $("#section-1-content-block-2-2-body-table").on('
+            "'click-row.bs.table', function(e, row, $element) {\n    window.location = $element.data(\"href\");\n  })\n"
+            "});\n</script>\n</div>\n"
+            + file.read()
+            + "</div>\n" * 8
+            + "<footer>\n<p>Stay current on everything GX with our newsletter"
+        )
+    updated_html = re.sub(js_pattern + html_pattern, lambda match: target_html, prettified_html, flags=re.DOTALL)
+
+    for file_path in [index_file_path, template_file_path]:
+        with open(file_path, "w") as file:
+            file.write(updated_html)
+        prettify_html(file_path)
+
+    with open(template_file_path) as file:
+        jinja_template = Environment(autoescape=True).from_string(file.read())
+    with open(index_file_path, "w") as file:
+        file.write(
+            jinja_template.render(input_tables=input_tables, current_data_str=CURRENT_DATE_STR, profile_dates={})
+        )
+
+    with open(index_file_path) as file:
+        content = file.read()
+    tab_pattern = r'<li class="nav-item">\s*<a\s*aria-controls="Expectation-Suites"\s*aria-selected="false"\s*class="nav-link"\s*data-toggle="tab"\s*href="#Expectation-Suites"\s*id="Expectation-Suites-tab"\s*role="tab">\s*Expectation Suites\s*</a>\s*</li>'  # noqa
+    assert re.search(tab_pattern, content, re.DOTALL)
+    with open(index_file_path, "w") as file:
+        file.write(
+            re.sub(tab_pattern, lambda match: match.group() + update_gx_data_docs.PROFILING_RESULTS_NAV_ITEM, content)
+        )
+
+
+def single_pass_update_index_page(index_file_path, input_tables):
+    """update_gx_data_docs.update_index_page, without the config & run state lookups."""
+    profiling_results_tab_html = update_gx_data_docs.setup_jinja_template(
+        update_gx_data_docs.PROFILING_RESULTS_TAB_TEMPLATE
+    ).render(input_tables=input_tables, current_data_str=CURRENT_DATE_STR, profile_dates={})
+
+    with open(index_file_path, encoding="utf-8") as file:
+        index_html = file.read()
+
+    update_gx_data_docs.common.write_file_atomically(
+        index_file_path, update_gx_data_docs.add_profiling_results_tab(index_html, profiling_results_tab_html)
+    )
+
+
+def time_update(update_func, index_html, index_file_path, repeat):
+    """Return the best of repeat timings of update_func on a fresh copy of the index page, and its output."""
+    best_seconds = None
+    for _ in range(repeat):
+        with open(index_file_path, "w", encoding="utf-8") as file:
+            file.write(index_html)
+        start_time = perf_counter()
+        update_func()
+        elapsed_seconds = perf_counter() - start_time
+        best_seconds = elapsed_seconds if best_seconds is None else min(best_seconds, elapsed_seconds)
+
+    with open(index_file_path, encoding="utf-8") as file:
+        return best_seconds, file.read()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the data docs index page update.")
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    print(f"{'tables':>8} {'index size':>12} {'previous':>12} {'single-pass':>12} {'speed-up':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_file_path = os.path.join(tmp_dir, "index.html")
+        template_file_path = os.path.join(tmp_dir, "index.html.j2")
+
+        for table_count in args.tables:
+            input_tables = [f"table_{i:05d}" for i in range(table_count)]
+            index_html = render_synthetic_index(input_tables)
+
+            legacy_seconds, legacy_html = time_update(
+                lambda: legacy_update_index_page(index_file_path, template_file_path, input_tables),
+                index_html,
+                index_file_path,
+                args.repeat,
+            )
+            single_pass_seconds, single_pass_html = time_update(
+                lambda: single_pass_update_index_page(index_file_path, input_tables),
+                index_html,
+                index_file_path,
+                args.repeat,
+            )
+
+            # both should link every table's profiling results
+            for html in [legacy_html, single_pass_html]:
+                assert html.count("'_table_row_link_path': 'profiling_results/") == table_count
+
+            print(
+                f"{table_count:>8} {len(index_html) / 1e6:>10.1f}MB {legacy_seconds:>11.2f}s "
+                f"{single_pass_seconds:>11.2f}s {legacy_seconds / single_pass_seconds:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
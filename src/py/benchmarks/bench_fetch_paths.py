@@ -0,0 +1,104 @@
+"""Compare the tuple and Arrow fetch paths in snowflake_client on a synthetic cursor.
+
+Each fetch path runs in a freshly spawned process so that its peak RSS isn't masked by the other path.
+
+Usage: python src/py/benchmarks/bench_fetch_paths.py [--rows 200000] [--cols 50] [--batch-rows 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+from time import perf_counter
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snowflake_client  # noqa: E402
+
+
+class SyntheticCursor:
+    """Mimics a Snowflake cursor whose result set arrives in batches (like the connector's result chunks)."""
+
+    def __init__(self, rows, cols, batch_rows):
+        self.rows, self.cols, self.batch_rows = rows, cols, batch_rows
+        self.column_names = [f"COL_{i}" for i in range(cols)]
+        self.description = [(name,) for name in self.column_names]
+
+    def _batches(self):
+        rng = np.random.default_rng(0)
+        for start in range(0, self.rows, self.batch_rows):
+            n = min(self.batch_rows, self.rows - start)
+            arrays = []
+            for i in range(self.cols):
+                if i % 2:
+                    arrays.append(pa.array(rng.integers(0, 1_000_000, n)))
+                else:
+                    arrays.append(pa.array(rng.integers(0, 1000, n).astype(str)))
+            yield pa.Table.from_arrays(arrays, names=self.column_names)
+
+    def fetchall(self):
+        result = []
+        for batch in self._batches():
+            result.extend(zip(*(column.to_pylist() for column in batch.columns)))
+        return result
+
+    def fetch_arrow_batches(self):
+        return self._batches()
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_fetch_path(fetch_mode, rows, cols, batch_rows, queue):
+    cursor = SyntheticCursor(rows, cols, batch_rows)
+    rss_before = peak_rss_mb()
+
+    START_TIME = perf_counter()
+    df = snowflake_client.fetch_dataframe(cursor, fetch_mode)
+    ELAPSED_TIME = perf_counter() - START_TIME
+
+    queue.put(
+        {
+            "fetch_mode": fetch_mode,
+            "rows": len(df),
+            "elapsed_time": ELAPSED_TIME,
+            "rows_per_second": len(df) / ELAPSED_TIME,
+            "peak_rss_increase_mb": peak_rss_mb() - rss_before,
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--cols", type=int, default=50)
+    parser.add_argument("--batch-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    mp_context = multiprocessing.get_context("spawn")
+    results = []
+    for fetch_mode in ["tuples", "arrow"]:
+        queue = mp_context.Queue()
+        process = mp_context.Process(
+            target=run_fetch_path, args=(fetch_mode, args.rows, args.cols, args.batch_rows, queue)
+        )
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"{args.rows} rows x {args.cols} columns")
+    print(f"{'fetch_mode':<10} {'seconds':>10} {'rows/sec':>12} {'peak RSS +MB':>14}")
+    for result in results:
+        print(
+            f"{result['fetch_mode']:<10} {result['elapsed_time']:>10.2f} "
+            f"{result['rows_per_second']:>12,.0f} {result['peak_rss_increase_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""Run the load, profile, suite & docs stages end to end against a local SQLite stand-in for Snowflake.
+
+snowflake.connector.connect is replaced by a SQLite-backed connection (with an INFORMATION_SCHEMA.TABLES for the
+table metadata query), and the GX Snowflake datasource by a GX SQLite datasource of the same name, both loaded with
+synthetic dimension tables. Everything else - config.yaml's other_params, the connection pool, the GX context, the
+data docs - is the pipeline's own, in a temporary project directory.
+
+Reports throughput (tables/minute), each stage's latency & the process's peak RSS after it, and the per-table latency
+of each traced span (see tracing.py). With a stored baseline (--save-baseline), exits 1 if throughput, a stage's
+latency or peak RSS regress by more than --tolerance.
+
+Usage: python src/py/benchmarks/bench_pipeline.py [--tables 10] [--cols 20] [--rows 1000] [--max-workers 1]
+           [--repeat 1] [--tolerance 0.25] [--baseline PATH] [--save-baseline] [--verbose]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import types
+import uuid
+import webbrowser
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import yaml
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.constants import QueryStatus
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(SCRIPT_DIR)))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+import common  # noqa: E402
+import gxbulk  # noqa: E402
+import tracing  # noqa: E402
+
+DEFAULT_BASELINE_FILE = os.path.join(SCRIPT_DIR, "baselines", "bench_pipeline.json")
+DATABASE_FILE = "standin.db"
+INFORMATION_SCHEMA_FILE = "standin_information_schema.db"
+ARROW_BATCH_ROWS = 10_000
+# stage latencies that regress by less than this aren't reported, however large the relative change
+MIN_REGRESSION_SECONDS = 0.5
+
+
+class MedianAggregate:
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+class StdDevSampAggregate(MedianAggregate):
+    def finalize(self):
+        return statistics.stdev(self.values) if len(self.values) > 1 else None
+
+
+class StandInCursor:
+    """A SQLite cursor with the parts of the Snowflake cursor API that snowflake_client uses."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.sfqid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql):
+        self._cursor.execute(sql)
+        return self
+
+    def execute_async(self, sql):
+        # SQLite runs the query straight away - its results are left on the cursor for get_results_from_sfqid
+        self._cursor.execute(sql)
+        self.sfqid = str(uuid.uuid4())
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        pass
+
+    def describe(self, sql):
+        self._cursor.execute(f"SELECT * FROM ({sql}) LIMIT 0")
+        return [types.SimpleNamespace(name=desc[0]) for desc in self._cursor.description]
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetch_arrow_batches(self):
+        column_names = [desc[0] for desc in self.description]
+        while True:
+            rows = self._cursor.fetchmany(ARROW_BATCH_ROWS)
+            if not rows:
+                return
+            yield pa.Table.from_arrays([pa.array(column) for column in zip(*rows)], names=column_names)
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """A SQLite connection standing in for a Snowflake connection."""
+
+    def __init__(self, work_dir):
+        self._conn = sqlite3.connect(os.path.join(work_dir, DATABASE_FILE), check_same_thread=False)
+        self._conn.execute(
+            "ATTACH DATABASE ? AS INFORMATION_SCHEMA", (os.path.join(work_dir, INFORMATION_SCHEMA_FILE),)
+        )
+        self._conn.create_function("CURRENT_SCHEMA", 0, lambda: "PUBLIC")
+        # for the 'partitioned' profiler backend's hash partitions (with partition_by - SQLite has no HASH(*))
+        self._conn.create_function("HASH", -1, lambda *values: zlib.crc32(repr(values).encode()), deterministic=True)
+        self._conn.create_function("MOD", 2, lambda value, divisor: value % divisor, deterministic=True)
+        # for sql_validator's compiled suite queries ('sql' validation_engine)
+        self._conn.create_aggregate("MEDIAN", 1, MedianAggregate)
+        self._conn.create_aggregate("STDDEV_SAMP", 1, StdDevSampAggregate)
+        self._closed = False
+
+    def cursor(self):
+        return StandInCursor(self._conn.cursor())
+
+    def get_query_status_throw_if_error(self, sfqid):
+        return QueryStatus.SUCCESS
+
+    is_still_running = staticmethod(SnowflakeConnection.is_still_running)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._conn.close()
+        self._closed = True
+
+
+def build_dimension_table(rng, rows, cols):
+    """Build a synthetic dimension table: an ID, then int/float/string/date/bool attributes (~5% null) & 2 DWH_ audit
+    columns, which config.yaml's cols_to_exclude drops."""
+    columns = {"ID": np.arange(rows)}
+    for i in range(cols - 3):
+        kind = i % 5
+        if kind == 0:
+            values = rng.integers(0, 1000, rows).astype(object)
+        elif kind == 1:
+            values = rng.normal(100, 25, rows).round(2).astype(object)
+        elif kind == 2:
+            values = rng.choice([f"VALUE_{j}" for j in range(20)], rows).astype(object)
+        elif kind == 3:
+            values = (np.datetime64("2020-01-01") + rng.integers(0, 1500, rows)).astype(str).astype(object)
+        else:
+            values = rng.integers(0, 2, rows).astype(object)
+        values[rng.random(rows) < 0.05] = None
+        columns[f"{['QTY', 'AMOUNT', 'NAME', 'CREATED_DATE', 'IS_ACTIVE'][kind]}_{i}"] = values
+
+    columns["DWH_LOADED_AT"] = "2024-01-01 00:00:00"
+    columns["DWH_BATCH_ID"] = rng.integers(0, 100, rows)
+    return pd.DataFrame(columns)
+
+
+def create_standin_database(work_dir, input_tables, rows, cols):
+    """Load the synthetic tables into the SQLite database, with their metadata in INFORMATION_SCHEMA.TABLES & COLUMNS."""
+    rng = np.random.default_rng(0)
+    table_columns = {}
+    with sqlite3.connect(os.path.join(work_dir, DATABASE_FILE)) as conn:
+        for input_table in input_tables:
+            df = build_dimension_table(rng, rows, cols)
+            df.to_sql(input_table, conn, index=False)
+            table_columns[input_table] = list(df.columns)
+
+    with sqlite3.connect(os.path.join(work_dir, INFORMATION_SCHEMA_FILE)) as conn:
+        conn.execute("CREATE TABLE TABLES (TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED, ROW_COUNT, BYTES)")
+        conn.executemany(
+            "INSERT INTO TABLES VALUES ('PUBLIC', ?, '2024-01-01 00:00:00', ?, ?)",
+            [(input_table.upper(), rows, rows * cols * 8) for input_table in input_tables],
+        )
+        conn.execute("CREATE TABLE COLUMNS (TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, DATA_TYPE, ORDINAL_POSITION)")
+        conn.executemany(
+            "INSERT INTO COLUMNS VALUES ('PUBLIC', ?, ?, 'TEXT', ?)",
+            [
+                (input_table.upper(), column, position)
+                for input_table, columns in table_columns.items()
+                for position, column in enumerate(columns, 1)
+            ],
+        )
+
+
+def create_project(work_dir, input_tables, max_workers, verbose):
+    """Create the GX project, with a SQLite datasource in place of the Snowflake one, and its config.yaml - the
+    repo's other_params, for the synthetic tables. GX's progress bars are turned off, unless verbose."""
+    from great_expectations.data_context import FileDataContext
+    from great_expectations.data_context.types.base import ProgressBarsConfig
+
+    with open(os.path.join(PROJECT_DIR, "config.yaml")) as file:
+        config = yaml.safe_load(file)
+    config["input_tables"] = input_tables
+    config["other_params"]["max_workers"] = max_workers
+    with open(os.path.join(work_dir, "config.yaml"), "w") as file:
+        yaml.safe_dump(config, file)
+
+    context = FileDataContext.create(project_root_dir=work_dir)
+    if not verbose:
+        context.variables.progress_bars = ProgressBarsConfig(globally=False, profilers=False, metric_calculations=False)
+        context.variables.save_config()
+    # the batched checkpoint validates on several threads
+    context.sources.add_sqlite(
+        name=config["other_params"]["gx_data_src_name"],
+        connection_string=f"sqlite:///{os.path.join(work_dir, DATABASE_FILE)}?check_same_thread=false",
+    )
+
+
+def get_span_stats(report_file_path):
+    """Return each traced span's count, total & 95th percentile latency, from the run report."""
+    with open(report_file_path) as file:
+        spans = json.load(file)["spans"]
+
+    span_durations = {}
+    for record in spans:
+        span_durations.setdefault(record["span"], []).append(record["duration_seconds"])
+
+    return {
+        name: {
+            "count": len(durations),
+            "total_seconds": round(sum(durations), 3),
+            "p95_seconds": round(statistics.quantiles(durations, n=20)[-1] if len(durations) > 1 else durations[0], 3),
+        }
+        for name, durations in span_durations.items()
+    }
+
+
+def use_standin(work_dir, verbose):
+    """Make this (spawned) process's pipeline use the stand-in database in work_dir in place of Snowflake."""
+    if not verbose:
+        common.get_logger().setLevel(logging.WARNING)
+    os.environ.setdefault("GE_USAGE_STATS", "False")
+    for env_var in ["ACCOUNT", "USER", "PASSWORD", "DATABASE", "SCHEMA", "WAREHOUSE", "ROLE"]:
+        os.environ.setdefault(f"SNOWFLAKE_{env_var}", "benchmark")
+
+    import create_gx_data_profiler
+    import create_gx_expectation_suite
+    import snowflake.connector
+    from great_expectations.data_context.types.base import ConcurrencyConfig
+
+    snowflake.connector.connect = lambda **kwargs: StandInConnection(work_dir)
+    # this process was spawned, so make the pipeline's own process pools fork (rather than start from a server
+    # process) to inherit the stand-in
+    create_gx_data_profiler.PROCESS_START_METHOD = "fork"
+    webbrowser.open = lambda *args, **kwargs: True  # update_gx_data_docs opens the data docs
+    # GX shares one connection (a StaticPool) between every thread for SQLite, which deadlocks if validations run
+    # concurrently - so the batched checkpoint validates its tables in turn
+    create_gx_expectation_suite.ConcurrencyConfig = lambda **kwargs: ConcurrencyConfig(enabled=False)
+
+
+def run_pipeline(work_dir, table_count, cols, rows, max_workers, verbose):
+    """Spawned process: build the stand-in database & project in work_dir, then run & time each stage."""
+    use_standin(work_dir, verbose)
+    input_tables = [f"dim_bench_{i:03d}" for i in range(table_count)]
+    create_standin_database(work_dir, input_tables, rows, cols)
+    create_project(work_dir, input_tables, max_workers, verbose)
+    os.chdir(work_dir)
+
+    stages = {}
+    START_TIME = perf_counter()
+    for stage in gxbulk.PIPELINE:
+        stage_start_time = perf_counter()
+        try:
+            gxbulk.run_stage(stage, force=True)
+        except SystemExit:
+            raise RuntimeError(f"The '{stage}' stage failed - re-run with --verbose for its log.")
+        stages[stage] = {
+            "seconds": round(perf_counter() - stage_start_time, 3),
+            "peak_rss_mb": round(tracing.get_peak_rss_mb(), 1),
+        }
+    total_seconds = perf_counter() - START_TIME
+
+    return {
+        "total_seconds": round(total_seconds, 3),
+        "tables_per_minute": round(table_count / total_seconds * 60, 2),
+        "peak_rss_mb": round(tracing.get_peak_rss_mb(), 1),
+        "stages": stages,
+        "spans": get_span_stats(os.path.join(tracing.RUN_REPORTS_DIR, f"{tracing.RUN_ID}.json")),
+    }
+
+
+def run_in_fresh_process(args):
+    """Run the pipeline in a freshly spawned process & project directory, so runs don't share state or peak RSS."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            return executor.submit(
+                run_pipeline, work_dir, args.tables, args.cols, args.rows, args.max_workers, args.verbose
+            ).result()
+
+
+def find_regressions(result, baseline, tolerance):
+    """Return a description of each metric that is worse than the baseline's by more than tolerance."""
+    regressions = []
+    if result["tables_per_minute"] < baseline["tables_per_minute"] * (1 - tolerance):
+        regressions.append(
+            f"throughput: {result['tables_per_minute']} tables/min (baseline {baseline['tables_per_minute']})"
+        )
+    for stage, stage_result in result["stages"].items():
+        baseline_seconds = baseline["stages"].get(stage, {}).get("seconds")
+        if (
+            baseline_seconds is not None
+            and stage_result["seconds"] > baseline_seconds * (1 + tolerance)
+            and stage_result["seconds"] - baseline_seconds > MIN_REGRESSION_SECONDS
+        ):
+            regressions.append(f"{stage} stage: {stage_result['seconds']:.2f}s (baseline {baseline_seconds:.2f}s)")
+    if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS: {result['peak_rss_mb']:.0f}MB (baseline {baseline['peak_rss_mb']:.0f}MB)")
+
+    return regressions
+
+
+def print_result(result):
+    print(
+        f"{result['config']['tables']} tables x {result['config']['cols']} columns x {result['config']['rows']} rows "
+        f"(max_workers {result['config']['max_workers']}): {result['total_seconds']:.1f}s, "
+        f"{result['tables_per_minute']:.1f} tables/min, peak RSS {result['peak_rss_mb']:.0f}MB"
+    )
+    print(f"{'stage':<10} {'seconds':>10} {'peak RSS MB':>12}")
+    for stage, stage_result in result["stages"].items():
+        print(f"{stage:<10} {stage_result['seconds']:>10.2f} {stage_result['peak_rss_mb']:>12.0f}")
+    print(f"{'span':<12} {'count':>6} {'total s':>10} {'p95 s':>10}")
+    for name, span_stats in result["spans"].items():
+        print(
+            f"{name:<12} {span_stats['count']:>6} {span_stats['total_seconds']:>10.2f} "
+            f"{span_stats['p95_seconds']:>10.3f}"
+        )
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=10)
+    parser.add_argument("--cols", type=int, default=20, help="Columns per table (at least 4).")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs to make - the fastest is reported.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression, as a fraction.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline.")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log.")
+    args = parser.parse_args()
+    if args.cols < 4:
+        parser.error("--cols must be at least 4")
+
+    return args
+
+
+def main():
+    args = parse_arguments()
+    config = {"tables": args.tables, "cols": args.cols, "rows": args.rows, "max_workers": args.max_workers}
+
+    result = min((run_in_fresh_process(args) for _ in range(args.repeat)), key=lambda run: run["total_seconds"])
+    result = {"config": config, **result}
+    print_result(result)
+
+    if args.save_baseline:
+        common.write_file_atomically(args.baseline, json.dumps(result, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} - store one with --save-baseline.")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline["config"] != config:
+        print(f"Not compared: the baseline was run with {baseline['config']}.")
+        return
+
+    regressions = find_regressions(result, baseline, args.tolerance)
+    if regressions:
+        print(f"Regressions of more than {args.tolerance:.0%} against {args.baseline}:")
+        for regression in regressions:
+            print(f"    {regression}")
+        sys.exit(1)
+    print(f"No regressions of more than {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Run a sharded run (see gxshard.py) on several local worker processes, against bench_pipeline's SQLite stand-in.
+
+The tables are queued (gxshard init), run by --workers worker processes sharing the coordinator database - with the
+first worker killed --kill-after seconds after it claims a table, so the table's lease expires and is stolen by another
+worker - and their results merged (gxshard merge). Reports throughput (tables/minute) and fails if any table isn't
+done, or its suite & validation result aren't in the merged gx/.
+
+Usage: python src/py/benchmarks/bench_sharded.py [--tables 12] [--cols 8] [--rows 500] [--workers 3]
+           [--kill-after 5] [--lease-seconds 10] [--verbose]
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+from time import perf_counter
+from time import sleep
+
+import yaml
+from bench_pipeline import create_project
+from bench_pipeline import create_standin_database
+from bench_pipeline import use_standin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gxshard  # noqa: E402
+import shard_coordinator  # noqa: E402
+
+
+def run_gxshard(work_dir, argv, verbose):
+    """Spawned process: run a gxshard command in the project in work_dir, on the stand-in."""
+    use_standin(work_dir, verbose)
+    os.chdir(work_dir)
+    gxshard.main(argv)
+
+
+def run_in_process(work_dir, argv, verbose):
+    process = multiprocessing.get_context("spawn").Process(target=run_gxshard, args=(work_dir, argv, verbose))
+    process.start()
+    return process
+
+
+def create_sharded_project(work_dir, args):
+    input_tables = [f"dim_shard_{i:03d}" for i in range(args.tables)]
+    create_standin_database(work_dir, input_tables, args.rows, args.cols)
+    create_project(work_dir, input_tables, 1, args.verbose)
+
+    config_file_path = os.path.join(work_dir, "config.yaml")
+    with open(config_file_path) as file:
+        config = yaml.safe_load(file)
+    config["other_params"]["shard"] = {
+        **(config["other_params"].get("shard") or {}),
+        "lease_seconds": args.lease_seconds,
+        "claim_batch_size": 1,
+    }
+    with open(config_file_path, "w") as file:
+        yaml.safe_dump(config, file)
+
+    return input_tables
+
+
+def kill_after_first_claim(work_dir, worker, worker_id, kill_after):
+    """Kill the worker process kill_after seconds after it has leased its first table - so its lease expires."""
+    coordinator = shard_coordinator.ShardCoordinator(os.path.join(work_dir, "gx/uncommitted/shards"))
+    while worker.is_alive() and not any(
+        status == "leased" and lease_worker_id == worker_id
+        for status, lease_worker_id, _, _ in coordinator.get_status().values()
+    ):
+        sleep(0.2)
+    sleep(kill_after)
+    if worker.is_alive():
+        worker.kill()
+        print(f"Killed {worker_id} {kill_after}s after its first claim.")
+
+
+def print_worker_tables(table_status):
+    """Print each worker's count of tables - and of those, the tables retried after another worker's lease expired."""
+    print(f"{'worker':<10} {'tables':>7} {'retried':>8}")
+    for worker_id in sorted({worker_id for _, worker_id, _, _ in table_status.values()}):
+        worker_tables = [status for status in table_status.values() if status[1] == worker_id]
+        retried_count = sum(attempts > 1 for _, _, attempts, _ in worker_tables)
+        print(f"{worker_id:<10} {len(worker_tables):>7} {retried_count:>8}")
+
+
+def get_problems(input_tables, table_status, suites, validations, merge_failed=False):
+    """Return what's incomplete about the run: tables not done, a failed merge, and suites or validation results not
+    merged."""
+    problems = [
+        f"{input_table}: {status} ({error})"
+        for input_table, (status, _, _, error) in table_status.items()
+        if status != "done"
+    ]
+    if merge_failed:
+        problems.append("gxshard merge failed")
+    if len(suites) < len(input_tables):
+        problems.append(f"only {len(suites)} of {len(input_tables)} suites merged")
+    if len(validations) < len(input_tables):
+        problems.append(f"only {len(validations)} of {len(input_tables)} validation results merged")
+    return problems
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=12)
+    parser.add_argument("--cols", type=int, default=8, help="Columns per table (at least 4).")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument(
+        "--kill-after",
+        type=float,
+        default=5,
+        help="Seconds after its first claim that the first worker is killed (0 to not kill it).",
+    )
+    parser.add_argument("--lease-seconds", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own log.")
+    args = parser.parse_args()
+    if args.cols < 4:
+        parser.error("--cols must be at least 4")
+
+    return args
+
+
+def main():
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_tables = create_sharded_project(work_dir, args)
+
+        START_TIME = perf_counter()
+        init_process = run_in_process(work_dir, ["init"], args.verbose)
+        init_process.join()
+        if init_process.exitcode:
+            sys.exit("gxshard init failed - re-run with --verbose for its log.")
+
+        workers = [
+            run_in_process(work_dir, ["worker", "--worker-id", f"worker-{i}"], args.verbose)
+            for i in range(args.workers)
+        ]
+        if args.kill_after:
+            kill_after_first_claim(work_dir, workers[0], "worker-0", args.kill_after)
+        for worker in workers:
+            worker.join()
+        workers_seconds = perf_counter() - START_TIME
+
+        merge_process = run_in_process(work_dir, ["merge"], args.verbose)
+        merge_process.join()
+        total_seconds = perf_counter() - START_TIME
+
+        table_status = shard_coordinator.ShardCoordinator(os.path.join(work_dir, "gx/uncommitted/shards")).get_status()
+        suites = glob.glob(os.path.join(work_dir, "gx/expectations/*.json"))
+        validations = glob.glob(os.path.join(work_dir, "gx/uncommitted/validations/**/*.json"), recursive=True)
+
+    print(
+        f"{args.tables} tables x {args.cols} columns x {args.rows} rows on {args.workers} workers: "
+        f"{total_seconds:.1f}s ({workers_seconds:.1f}s until the workers finished), "
+        f"{args.tables / total_seconds * 60:.1f} tables/min"
+    )
+    print_worker_tables(table_status)
+
+    problems = get_problems(input_tables, table_status, suites, validations, merge_process.exitcode != 0)
+    if problems:
+        print("Sharded run incomplete:")
+        for problem in problems:
+            print(f"    {problem}")
+        sys.exit(1)
+    print(f"Every table done, and its suite & validation result merged ({len(validations)} validation results).")
+
+
+if __name__ == "__main__":
+    main()
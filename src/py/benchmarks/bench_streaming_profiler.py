@@ -0,0 +1,63 @@
+"""Compare the peak memory of materialising a sample (as the basic profiler does) with the streaming profiler's.
+
+Each run is made in a freshly spawned process, on bench_fetch_paths' synthetic cursor, so its peak RSS isn't masked by
+the other runs. The streaming profiler's peak RSS should stay flat as --rows grows.
+
+Usage: python src/py/benchmarks/bench_streaming_profiler.py [--rows 100000 400000 1600000] [--cols 20]
+           [--batch-rows 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from time import perf_counter
+
+from bench_fetch_paths import peak_rss_mb
+from bench_fetch_paths import SyntheticCursor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snowflake_client  # noqa: E402
+import streaming_profiler  # noqa: E402
+
+
+def run_profile_mode(mode, rows, cols, batch_rows, queue):
+    cursor = SyntheticCursor(rows, cols, batch_rows)
+    rss_before = peak_rss_mb()
+
+    START_TIME = perf_counter()
+    if mode == "materialised":
+        # the basic backend's sample: the whole result set, fetched into one DataFrame
+        snowflake_client.fetch_dataframe(cursor, "arrow")
+    else:
+        table_accumulator = streaming_profiler.TableAccumulator()
+        for df in snowflake_client.iter_dataframe_batches(cursor, "arrow"):
+            table_accumulator.update(df)
+        table_accumulator.build_profiling_results("synthetic_table")
+    ELAPSED_TIME = perf_counter() - START_TIME
+
+    queue.put({"mode": mode, "elapsed_time": ELAPSED_TIME, "peak_rss_increase_mb": peak_rss_mb() - rss_before})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 400_000, 1_600_000])
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--batch-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    mp_context = multiprocessing.get_context("spawn")
+    print(f"{args.cols} columns, {args.batch_rows} rows per batch")
+    print(f"{'rows':>10} {'mode':<13} {'seconds':>10} {'peak RSS +MB':>14}")
+    for rows in args.rows:
+        for mode in ["materialised", "streaming"]:
+            queue = mp_context.Queue()
+            process = mp_context.Process(target=run_profile_mode, args=(mode, rows, args.cols, args.batch_rows, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            print(f"{rows:>10} {mode:<13} {result['elapsed_time']:>10.2f} {result['peak_rss_increase_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
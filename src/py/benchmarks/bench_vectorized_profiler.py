@@ -0,0 +1,124 @@
+"""Compare BasicDatasetProfiler with the vectorized profiler on wide samples, and check that their stats agree.
+
+The synthetic sample's columns cycle through int, float (10% nulls), low-cardinality string & datetime columns.
+BasicDatasetProfiler evaluates its expectations one column & metric at a time, so it's slowest on wide tables.
+
+Usage: python src/py/benchmarks/bench_vectorized_profiler.py [--cols 200 400] [--rows 10000] [--top-k 10]
+"""
+import argparse
+import logging
+import math
+import os
+import sys
+import warnings
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from great_expectations.dataset.pandas_dataset import PandasDataset
+from great_expectations.profile.basic_dataset_profiler import BasicDatasetProfiler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vectorized_profiler  # noqa: E402
+
+# the expectations whose observed values both profilers report, and are compared
+COMPARED_EXPECTATION_TYPES = [
+    "expect_table_row_count_to_be_between",
+    "expect_column_unique_value_count_to_be_between",
+    "expect_column_proportion_of_unique_values_to_be_between",
+    "expect_column_min_to_be_between",
+    "expect_column_max_to_be_between",
+    "expect_column_mean_to_be_between",
+    "expect_column_stdev_to_be_between",
+    "expect_column_quantile_values_to_be_between",
+]
+
+
+def create_sample(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    string_values = np.array([f"value_{i}" for i in range(50)], dtype=object)
+    columns = {}
+    for i in range(cols):
+        if i % 4 == 0:
+            columns[f"int_{i}"] = rng.integers(0, 10_000, rows)
+        elif i % 4 == 1:
+            columns[f"float_{i}"] = np.where(rng.random(rows) < 0.1, np.nan, rng.normal(100, 15, rows))
+        elif i % 4 == 2:
+            columns[f"string_{i}"] = rng.choice(string_values, rows)
+        else:
+            columns[f"datetime_{i}"] = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 8760, rows), "h")
+
+    return pd.DataFrame(columns)
+
+
+def get_observed_values(validation_result):
+    """Return {(expectation type, column): observed value} of the compared expectations."""
+    observed_values = {}
+    for evr in validation_result.results:
+        expectation_config = evr.expectation_config
+        if expectation_config.expectation_type in COMPARED_EXPECTATION_TYPES:
+            key = (expectation_config.expectation_type, expectation_config.kwargs.get("column"))
+            observed_values[key] = evr.result.get("observed_value")
+
+    return observed_values
+
+
+def is_same(value, other_value):
+    if isinstance(value, dict):
+        return all(is_same(v, o) for v, o in zip(value["values"], other_value["values"]))
+    if isinstance(value, float) or isinstance(other_value, float):
+        return math.isclose(float(value), float(other_value), rel_tol=1e-9)
+    if isinstance(other_value, pd.Timestamp):
+        # BasicDatasetProfiler's results keep Timestamps - the vectorized profiler's are JSON serializable strings
+        return pd.Timestamp(value) == other_value
+    return value == other_value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cols", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    # BasicDatasetProfiler logs a line per column
+    logging.getLogger("great_expectations").setLevel(logging.WARNING)
+    warnings.filterwarnings("ignore")
+
+    print(f"{args.rows} rows")
+    print(f"{'cols':>6} {'basic s':>10} {'vectorized s':>13} {'speedup':>8} {'stats compared':>15} {'differ':>7}")
+    mismatches = []
+    for cols in args.cols:
+        df = create_sample(args.rows, cols)
+
+        START_TIME = perf_counter()
+        _, basic_result = PandasDataset(df).profile(BasicDatasetProfiler)
+        basic_seconds = perf_counter() - START_TIME
+
+        START_TIME = perf_counter()
+        _, vectorized_result = vectorized_profiler.profile_dataframe(df, "synthetic_table", args.top_k)
+        vectorized_seconds = perf_counter() - START_TIME
+
+        # BasicDatasetProfiler only reports some stats for some cardinalities, so only the stats both report
+        basic_values, vectorized_values = get_observed_values(basic_result), get_observed_values(vectorized_result)
+        compared_keys = [key for key in basic_values if key in vectorized_values]
+        differing_keys = [key for key in compared_keys if not is_same(vectorized_values[key], basic_values[key])]
+        mismatches.extend(
+            f"{cols} cols, {key}: vectorized {vectorized_values[key]!r}, basic {basic_values[key]!r}"
+            for key in differing_keys
+        )
+        print(
+            f"{cols:>6} {basic_seconds:>10.2f} {vectorized_seconds:>13.2f} "
+            f"{basic_seconds / vectorized_seconds:>7.1f}x {len(compared_keys):>15} {len(differing_keys):>7}"
+        )
+
+    if mismatches:
+        print("The profilers' stats differ:")
+        for mismatch in mismatches[:20]:
+            print(f"    {mismatch}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
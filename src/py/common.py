@@ -1,5 +1,8 @@
+import fnmatch
 import logging
 import os
+import tempfile
+import threading
 
 import colorlog
 import yaml
@@ -8,6 +11,10 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# The GX context shared by every stage run in this process - see get_gx_context()
+_gx_context = None
+_gx_context_lock = threading.Lock()
+
 
 # Custom Exceptions
 class InvalidYAMLFileError(Exception):
@@ -49,6 +56,19 @@ def get_logger(log_level=logging.INFO):
     return logger
 
 
+def get_gx_context():
+    """Return the process's GX context, importing GX & creating the context on first use."""
+    global _gx_context
+
+    with _gx_context_lock:
+        if _gx_context is None:
+            import great_expectations as gx
+
+            _gx_context = gx.get_context()
+
+    return _gx_context
+
+
 # Configuration Loading
 def load_config_from_yaml(file_path="config.yaml"):
     """Load and validate configuration data from a YAML file."""
@@ -88,6 +108,72 @@ def load_config_from_yaml(file_path="config.yaml"):
     return input_tables, other_params
 
 
+def get_table_params(other_params, input_table):
+    """Return other_params with any per-table overrides (from other_params['table_params']) applied."""
+    table_params = {key: value for key, value in other_params.items() if key != "table_params"}
+    table_params.update((other_params.get("table_params") or {}).get(input_table) or {})
+
+    return table_params
+
+
+def write_file_atomically(file_path, content):
+    """Write content to a temp file alongside file_path, then rename it into place in one step."""
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def select_columns(columns, cols_to_include=None, cols_to_exclude=None):
+    """Filter column names by include/exclude glob patterns (e.g. 'DWH_*'), matched case-insensitively.
+
+    Columns keep their original order. No include patterns means every column is included.
+    """
+
+    def matches_any(column, patterns):
+        return any(fnmatch.fnmatchcase(column.upper(), pattern.upper()) for pattern in patterns)
+
+    return [
+        column
+        for column in columns
+        if (not cols_to_include or matches_any(column, cols_to_include))
+        and not (cols_to_exclude and matches_any(column, cols_to_exclude))
+    ]
+
+
+def is_table_pattern(input_table):
+    """True if the input table is a glob pattern (e.g. 'dim_*') rather than a table name."""
+    return any(char in input_table for char in "*?[")
+
+
+def expand_table_patterns(input_tables, table_names):
+    """Replace the glob patterns in input_tables by the table_names they match (case-insensitively, in sorted order).
+
+    Tables keep their configured order, and a table matched more than once (e.g. named, and matched by a pattern - in
+    any case, as Snowflake's unquoted names are case-insensitive) is only listed the first time.
+    """
+    expanded_tables, listed_tables = [], set()
+    for input_table in input_tables:
+        if is_table_pattern(input_table):
+            matches = sorted(name for name in table_names if fnmatch.fnmatchcase(name.upper(), input_table.upper()))
+            if not matches:
+                get_logger().warning(f"No tables match '{input_table}'.")
+        else:
+            matches = [input_table]
+        for match in matches:
+            if match.upper() not in listed_tables:
+                expanded_tables.append(match)
+                listed_tables.add(match.upper())
+
+    return expanded_tables
+
+
 # Snowflake Connection String Creation
 def validate_environment_variables():
     """Validates required Snowflake connection environment variables."""
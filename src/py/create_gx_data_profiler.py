@@ -1,11 +1,26 @@
+import argparse
 import logging
+import multiprocessing
 import os
 import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 import common
+import pandas as pd
+import preflight
+import pushdown_profiler
+import render_cache
+import run_journal
+import run_state
+import sample_cache
 import snowflake_client
+import streaming_profiler
+import table_runner
+import tracing
+import vectorized_profiler
+from great_expectations.dataset.pandas_dataset import PandasDataset
 from great_expectations.profile.basic_dataset_profiler import BasicDatasetProfiler
 from great_expectations.render.renderer import ExpectationSuitePageRenderer
 from great_expectations.render.renderer import ProfilingResultsPageRenderer
@@ -20,23 +35,14 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
 
-def remove_relative_paths_from_html(html_file_path):
-    """Removes occurrences of the string '../../../../' from the html file."""
-
-    # Read the content of the HTML file and modify it
-    with open(html_file_path) as file:
-        content = file.read()
-        modified_content = content.replace("../../../../", "../")
-
-    # Write the modified content back to the HTML file
-    with open(html_file_path, "w") as file:
-        file.write(modified_content)
+def remove_relative_paths_from_html(html_content):
+    """Replaces occurrences of the string '../../../../' in the html content with '../'."""
+    return html_content.replace("../../../../", "../")
 
 
 def write_html_file(directory, filename, content):
-    """Write HTML content to a file in the specified directory"""
-    with open(os.path.join(directory, filename), "w") as file:
-        file.write(content)
+    """Write HTML content to a file in the specified directory, in one atomic write"""
+    common.write_file_atomically(os.path.join(directory, filename), content)
 
 
 def create_directory(directory):
@@ -48,61 +54,339 @@ def create_directory(directory):
         logger.debug(f"Directory already exists: {directory}")
 
 
-def generate_data_profiling_html(pandas_dataset, input_table):
-    # Run the basic profiler
-    expectation_suite_based_on_profiling, validation_result_based_on_profiling = pandas_dataset.profile(
-        BasicDatasetProfiler
-    )
+def generate_data_profiling_html(pandas_dataset, input_table, profiler_backend="basic", top_k=10):
+    # Run the basic profiler - or the vectorized one, which profiles the columns by dtype block in a few passes
+    with tracing.span("profile") as profile_span:
+        if profiler_backend == "vectorized":
+            profiling_results = vectorized_profiler.profile_dataframe(pd.DataFrame(pandas_dataset), input_table, top_k)
+        else:
+            profiling_results = pandas_dataset.profile(BasicDatasetProfiler)
+        profile_span["rows"] = len(pandas_dataset)
+
+    expectation_suite_based_on_profiling, validation_result_based_on_profiling = profiling_results
+    write_data_profiling_html(expectation_suite_based_on_profiling, validation_result_based_on_profiling, input_table)
+
+
+def write_data_profiling_html(expectation_suite_based_on_profiling, validation_result_based_on_profiling, input_table):
+    """Render a table's profiling results & expectation suite, and write them to the data docs site.
+
+    Pages are only rendered if their inputs have changed (see render_cache), and are written once each.
+    """
 
     # Render html content for profiling and expectation suite
-    profiling_result_html = DefaultJinjaPageView().render(
-        ProfilingResultsPageRenderer().render(validation_result_based_on_profiling)
-    )
-    expectation_based_on_profiling_html = DefaultJinjaPageView().render(
-        ExpectationSuitePageRenderer().render(expectation_suite_based_on_profiling)
-    )
+    def render_profiling_result_html():
+        return DefaultJinjaPageView().render(
+            ProfilingResultsPageRenderer().render(validation_result_based_on_profiling)
+        )
+
+    def render_expectation_based_on_profiling_html():
+        return DefaultJinjaPageView().render(
+            ExpectationSuitePageRenderer().render(expectation_suite_based_on_profiling)
+        )
 
     DATA_DOCS_DIR = "gx/uncommitted/data_docs/local_site/"
     PROFILING_RESULTS_DIR = os.path.join(DATA_DOCS_DIR, "profiling_results")
     EXPECTATION_SUITE_DIR = os.path.join(DATA_DOCS_DIR, "expectation_suite")
     CURRENT_DATE_STR = datetime.now().strftime("%Y%m%d")
 
-    # Define file information as tuples (directory, filename, content)
+    # Define file information as tuples (directory, filename, render key, render function)
     files_to_process = [
-        (PROFILING_RESULTS_DIR, f"{CURRENT_DATE_STR}_{input_table}.html", profiling_result_html),
-        (EXPECTATION_SUITE_DIR, f"{CURRENT_DATE_STR}_{input_table}.html", expectation_based_on_profiling_html),
+        (
+            PROFILING_RESULTS_DIR,
+            f"{CURRENT_DATE_STR}_{input_table}.html",
+            render_cache.get_render_key(
+                "profiling_results",
+                input_table,
+                [result.to_json_dict() for result in validation_result_based_on_profiling.results],
+            ),
+            render_profiling_result_html,
+        ),
+        (
+            EXPECTATION_SUITE_DIR,
+            f"{CURRENT_DATE_STR}_{input_table}.html",
+            render_cache.get_render_key(
+                "expectation_suite",
+                input_table,
+                [expectation.to_json_dict() for expectation in expectation_suite_based_on_profiling.expectations],
+            ),
+            render_expectation_based_on_profiling_html,
+        ),
     ]
 
     # loop through 'files_to_process' to call the same functions below on each
-    for directory, filename, content in files_to_process:
-        create_directory(directory)  # Create directories if they don't exist
-        write_html_file(directory, filename, content)  # Write HTML content to files
-        remove_relative_paths_from_html(os.path.join(directory, filename))  # Remove relative file paths
+    for directory, filename, render_key, render_func in files_to_process:
+        if render_cache.read_render_key(os.path.join(directory, filename)) == render_key:
+            logger.debug(f"Unchanged, so not re-written: {os.path.join(directory, filename)}")
+            continue
+
+        # Render (or reuse the cached render), removing relative file paths before anything is written
+        def render_html():
+            with tracing.span("render"):
+                return remove_relative_paths_from_html(render_func())
+
+        content = render_cache.get_or_render(render_key, render_html)
+        with tracing.span("write") as write_span:
+            create_directory(directory)  # Create directories if they don't exist
+            write_html_file(directory, filename, content)  # Write HTML content to files
+            write_span["bytes"] = len(content)
 
     logger.info(f"Created data profile for table: {input_table}")
 
-    return
 
+def profile_dataframe(df, input_table, profiler_backend="basic", top_k=10):
+    """Process pool entry point - a PandasDataset doesn't survive pickling, so the plain DataFrame is sent.
+
+    Returns the spans recorded in the worker process, for the parent's run report.
+    """
+    tracing.take_spans()  # drop any spans inherited from the parent process when the worker was forked
+    with tracing.current_table(input_table):
+        generate_data_profiling_html(PandasDataset(df), input_table, profiler_backend, top_k)
+
+    return tracing.take_spans()
+
+
+# the backends that profile a table without fetching its sample into a single DataFrame
+STREAMED_PROFILER_BACKENDS = ["pushdown", "streaming", "partitioned"]
+
+# the profiling processes are started by a server process rather than forked from this one, whose table threads,
+# prefetch thread & pooled Snowflake connections (and their locks) a fork would copy mid-use
+PROCESS_START_METHOD = "forkserver"
+
+
+def get_process_pool(max_workers):
+    """Return a process pool of max_workers processes, started with PROCESS_START_METHOD."""
+    mp_context = multiprocessing.get_context(PROCESS_START_METHOD)
+    if PROCESS_START_METHOD == "forkserver":
+        # the server imports GX's profiling & rendering once, so each process doesn't take seconds to import it again
+        # (the server can't import this repo's modules, which aren't on its path)
+        mp_context.set_forkserver_preload(
+            ["great_expectations.dataset.pandas_dataset", "great_expectations.render.renderer", "pyarrow"]
+        )
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+
+
+def get_skip_reason(input_table, empty_tables, journal, table_run_state, fingerprint, force=False):
+    """Return why a table isn't profiled in this run (e.g. 'unchanged table'), or None if it is."""
+    if input_table in empty_tables:
+        return "empty table"
+    if journal.is_completed(input_table, "profile"):
+        return f"table already profiled in run {journal.run_id}"
+    if not force and table_run_state.is_unchanged(input_table, "profile", fingerprint):
+        return "unchanged table"
+    return None
+
+
+def get_prefetch_tables(input_tables, other_params, skip_reasons):
+    """Return the tables whose samples are queried up front with async query submission - the tables profiled in this
+    run by the 'basic' & 'vectorized' backends."""
+    return [
+        input_table
+        for input_table in input_tables
+        if skip_reasons[input_table] is None
+        and common.get_table_params(other_params, input_table).get("profiler_backend", "basic")
+        in ["basic", "vectorized"]
+    ]
+
+
+def profile_streamed_table(connection_pool, partition_pool, input_table, table_params):
+    """Profile a table with its 'pushdown', 'streaming' or 'partitioned' backend, returning (expectation suite,
+    validation result)."""
+    profiler_backend = table_params["profiler_backend"]
+    with connection_pool.connection() as conn:
+        columns = snowflake_client.get_selected_columns(
+            conn, input_table, table_params.get("cols_to_include"), table_params.get("cols_to_exclude")
+        )
+        if profiler_backend == "pushdown":
+            # profile the full table with one aggregate query - no rows are fetched
+            return pushdown_profiler.profile_table(conn, input_table, columns, table_params.get("top_k", 10))
+        if profiler_backend == "streaming":
+            # profile the sample one fetched batch at a time, with mergeable per-column accumulators
+            return streaming_profiler.profile_table(
+                conn,
+                input_table,
+                table_params["row_count_limit"],
+                table_params.get("fetch_mode", "arrow"),
+                table_params.get("sampling"),
+                columns,
+                table_params.get("top_k", 10),
+                table_params.get("stream_batch_rows", 50_000),
+            )
+
+    # profile hash partitions of the table in parallel processes, merging their accumulators
+    return streaming_profiler.profile_table_partitioned(partition_pool, input_table, table_params, columns)
+
+
+def query_sample(connection_pool, input_table, table_params, fingerprint):
+    """Query & fetch a table's sample, returning it as a PandasDataset."""
+    with connection_pool.connection() as conn:
+        columns = snowflake_client.get_selected_columns(
+            conn, input_table, table_params.get("cols_to_include"), table_params.get("cols_to_exclude")
+        )
+        return snowflake_client.snowflake_query(
+            conn,
+            input_table,
+            table_params["row_count_limit"],
+            table_params.get("fetch_mode", "arrow"),
+            table_params.get("sampling"),
+            columns,
+            fingerprint,
+            table_params.get("sample_cache"),
+        )
+
+
+def profile_sample(process_pool, pandas_dataset, input_table, table_params):
+    """Profile a sample with the 'basic' or 'vectorized' backend - in the process pool, if there is one.
+
+    The table's thread waits for its profile, so with more table threads (max_workers) than profiling processes
+    (profile_workers), the other threads query & fetch the next samples while the processes profile.
+    """
+    profiler_backend = table_params.get("profiler_backend", "basic")
+    if process_pool is None:
+        generate_data_profiling_html(pandas_dataset, input_table, profiler_backend, table_params.get("top_k", 10))
+        return
+
+    # BasicDatasetProfiler (& the vectorized profiler) are CPU-bound & single-threaded, so profile in a separate process
+    tracing.add_spans(
+        process_pool.submit(
+            profile_dataframe,
+            pd.DataFrame(pandas_dataset),
+            input_table,
+            profiler_backend,
+            table_params.get("top_k", 10),
+        ).result()
+    )
+
+
+def profile_tables(input_tables, other_params, connection_pool, force=False, journal=None):
+    """Profile each input table, fetching samples on max_workers threads and profiling them in a pool of
+    profile_workers processes.
+
+    Tables whose fingerprint is unchanged since they were last profiled are skipped, unless force is set - as are
+    empty tables (see preflight), and tables the run journal (if any) records as already profiled in this run.
+    """
+    journal = journal or run_journal.RunJournal()
+    # one INFORMATION_SCHEMA query for every table's stats - which also orders the tables & chooses their sampling
+    table_preflight = preflight.run_preflight(connection_pool, input_tables, other_params)
+    input_tables, other_params = table_preflight["input_tables"], table_preflight["other_params"]
+
+    max_workers = other_params.get("max_workers", 1)
+    profile_workers = other_params.get("profile_workers") or max_workers
+    process_pool = get_process_pool(profile_workers) if profile_workers > 1 else None
+    # tables profiled with the 'partitioned' backend are split between the processes of a pool of their own
+    partition_pool = None
+    if any(
+        common.get_table_params(other_params, input_table).get("profiler_backend") == "partitioned"
+        for input_table in input_tables
+    ):
+        partition_pool = get_process_pool(other_params.get("partition_workers") or os.cpu_count())
+    table_run_state = run_state.RunState()
+    fingerprints = run_state.get_table_fingerprints(table_preflight["table_stats"], input_tables, other_params)
+    skip_reasons = {
+        input_table: get_skip_reason(
+            input_table, table_preflight["empty_tables"], journal, table_run_state, fingerprints[input_table], force
+        )
+        for input_table in input_tables
+    }
+
+    # with async query submission, the 'basic' & 'vectorized' backends' samples are all queried up front, with their
+    # queries running in Snowflake while earlier tables are profiled
+    sample_futures, stop_prefetch = {}, None
+    if other_params.get("query_submission", "sync") == "async":
+        sample_futures, stop_prefetch = snowflake_client.prefetch_samples(
+            connection_pool,
+            get_prefetch_tables(input_tables, other_params, skip_reasons),
+            other_params,
+            other_params.get("max_queries_in_flight", 8),
+            other_params.get("query_poll_interval_seconds", 0.5),
+            fingerprints,
+        )
+
+    def profile_table(input_table):
+        logger.debug(f"Input table = {input_table}")
+
+        if skip_reasons[input_table] is not None:
+            logger.info(f"Skipped data profile for {skip_reasons[input_table]}: {input_table}")
+            return "skipped"
+
+        table_params = common.get_table_params(other_params, input_table)
+        if table_params.get("profiler_backend", "basic") in STREAMED_PROFILER_BACKENDS:
+            expectation_suite, validation_result = profile_streamed_table(
+                connection_pool, partition_pool, input_table, table_params
+            )
+            write_data_profiling_html(expectation_suite, validation_result, input_table)
+        elif input_table in sample_futures:
+            # the sample was queried & fetched asynchronously (see snowflake_client.prefetch_samples)
+            profile_sample(process_pool, sample_futures.pop(input_table).result(), input_table, table_params)
+        else:
+            pandas_dataset = query_sample(connection_pool, input_table, table_params, fingerprints[input_table])
+            profile_sample(process_pool, pandas_dataset, input_table, table_params)
+
+        table_run_state.record(
+            input_table, "profile", fingerprints[input_table], run_date=datetime.now().strftime("%Y%m%d")
+        )
+        journal.record(input_table, "profile")
 
-def main():
+    try:
+        return table_runner.run_tables_as_completed(
+            profile_table, input_tables, sample_futures, max_workers=max_workers
+        )
+    finally:
+        if stop_prefetch is not None:
+            stop_prefetch()
+        for pool in [process_pool, partition_pool]:
+            if pool is not None:
+                pool.shutdown()
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Create GX data profiles for the input tables in config.yaml.")
+    parser.add_argument("--force", action="store_true", help="Profile every table, even if it's unchanged.")
+    parser.add_argument(
+        "--resume", metavar="RUN_ID", help="Resume the run, skipping the tables its run journal records as profiled."
+    )
+    parser.add_argument(
+        "--tables", nargs="+", metavar="TABLE", help="Only run these tables (e.g. a gxshard worker's claimed tables)."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
     try:
         input_tables, other_params = common.load_config_from_yaml()
+        input_tables = args.tables or input_tables
         gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
         logger.debug(
             f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
         )
 
-        for input_table in input_tables:
-            logger.debug(f"Input table = {input_table}")
+        # Open Snowflake connections once and share them across all input tables
+        connection_pool = snowflake_client.get_connection_pool(other_params.get("connection_pool"))
 
-            pandas_dataset = snowflake_client.snowflake_query(
-                snowflake_client.setup_snowflake_connection(), input_table, row_count_limit
-            )
-            generate_data_profiling_html(pandas_dataset, input_table)
+        # Record each table's completed stages, so a failed run can be resumed where it stopped
+        journal = run_journal.RunJournal(args.resume, resume=args.resume is not None)
+        logger.info(f"Run journal: {journal.file_path} (resume with --resume {journal.run_id})")
+
+        results = profile_tables(input_tables, other_params, connection_pool, force=args.force, journal=journal)
+        journal.record_failures(results, "profile")
+
+        logger.info(
+            f"Snowflake connections opened: {connection_pool.stats['connections_opened']}, "
+            f"reused: {connection_pool.stats['connections_reused']}"
+        )
+        connection_pool.close_all()
+        render_cache.prune_render_cache(other_params.get("render_cache_max_entries", 1000))
+        if other_params.get("sample_cache"):
+            sample_cache.prune_sample_cache(**other_params["sample_cache"])
+        tracing.write_run_report()
+        failed_count = table_runner.log_table_summary(results, "data profiling")
     except Exception as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
 
+    if failed_count:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -1,43 +1,122 @@
+import argparse
 import sys
+import threading
 import warnings
 from datetime import datetime
 from time import time
 
 import common
-import great_expectations as gx
+import data_docs_builder
+import pandas as pd
+import preflight
+import run_journal
+import run_state
+import sample_cache
+import snowflake_client
+import sql_validator
+import table_runner
+import tracing
 from dotenv import load_dotenv
+from great_expectations.data_context.types.base import ConcurrencyConfig
 
 load_dotenv()  # Load environment variables from .env file
 
 # Set up logging
 logger = common.get_logger()
 
-# Create a GX context
-context = gx.get_context()
-
 # Suppress DeprecationWarning for create_expectation_suite
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
+# Serialises changes to the pandas datasource's assets when tables run concurrently
+pandas_asset_lock = threading.Lock()
+
+# Checkpoint actions - without GX's default update_data_docs action, as the data docs are built incrementally by
+# data_docs_builder (after the run, rather than after each validation)
+CHECKPOINT_ACTION_LIST = [
+    {"name": "store_validation_result", "action": {"class_name": "StoreValidationResultAction"}},
+    {"name": "store_evaluation_params", "action": {"class_name": "StoreEvaluationParametersAction"}},
+]
 
-def create_and_run_checkpoint(batch_request, expectation_suite_name):
+
+def create_and_run_checkpoint(batch_request, expectation_suite_name, checkpoint_name="my_checkpoint", build_docs=True):
     """Create a checkpoint, run validations, and build data documentation."""
+    context = common.get_gx_context()
     checkpoint = context.add_or_update_checkpoint(
-        name="my_checkpoint",
+        name=checkpoint_name,
         validations=[
             {
                 "batch_request": batch_request,
                 "expectation_suite_name": expectation_suite_name,
             },
         ],
+        action_list=CHECKPOINT_ACTION_LIST,
     )
-    checkpoint_result = checkpoint.run()
-    context.build_data_docs()
+    with tracing.span("checkpoint"):
+        checkpoint_result = checkpoint.run()
+    if build_docs:
+        data_docs_builder.build_data_docs(context)
 
     return checkpoint_result
 
 
+def create_and_run_batched_checkpoint(validations, checkpoint_name="my_batched_checkpoint"):
+    """Create one checkpoint with a validation for each (batch request, expectation suite name), and run them in
+    parallel. The data docs aren't built here - build them once, after the run."""
+    context = common.get_gx_context()
+    context.variables.concurrency = ConcurrencyConfig(enabled=True)  # run the validations on multiple threads
+    checkpoint = context.add_or_update_checkpoint(
+        name=checkpoint_name,
+        validations=[
+            {
+                "batch_request": batch_request,
+                "expectation_suite_name": expectation_suite_name,
+            }
+            for batch_request, expectation_suite_name in validations
+        ],
+        action_list=CHECKPOINT_ACTION_LIST,
+    )
+
+    with tracing.span("checkpoint"):
+        return checkpoint.run()
+
+
+def run_batched_validations(batched_validations, results, record_suite):
+    """Validate the tables' suites - {table: (batch request, expectation suite name)} - in one checkpoint run, and
+    record_suite each validated table.
+
+    If the batched run fails, each table is validated by a checkpoint run of its own instead, so one table's batch
+    can't fail the others: a table whose own run fails is marked as failed in results (table_runner's results).
+    """
+    START_TIME = time()
+    try:
+        create_and_run_batched_checkpoint(list(batched_validations.values()))
+        logger.info(
+            f"\nValidated {len(batched_validations)} tables in one checkpoint run: "
+            f"{int(round(time() - START_TIME, 0))} seconds."
+        )
+        validated_tables = list(batched_validations)
+    except Exception as e:
+        logger.warning(f"Batched checkpoint run failed ({e}) - validating its tables one at a time.")
+        results_by_table = {result["table"]: result for result in results}
+        validated_tables = []
+        for input_table, (batch_request, expectation_suite_name) in batched_validations.items():
+            try:
+                with tracing.current_table(input_table):
+                    create_and_run_checkpoint(
+                        batch_request, expectation_suite_name, f"{expectation_suite_name}_checkpoint", build_docs=False
+                    )
+                validated_tables.append(input_table)
+            except Exception as table_error:
+                logger.error(f"Error validating table '{input_table}': {table_error}")
+                results_by_table[input_table].update(status="failed", error=str(table_error))
+
+    for input_table in validated_tables:
+        record_suite(input_table, batched_validations[input_table][1])
+
+
 def save_expectation_suite(data_assistant_result, expectation_suite_name):
     """Save the expectation suite obtained from the data assistant."""
+    context = common.get_gx_context()
     try:
         expectation_suite = data_assistant_result.get_expectation_suite(expectation_suite_name=expectation_suite_name)
         context.add_or_update_expectation_suite(expectation_suite=expectation_suite)
@@ -47,10 +126,14 @@ def save_expectation_suite(data_assistant_result, expectation_suite_name):
         raise
 
 
-def run_onboarding_data_assistant(batch_request, exclude_column_names=[]):
+def run_onboarding_data_assistant(batch_request, exclude_column_names=None):
     """Run onboarding data assistant with the provided batch request and exclude column names."""
+    context = common.get_gx_context()
     try:
-        data_assistant_result = context.assistants.onboarding.run(batch_request=batch_request)
+        with tracing.span("assistant"):
+            data_assistant_result = context.assistants.onboarding.run(
+                batch_request=batch_request, exclude_column_names=exclude_column_names or []
+            )
         logger.debug("Data assistant run successful.")
         return data_assistant_result
     except Exception as e:
@@ -60,6 +143,7 @@ def run_onboarding_data_assistant(batch_request, exclude_column_names=[]):
 
 def prepare_expectation_suite(input_table):
     """Prepare and create a new expectation suite with the current date as the name."""
+    context = common.get_gx_context()
     current_date_str = datetime.now().strftime("%Y%m%d")
     expectation_suite_name = f"{current_date_str}_{input_table}"
 
@@ -73,55 +157,336 @@ def prepare_expectation_suite(input_table):
     return expectation_suite_name
 
 
-def prepare_batch_request(input_table, gx_data_src_name, row_count_limit):
-    """Prepare a batch request for the given data asset name."""
+def prepare_batch_request(input_table, gx_data_src_name):
+    """Prepare a batch request for the given data asset name.
+
+    No batch is fetched here - on Snowflake, getting the batch list creates a temporary table of the asset's sampling
+    query, which the assistant & the checkpoint would only create again (and the 'pandas' batch modes don't use).
+    """
+    context = common.get_gx_context()
     my_asset = context.get_datasource(gx_data_src_name).get_asset(input_table)  # Retrieve data asset
-    batch_request = my_asset.build_batch_request()  # build batch request
+    return my_asset.build_batch_request()  # build batch request
+
+
+def prepare_pandas_batch_request(
+    input_table, table_params, connection_pool, pandas_datasource, fingerprint=None, dialect="snowflake"
+):
+    """Fetch the table's sample once (or read it from the sample cache) and return a batch request for it as an
+    in-memory pandas batch.
+
+    The onboarding assistant (and, in 'pandas' validation_batch_mode, the checkpoint) then computes all of its metrics
+    against the DataFrame, rather than issuing many small metric queries that each re-run the query asset's sampling
+    SQL in Snowflake.
+
+    The DataFrame's columns are named as GX names the query asset's (of the datasource's dialect) - for Snowflake,
+    case-insensitive names in lower case - so a suite created on one batch can be validated on the other.
+    """
+    with connection_pool.connection() as conn:
+        columns = snowflake_client.get_selected_columns(
+            conn, input_table, table_params.get("cols_to_include"), table_params.get("cols_to_exclude")
+        )
+        pandas_dataset = snowflake_client.snowflake_query(
+            conn,
+            input_table,
+            table_params["row_count_limit"],
+            table_params.get("fetch_mode", "arrow"),
+            table_params.get("sampling"),
+            columns,
+            fingerprint,
+            table_params.get("sample_cache"),
+        )
 
-    batches = my_asset.get_batch_list_from_batch_request(batch_request)
+    with pandas_asset_lock:
+        try:
+            my_asset = pandas_datasource.get_asset(input_table)
+        except LookupError:
+            my_asset = pandas_datasource.add_dataframe_asset(name=input_table)
 
-    [logger.debug(batch.batch_spec) for batch in batches]
+    df = pd.DataFrame(pandas_dataset).rename(columns=lambda column: sql_validator.normalize_column(column, dialect))
+    return my_asset.build_batch_request(dataframe=df)
 
-    return batch_request
 
+def log_assistant_timings(table_info):
+    """Log the onboarding assistant's execution time per metric family (i.e. per profiler rule), slowest first."""
+    rule_execution_time = table_info["rule_execution_time"]
+    rule_domain_builder_execution_time = table_info["rule_domain_builder_execution_time"]
 
-def main():
+    for rule_name in sorted(rule_execution_time, key=rule_execution_time.get, reverse=True):
+        logger.info(
+            f"    {rule_name}: {rule_execution_time[rule_name]:.2f} seconds "
+            f"(domain builder: {rule_domain_builder_execution_time.get(rule_name, 0):.2f} seconds)."
+        )
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Create & validate GX expectation suites for the input tables.")
+    parser.add_argument("--force", action="store_true", help="Rebuild every suite, even if the table is unchanged.")
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Resume the run, skipping the tables its run journal records as validated, and reusing the suites it "
+        "records as created.",
+    )
+    parser.add_argument(
+        "--tables", nargs="+", metavar="TABLE", help="Only run these tables (e.g. a gxshard worker's claimed tables)."
+    )
+    return parser.parse_args(argv)
+
+
+def uses_pandas_batch(table_params):
+    """In 'pandas' mode, the assistant (or the checkpoint) uses a sample materialised once per table, in memory."""
+    return "pandas" in [
+        table_params.get("assistant_batch_mode", "query"),
+        table_params.get("validation_batch_mode", "query"),
+    ]
+
+
+def log_table_times(table_times, input_tables):
+    """Log the elapsed time (& the assistant's timings) for each table, in the order of input_tables."""
+    logger.info("Time taken to create (test) expectation suite for tables:")
+    for table_info in sorted(table_times, key=lambda table_info: input_tables.index(table_info["table"])):
+        logger.info(f"{table_info['table']}': {table_info['elapsed_time']} seconds.")
+        log_assistant_timings(table_info)
+
+
+class SuiteRun:
+    """A run's suite creation & validation for each table - with the state its tables share: their fingerprints, the
+    run state & run journal, the pandas datasource, and the suites left to validate in one batched checkpoint run."""
+
+    def __init__(self, context, connection_pool, table_preflight, config_params, args):
+        self.context = context
+        self.connection_pool = connection_pool
+        self.input_tables, self.other_params = table_preflight["input_tables"], table_preflight["other_params"]
+        self.empty_tables = table_preflight["empty_tables"]
+        self.force = args.force
+        self.max_workers = self.other_params.get("max_workers", 1)
+        self.batched_validation = self.other_params.get("validation_mode", "per_table") == "batched"
+        self.reuse_suites = (self.other_params.get("preflight") or {}).get("reuse_suite_for_unchanged_schema")
+
+        # Skip suite generation & checkpoint runs for tables that are unchanged since their last suite, and suite
+        # generation (but not the checkpoint run) for tables whose schema is unchanged
+        self.table_run_state = run_state.RunState()
+        # Record each table's completed stages ('suite' created, 'validate'd), so a failed run can be resumed
+        self.journal = run_journal.RunJournal(args.resume, resume=args.resume is not None)
+        self.fingerprints = run_state.get_table_fingerprints(
+            table_preflight["table_stats"], self.input_tables, self.other_params
+        )
+        # the configured (rather than preflight's) sampling, so a table's sampling adapting to its row count doesn't
+        # change its schema fingerprint
+        self.schema_fingerprints = run_state.get_schema_fingerprints(
+            table_preflight["table_stats"], self.input_tables, config_params
+        )
+
+        self.pandas_datasource, self.query_dialect = None, None
+        if any(
+            uses_pandas_batch(common.get_table_params(self.other_params, input_table))
+            for input_table in self.input_tables
+        ):
+            self.pandas_datasource = context.sources.add_or_update_pandas(
+                f"{self.other_params['gx_data_src_name']}_pandas"
+            )
+            # the query assets' datasource type - the pandas batches' column names match its assets'
+            self.query_dialect = context.get_datasource(self.other_params["gx_data_src_name"]).type
+
+        self.table_times = []  # List to store elapsed time for each table
+        # In 'batched' mode: table -> (batch request, expectation suite name), for 1 checkpoint
+        self.batched_validations = {}
+
+    def record_suite(self, input_table, expectation_suite_name):
+        self.table_run_state.record(
+            input_table,
+            "suite",
+            self.fingerprints[input_table],
+            expectation_suite_name=expectation_suite_name,
+            schema_fingerprint=self.schema_fingerprints[input_table],
+        )
+        self.journal.record(input_table, "validate", expectation_suite_name=expectation_suite_name)
+
+    def prepare_pandas_batch_request(self, input_table, table_params):
+        return prepare_pandas_batch_request(
+            input_table,
+            table_params,
+            self.connection_pool,
+            self.pandas_datasource,
+            self.fingerprints[input_table],
+            self.query_dialect,
+        )
+
+    def get_skip_reason(self, input_table):
+        """Return why the table's suite isn't created (or validated) in this run, or None if it is."""
+        if input_table in self.empty_tables:
+            return "for empty table"
+        if self.journal.is_completed(input_table, "validate"):
+            return f"already validated in run {self.journal.run_id}"
+        if not self.force and self.table_run_state.is_unchanged(input_table, "suite", self.fingerprints[input_table]):
+            return "for unchanged table"
+        return None
+
+    def get_reused_suite(self, input_table):
+        """Return (the name of the existing suite to validate the table against, why it's reused) - or (None, None) if
+        a new suite is created."""
+        suite_state = self.table_run_state.get(input_table, "suite")
+        reused_suite_name, reuse_reason = None, None
+        if self.journal.is_completed(input_table, "suite"):
+            # created before the resumed run stopped - only its validation is left to do
+            reused_suite_name = self.journal.get(input_table, "suite")["expectation_suite_name"]
+            reuse_reason = f"already created in run {self.journal.run_id}"
+        elif (
+            self.reuse_suites
+            and not self.force
+            and self.schema_fingerprints[input_table] is not None
+            and suite_state.get("schema_fingerprint") == self.schema_fingerprints[input_table]
+        ):
+            # the data changed but the schema didn't - validate it against the table's existing suite
+            reused_suite_name = suite_state.get("expectation_suite_name")
+            reuse_reason = "for table with an unchanged schema"
+
+        if reused_suite_name is None or reused_suite_name not in self.context.list_expectation_suite_names():
+            return None, None
+        return reused_suite_name, reuse_reason
+
+    def create_suite(self, input_table, table_params, batch_request, expectation_suite_name):
+        """Create the table's suite with the onboarding assistant. Returns the batch request to validate it with."""
+        assistant_batch_request = validation_batch_request = batch_request
+        if uses_pandas_batch(table_params):
+            pandas_batch_request = self.prepare_pandas_batch_request(input_table, table_params)
+            if table_params.get("assistant_batch_mode", "query") == "pandas":
+                assistant_batch_request = pandas_batch_request
+            if table_params.get("validation_batch_mode", "query") == "pandas":
+                validation_batch_request = pandas_batch_request
+
+        # Measure time taken by run_onboarding_data_assistant - both batches are already projected to the table's
+        # cols_to_include/cols_to_exclude (by the query asset, or the sample query), so no columns are excluded
+        START_TIME = time()
+        data_assistant_result = run_onboarding_data_assistant(assistant_batch_request, exclude_column_names=[])
+        ELAPSED_TIME = int(round(time() - START_TIME, 0))
+
+        # Store elapsed time and input table information in the list
+        self.table_times.append(
+            {
+                "table": input_table,
+                "elapsed_time": ELAPSED_TIME,
+                "rule_execution_time": data_assistant_result.rule_execution_time or {},
+                "rule_domain_builder_execution_time": data_assistant_result.rule_domain_builder_execution_time or {},
+            }
+        )
+
+        save_expectation_suite(data_assistant_result, expectation_suite_name)
+        self.journal.record(input_table, "suite", expectation_suite_name=expectation_suite_name)
+
+        return validation_batch_request
+
+    def validate(self, input_table, table_params, validation_batch_request, expectation_suite_name, query_batch=True):
+        """Validate the table's suite - with one aggregate query ('sql' validation_engine, for a query asset's batch),
+        in the batched checkpoint run ('batched' validation_mode) or a checkpoint run of its own."""
+        if table_params.get("validation_engine", "checkpoint") == "sql" and query_batch:
+            # One aggregate query for the whole suite, stored as a validation result for the data docs
+            sql_validator.validate_suite(self.connection_pool, validation_batch_request, expectation_suite_name)
+            self.record_suite(input_table, expectation_suite_name)
+            return
+
+        if self.batched_validation:
+            # Validated (and recorded in the run state) with the other tables' suites, in one checkpoint run
+            self.batched_validations[input_table] = (validation_batch_request, expectation_suite_name)
+            return
+
+        if self.max_workers > 1:
+            # Concurrent tables can't share 'my_checkpoint', and the data docs are built once at the end
+            create_and_run_checkpoint(
+                validation_batch_request,
+                expectation_suite_name,
+                f"{expectation_suite_name}_checkpoint",
+                build_docs=False,
+            )
+        else:
+            create_and_run_checkpoint(validation_batch_request, expectation_suite_name)
+
+        self.record_suite(input_table, expectation_suite_name)
+
+    def create_expectation_suite(self, input_table):
+        skip_reason = self.get_skip_reason(input_table)
+        if skip_reason is not None:
+            logger.info(f"\nSkipped (test) expectation suite {skip_reason}: {input_table}")
+            return "skipped"
+
+        table_params = common.get_table_params(self.other_params, input_table)
+        batch_request = prepare_batch_request(input_table, self.other_params["gx_data_src_name"])
+
+        expectation_suite_name, reuse_reason = self.get_reused_suite(input_table)
+        if expectation_suite_name is not None:
+            logger.info(f"\nReusing (test) expectation suite {reuse_reason}: {input_table}")
+            validation_batch_request = batch_request
+            if table_params.get("validation_batch_mode", "query") == "pandas":
+                validation_batch_request = self.prepare_pandas_batch_request(input_table, table_params)
+        else:
+            logger.info(f"\nCreating (test) expectation suite for table: {input_table}")
+            expectation_suite_name = prepare_expectation_suite(input_table)
+            validation_batch_request = self.create_suite(
+                input_table, table_params, batch_request, expectation_suite_name
+            )
+
+        self.validate(
+            input_table,
+            table_params,
+            validation_batch_request,
+            expectation_suite_name,
+            query_batch=validation_batch_request is batch_request,
+        )
+
+    def run_batched_validations(self, results):
+        """Validate the suites left for the batched checkpoint run, in the order of input_tables."""
+        if self.batched_validations:
+            run_batched_validations(
+                {
+                    input_table: self.batched_validations[input_table]
+                    for input_table in self.input_tables
+                    if input_table in self.batched_validations
+                },
+                results,
+                self.record_suite,
+            )
+
+
+def main(argv=None):
     """Main function to execute the script."""
+    args = parse_arguments(argv)
     try:
+        context = common.get_gx_context()
         input_tables, other_params = common.load_config_from_yaml()
+        input_tables = args.tables or input_tables
         gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
         logger.debug(
             f"input tables = {input_tables}\ngx_data_src_name = {gx_data_src_name}\nrow_count_limit = {row_count_limit}"
         )
 
-        table_times = []  # List to store elapsed time for each table
+        # One INFORMATION_SCHEMA query for every table's stats - which also orders the tables & chooses their sampling
+        connection_pool = snowflake_client.get_connection_pool(other_params.get("connection_pool"))
+        table_preflight = preflight.run_preflight(connection_pool, input_tables, other_params)
+        suite_run = SuiteRun(context, connection_pool, table_preflight, other_params, args)
+        input_tables, other_params = suite_run.input_tables, suite_run.other_params
+        logger.info(f"Run journal: {suite_run.journal.file_path} (resume with --resume {suite_run.journal.run_id})")
 
-        for input_table in input_tables:
-            logger.info(f"\nCreating (test) expectation suite for table: {input_table}")
-            batch_request = prepare_batch_request(input_table, gx_data_src_name, row_count_limit)
-            expectation_suite_name = prepare_expectation_suite(input_table)
-
-            # Measure time taken by run_onboarding_data_assistant
-            START_TIME = time()
-            data_assistant_result = run_onboarding_data_assistant(batch_request)
-            ELAPSED_TIME = int(round(time() - START_TIME, 0))
-
-            # Store elapsed time and input table information in the list
-            table_times.append({"table": input_table, "elapsed_time": ELAPSED_TIME})
-
-            save_expectation_suite(data_assistant_result, expectation_suite_name)
-            create_and_run_checkpoint(batch_request, expectation_suite_name)
-        context.build_data_docs()
+        results = table_runner.run_tables(
+            suite_run.create_expectation_suite, input_tables, max_workers=suite_run.max_workers
+        )
+        suite_run.run_batched_validations(results)
+        suite_run.journal.record_failures(results, "validate")
 
-        logger.info("Time taken to create (test) expectation suite for tables:")
-        # Log the elapsed time for each table after the for loop
-        for table_info in table_times:
-            logger.info(f"{table_info['table']}': {table_info['elapsed_time']} seconds.")
+        connection_pool.close_all()
+        if other_params.get("sample_cache"):
+            sample_cache.prune_sample_cache(**other_params["sample_cache"])
+        data_docs_builder.build_data_docs(context)
 
+        log_table_times(suite_run.table_times, input_tables)
+        tracing.write_run_report()
+        failed_count = table_runner.log_table_summary(results, "expectation suites")
     except Exception as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
 
+    if failed_count:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -3,7 +3,10 @@ import sys
 import warnings
 
 import common
-import great_expectations as gx
+import preflight
+import snowflake_client
+import sql_builder
+from great_expectations.datasource.fluent.sql_datasource import QueryAsset
 
 # Set up logging
 logger = common.get_logger(log_level=logging.INFO)
@@ -12,18 +15,82 @@ logger = common.get_logger(log_level=logging.INFO)
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 
-def get_or_create_datasource(context, gx_data_src_name):
+def get_or_create_datasource(context, gx_data_src_name, pool_params=None):
     """Get an existing datasource or create a new one if not exists."""
     try:
         # Attempt to get an existing datasource with the given name
         return context.get_datasource(gx_data_src_name)
     except ValueError:
-        # If the datasource doesn't exist, create a new one with the provided name
+        # If the datasource doesn't exist, create a new one with the provided name.
+        # The SQLAlchemy engine pools its connections with the same size/recycle/health-check settings
+        # as snowflake_client's pool, so every asset in the datasource shares them.
         return context.sources.add_snowflake(
-            name=gx_data_src_name, connection_string=common.create_snowflake_connection_string()
+            name=gx_data_src_name,
+            connection_string=common.create_snowflake_connection_string(),
+            kwargs=snowflake_client.get_sqlalchemy_pool_kwargs(pool_params),
         )
 
 
+def build_table_query(connection_pool, table, table_params, table_columns=None):
+    """Build the table's sampling query, projecting only the columns kept by cols_to_include/cols_to_exclude.
+
+    The columns are filtered from table_columns (e.g. from preflight's table stats) if given, rather than queried.
+    """
+    columns = None
+    cols_to_include, cols_to_exclude = table_params.get("cols_to_include"), table_params.get("cols_to_exclude")
+    if (cols_to_include or cols_to_exclude) and table_columns:
+        columns = common.select_columns(table_columns, cols_to_include, cols_to_exclude)
+        if not columns:
+            raise ValueError(f"No columns left to select from table '{table}' after applying cols_to_include/exclude.")
+    elif cols_to_include or cols_to_exclude:
+        with connection_pool.connection() as conn:
+            columns = snowflake_client.get_selected_columns(conn, table, cols_to_include, cols_to_exclude)
+
+    return sql_builder.build_sample_query(table, table_params["row_count_limit"], table_params.get("sampling"), columns)
+
+
+def sync_query_assets(datasource, asset_queries):
+    """Make the datasource's assets match asset_queries ({asset name: query}) and save the context's config once.
+
+    Assets are added, updated (if their query changed) & removed in memory, rather than with add_query_asset &
+    delete_asset - which each rewrite great_expectations.yml, so syncing n tables would serialize the config n times.
+    Nothing is written if the assets are unchanged. Returns the names of the (added, updated, removed) assets.
+    """
+    existing_assets = {asset.name: asset for asset in datasource.assets}
+    added = [name for name in asset_queries if name not in existing_assets]
+    updated = [
+        name
+        for name, asset in existing_assets.items()
+        if name in asset_queries and (asset.type != "query" or asset.query != asset_queries[name])
+    ]
+    removed = [name for name in existing_assets if name not in asset_queries]
+    if not (added or updated or removed):
+        return added, updated, removed
+
+    # GX 0.17.19's public API has no way to add or remove several assets with one config write, so this does what
+    # Datasource._add_asset does for each asset - with its private internals (_datasource, _build_data_connector &
+    # _save_context_project_config). tests/test_create_gx_snowflake_table_loader.py pins it to that GX version.
+    assets = []
+    for name in [*[asset.name for asset in datasource.assets if asset.name not in removed], *added]:
+        if name in existing_assets and name not in updated:
+            assets.append(existing_assets[name])
+            continue
+        # the pydantic model validates the query (e.g. that it's a SELECT)
+        asset = QueryAsset(name=name, query=asset_queries[name])
+        asset._datasource = datasource
+        datasource._build_data_connector(asset)
+        asset.test_connection()
+        assets.append(asset)
+    # fail before the config is changed if the datasource can't be connected to
+    datasource.test_connection(test_assets=False)
+    datasource.assets = assets
+
+    # the one write of great_expectations.yml (as add_query_asset does after every asset)
+    datasource._save_context_project_config()
+
+    return added, updated, removed
+
+
 def add_snowflake_tables_to_gx():
     """Load configuration and add assets to the Great Expectations data context."""
     try:
@@ -31,24 +98,44 @@ def add_snowflake_tables_to_gx():
         common.validate_environment_variables()
 
         # Set up a data context
-        context = gx.data_context.DataContext()
+        context = common.get_gx_context()
 
         # Fetch input parameters from config.yaml
         input_tables, other_params = common.load_config_from_yaml()
 
         # Fetch the remaining params
-        gx_data_src_name, row_count_limit = other_params["gx_data_src_name"], other_params["row_count_limit"]
+        gx_data_src_name = other_params["gx_data_src_name"]
+
+        # Shared Snowflake connections, used for the tables' stats (and to resolve the include/exclude column patterns)
+        connection_pool = snowflake_client.get_connection_pool(other_params.get("connection_pool"))
+        # the query assets sample the tables as the profile & suite stages do, and table patterns (e.g. 'dim_*')
+        # are expanded the same way - see preflight
+        table_preflight = preflight.run_preflight(connection_pool, input_tables, other_params)
+        input_tables, other_params = table_preflight["input_tables"], table_preflight["other_params"]
 
-        # Get or create datasource and add assets
+        asset_queries = {}
         for table in input_tables:
             try:
-                datasource = get_or_create_datasource(context, gx_data_src_name)
-                # Add table as a query asset with row_count_limit
-                datasource.add_query_asset(name=table, query=f"SELECT * FROM {table} LIMIT {row_count_limit}")
-                logger.debug(f"Table '{table}' added successfully.")
+                table_params = common.get_table_params(other_params, table)
+                table_columns = [
+                    column for column, _ in (table_preflight["table_stats"].get(table.upper()) or {}).get("columns", [])
+                ]
+                asset_queries[table] = build_table_query(connection_pool, table, table_params, table_columns)
             except Exception as e:
                 logger.error(f"Error adding table '{table}': {e}")
                 raise
+
+        # Get or create datasource, and add, update & remove its assets to match the tables
+        datasource = get_or_create_datasource(context, gx_data_src_name, other_params.get("connection_pool"))
+        added, updated, removed = sync_query_assets(datasource, asset_queries)
+        logger.info(
+            f"Data assets: {len(added)} added, {len(updated)} updated, {len(removed)} removed & "
+            f"{len(asset_queries) - len(added) - len(updated)} unchanged."
+        )
+        for table in removed:
+            logger.debug(f"Table '{table}' removed.")
+
+        connection_pool.close_all()
     except (common.MissingEnvironmentVariableError, ValueError) as e:
         logger.error(f"\nAn error occurred: {e}")
         sys.exit(1)
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import pathlib
+import urllib.parse
+
+import common
+import tracing
+from great_expectations.core.util import convert_to_json_serializable
+from great_expectations.data_context.types.resource_identifiers import ExpectationSuiteIdentifier
+from great_expectations.render.renderer.site_index_page_renderer import SiteIndexPageRenderer
+from great_expectations.render.view import DefaultJinjaIndexPageView
+
+# Set up logging
+logger = common.get_logger()
+
+DATA_DOCS_MANIFEST_FILE = "gx/uncommitted/data_docs_manifest.json"
+
+
+def get_site_directory(context, site_name):
+    """Return the local directory the data docs site is written to."""
+    site_config = context.variables.data_docs_sites[site_name]
+    return os.path.join(context.root_directory, site_config["store_backend"]["base_directory"])
+
+
+def get_resource_hash(store, key):
+    """Hash a suite's or validation result's JSON, as held in its store."""
+    return hashlib.sha256(str(store.store_backend.get(store.key_to_tuple(key))).encode()).hexdigest()
+
+
+def get_index_link(context, key):
+    """Return the index page link for a suite or validation result, as GX's DefaultSiteIndexBuilder builds it."""
+    if isinstance(key, ExpectationSuiteIdentifier):
+        filepath = pathlib.Path("expectations", *key.expectation_suite_name.split(".")).as_posix() + ".html"
+        return {"expectation_suite_name": key.expectation_suite_name, "filepath": urllib.parse.quote(filepath)}
+
+    expectation_suite_name = key.expectation_suite_identifier.expectation_suite_name
+    validation = context.validations_store.get(key)
+    batch_kwargs = validation.meta.get("batch_kwargs", {})
+    batch_spec = validation.meta.get("batch_spec", {})
+    filepath = (
+        pathlib.Path(
+            "validations", *expectation_suite_name.split("."), *key.run_id.to_tuple(), key.batch_identifier
+        ).as_posix()
+        + ".html"
+    )
+
+    return {
+        "expectation_suite_name": expectation_suite_name,
+        "filepath": urllib.parse.quote(filepath),
+        "batch_identifier": key.batch_identifier,
+        "validation_success": validation.success,
+        "run_time": key.run_id.run_time.isoformat(),
+        "run_name": key.run_id.run_name,
+        "asset_name": batch_kwargs.get("data_asset_name") or batch_spec.get("data_asset_name"),
+        "batch_kwargs": convert_to_json_serializable(batch_kwargs),
+        "batch_spec": convert_to_json_serializable(batch_spec),
+        "expectation_suite_filepath": pathlib.Path("expectations", *expectation_suite_name.split(".")).as_posix()
+        + ".html",
+    }
+
+
+def render_index_page(context, site_name, manifest):
+    """Render the site's index page from the manifest's links, without reading any suite or validation result."""
+    validations_links = sorted(
+        (entry["link"] for entry in manifest["validations"].values()), key=lambda link: link["run_time"], reverse=True
+    )
+    index_links_dict = {
+        "site_name": site_name,
+        "expectations_links": [entry["link"] for entry in manifest["expectations"].values()],
+        "validations_links": validations_links,
+    }
+
+    # use the project's custom data docs styles & views, as GX's SiteBuilder does
+    custom_data_docs_directories = {
+        f"custom_{directory}_directory": os.path.join(context.plugins_directory, "custom_data_docs", directory)
+        for directory in ["styles", "views"]
+        if context.plugins_directory
+        and os.path.isdir(os.path.join(context.plugins_directory, "custom_data_docs", directory))
+    }
+
+    return DefaultJinjaIndexPageView(**custom_data_docs_directories).render(
+        SiteIndexPageRenderer.render(index_links_dict),
+        data_context_id=context.data_context_id,
+        show_how_to_buttons=context.variables.data_docs_sites[site_name].get("show_how_to_buttons", True),
+    )
+
+
+def build_data_docs(context, site_name="local_site", manifest_file_path=DATA_DOCS_MANIFEST_FILE):
+    """Build the data docs site incrementally.
+
+    Only the suites & validation results whose JSON changed since the last build (per the manifest of their hashes),
+    or whose page is missing, are re-rendered. The index page is then rendered from the manifest.
+    """
+    manifest = {"expectations": {}, "validations": {}}
+    if os.path.exists(manifest_file_path):
+        with open(manifest_file_path) as file:
+            manifest = json.load(file)
+
+    site_directory = get_site_directory(context, site_name)
+    changed_keys, removed_filepaths = [], []
+    for section, store in [("expectations", context.expectations_store), ("validations", context.validations_store)]:
+        entries = {}
+        for key in store.list_keys():
+            key_str = "/".join(key.to_tuple())
+            resource_hash = get_resource_hash(store, key)
+            entry = manifest[section].get(key_str)
+            if (
+                entry is None
+                or entry["hash"] != resource_hash
+                or not os.path.exists(os.path.join(site_directory, urllib.parse.unquote(entry["link"]["filepath"])))
+            ):
+                entry = {"hash": resource_hash, "link": get_index_link(context, key)}
+                changed_keys.append(key)
+            entries[key_str] = entry
+
+        removed_filepaths.extend(
+            entry["link"]["filepath"] for key_str, entry in manifest[section].items() if key_str not in entries
+        )
+        manifest[section] = entries
+
+    if changed_keys:
+        with tracing.span("docs"):
+            context.build_data_docs(site_names=[site_name], resource_identifiers=changed_keys, build_index=False)
+
+    # Remove the pages of deleted suites & validation results, as GX's full build does
+    for filepath in removed_filepaths:
+        page_path = os.path.join(site_directory, urllib.parse.unquote(filepath))
+        if os.path.exists(page_path):
+            os.remove(page_path)
+
+    with tracing.span("docs_index"):
+        common.write_file_atomically(
+            os.path.join(site_directory, "index.html"), render_index_page(context, site_name, manifest)
+        )
+    common.write_file_atomically(manifest_file_path, json.dumps(manifest, indent=2, sort_keys=True))
+    logger.info(
+        f"Data docs: {len(changed_keys)} page(s) re-rendered, {len(removed_filepaths)} removed & the index page "
+        f"rendered from the manifest ({len(manifest['expectations'])} suites, "
+        f"{len(manifest['validations'])} validation results)."
+    )
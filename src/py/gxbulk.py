@@ -0,0 +1,145 @@
+import argparse
+import importlib
+import os
+import re
+import subprocess
+import sys
+from time import time
+
+import common
+import run_journal
+
+# Set up logging
+logger = common.get_logger()
+
+# stage -> (module, entry point, whether the entry point takes the --force, --resume & --tables arguments)
+STAGES = {
+    "load": ("create_gx_snowflake_table_loader", "add_snowflake_tables_to_gx", False),
+    "profile": ("create_gx_data_profiler", "main", True),
+    "suite": ("create_gx_expectation_suite", "main", True),
+    "docs": ("update_gx_data_docs", "main", False),
+}
+PIPELINE = ["load", "profile", "suite", "docs"]
+
+IMPORTTIME_LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def run_stage(stage, force=False, run_id=None, tables=None):
+    """Import the stage's module (on first use) and run its entry point - as part of the run run_id, if given (see
+    run_journal), and for the given tables rather than config.yaml's input_tables."""
+    module_name, entry_point, takes_force = STAGES[stage]
+
+    START_TIME = time()
+    module = importlib.import_module(module_name)
+    logger.debug(f"Imported {module_name} in {time() - START_TIME:.2f} seconds.")
+
+    START_TIME = time()
+    if takes_force:
+        getattr(module, entry_point)(
+            [
+                *(["--force"] if force else []),
+                *(["--resume", run_id] if run_id else []),
+                *(["--tables", *tables] if tables else []),
+            ]
+        )
+    else:
+        getattr(module, entry_point)()
+
+    return time() - START_TIME
+
+
+def report_startup(stages, top_n=15):
+    """Log an `-X importtime` report of the stages' module imports: the total, and the modules' slowest imports."""
+    module_names = [STAGES[stage][0] for stage in stages]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.dirname(os.path.abspath(__file__)), *sys.path])}
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(module_names)}"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    # importtime lists each import after the imports it triggered, indented by 2 spaces per level. Keep the imports
+    # under the stage modules, by (top-level) package - the outermost import of a package has its cumulative time.
+    script_dir_modules = {os.path.splitext(filename)[0] for filename in os.listdir(os.path.dirname(__file__) or ".")}
+    stage_module_time, package_times, pending_package_times = 0, {}, {}
+    for line in completed_process.stderr.splitlines():
+        match = IMPORTTIME_LINE_PATTERN.match(line)
+        if not match:
+            continue
+        level, cumulative, package = len(match.group(3)) // 2, int(match.group(2)), match.group(4).split(".")[0]
+        if level > 0:
+            if package not in script_dir_modules:
+                pending_package_times[package] = max(cumulative, pending_package_times.get(package, 0))
+            continue
+
+        if package in module_names:
+            stage_module_time += cumulative
+            for pending_package, pending_time in pending_package_times.items():
+                package_times[pending_package] = max(pending_time, package_times.get(pending_package, 0))
+        pending_package_times = {}
+
+    logger.info(f"Startup report - importing {', '.join(module_names)}: {stage_module_time / 1e6:.2f} seconds")
+    logger.info("Slowest packages to import (cumulative):")
+    for package in sorted(package_times, key=package_times.get, reverse=True)[:top_n]:
+        logger.info(f"    {package}: {package_times[package] / 1e6:.2f} seconds")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run GX bulk pipeline stages in one process, sharing one GX context.",
+        epilog="Stages: load (add the Snowflake tables to GX), profile (data profiles), suite (expectation suites & "
+        "validation), docs (update the data docs) - or all, for load, profile, suite & docs in turn.",
+    )
+    parser.add_argument("stages", nargs="*", metavar="stage", help="The stage(s) to run, in order.")
+    parser.add_argument("--force", action="store_true", help="Profile/suite every table, even if it's unchanged.")
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Resume a failed run: skip the stages - and tables - its run journal records as completed.",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Report the stages' (or, with no stages, the whole pipeline's) import time, via python -X importtime.",
+    )
+    args = parser.parse_args(argv)
+    if not args.stages and not args.startup_report:
+        parser.error("at least one stage is required")
+    for stage in args.stages:
+        if stage not in [*PIPELINE, "all"]:
+            parser.error(f"invalid stage: '{stage}' (choose from {', '.join([*PIPELINE, 'all'])})")
+
+    return args
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    stages = [stage for requested in args.stages for stage in (PIPELINE if requested == "all" else [requested])]
+
+    if args.startup_report:
+        report_startup(stages or PIPELINE)
+    if not stages:
+        return
+
+    # The stages record their tables' progress in the run's journal - and the run, each stage it completes
+    journal = run_journal.RunJournal(args.resume, resume=args.resume is not None)
+    if args.resume is None:
+        journal.record(None, "run", "started", stages=stages)
+    logger.info(f"Run journal: {journal.file_path} (resume with --resume {journal.run_id})")
+
+    stage_times = []
+    for stage in stages:
+        if journal.is_completed(None, stage):
+            logger.info(f"Skipped stage already completed in run {journal.run_id}: {stage}")
+            continue
+        stage_times.append((stage, run_stage(stage, force=args.force, run_id=journal.run_id)))
+        journal.record(None, stage)
+
+    logger.info("Time taken per stage:")
+    for stage, elapsed_time in stage_times:
+        logger.info(f"{stage}: {int(round(elapsed_time, 0))} seconds.")
+
+
+if __name__ == "__main__":
+    main()
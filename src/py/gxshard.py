@@ -0,0 +1,246 @@
+import argparse
+import os
+import shutil
+import socket
+import sys
+import time
+
+import common
+import data_docs_builder
+import gxbulk
+import preflight
+import run_journal
+import run_state
+import shard_coordinator
+import snowflake_client
+import update_gx_data_docs
+
+# Set up logging
+logger = common.get_logger()
+
+WORKERS_DIR = "workers"
+# a worker's area starts as a copy of the project's config.yaml & gx/, without these - its own outputs & caches
+WORKER_AREA_IGNORED = [
+    "data_docs",
+    "data_docs_manifest.json",
+    "validations",
+    "run_reports",
+    "run_journals",
+    "sample_cache",
+    "render_cache",
+]
+# the worker outputs merged into the project's gx/
+MERGED_DIRS = [
+    "gx/expectations",
+    "gx/uncommitted/validations",
+    "gx/uncommitted/data_docs/local_site/profiling_results",
+    "gx/uncommitted/data_docs/local_site/expectation_suite",
+]
+
+
+def get_shard_params(other_params):
+    """Return the shard params - config.yaml's other_params.shard, over the defaults."""
+    return {
+        "dir": "gx/uncommitted/shards",
+        "lease_seconds": 900,
+        "claim_batch_size": 1,
+        "max_attempts": 2,
+        **(other_params.get("shard") or {}),
+    }
+
+
+def init_shards(coordinator, input_tables, other_params):
+    """Register the tables' assets (so the workers' areas include them) and queue the tables - largest first, if
+    preflight.largest_first - removing the previous run's worker areas."""
+    gxbulk.run_stage("load")
+
+    connection_pool = snowflake_client.get_connection_pool(other_params.get("connection_pool"))
+    input_tables = preflight.run_preflight(connection_pool, input_tables, other_params)["input_tables"]
+    connection_pool.close_all()
+
+    shutil.rmtree(os.path.join(os.path.dirname(coordinator.db_path), WORKERS_DIR), ignore_errors=True)
+    coordinator.seed(input_tables)
+    logger.info(f"Queued {len(input_tables)} tables in {coordinator.db_path}.")
+
+
+def create_worker_area(shard_dir, worker_id):
+    """Return the worker's own project directory, creating it from the project's config.yaml & gx/ if it's new."""
+    worker_dir = os.path.join(shard_dir, WORKERS_DIR, worker_id)
+
+    def ignore(dir_path, names):
+        # the shared directory itself, too - it may be under gx/ (as it is by default)
+        return [
+            name
+            for name in names
+            if name in WORKER_AREA_IGNORED or os.path.join(os.path.abspath(dir_path), name) == shard_dir
+        ]
+
+    if not os.path.isdir(worker_dir):
+        shutil.copytree("gx", os.path.join(worker_dir, "gx"), ignore=ignore)
+        shutil.copy2("config.yaml", worker_dir)
+
+    return worker_dir
+
+
+def run_claimed_tables(input_tables, run_id, force=False):
+    """Profile, then create & validate the suites of, the claimed tables. Returns {table: error} for the failed ones.
+
+    The tables that failed are read from the run journal - or, if a stage failed as a whole (e.g. its preflight
+    query), they all failed.
+    """
+    errors = {}
+    for stage, journal_stage in [("profile", "profile"), ("suite", "validate")]:
+        stage_tables = [input_table for input_table in input_tables if input_table not in errors]
+        if not stage_tables:
+            break
+        try:
+            gxbulk.run_stage(stage, force=force, run_id=run_id, tables=stage_tables)
+        except (SystemExit, Exception) as e:
+            journal = run_journal.RunJournal(run_id, resume=True)
+            stage_errors = {
+                input_table: journal.get(input_table, journal_stage).get("error")
+                for input_table in stage_tables
+                if journal.get(input_table, journal_stage).get("status") == "failed"
+            }
+            errors.update(
+                stage_errors or {input_table: f"The '{stage}' stage failed: {e!r}" for input_table in stage_tables}
+            )
+
+    return errors
+
+
+def run_worker(coordinator, shard_params, worker_id, force=False):
+    """Claim tables and run them in the worker's own area until there are none left to claim.
+
+    While the other workers hold leases, the worker waits - to steal any whose lease expires.
+    """
+    worker_dir = create_worker_area(os.path.dirname(coordinator.db_path), worker_id)
+    os.chdir(worker_dir)
+    journal = run_journal.RunJournal()
+    journal.record(None, "run", "started", worker_id=worker_id)
+    logger.info(f"Worker {worker_id}: running in {worker_dir}.")
+
+    completed_count, failed_count = 0, 0
+    while True:
+        claims = coordinator.claim(worker_id, shard_params["claim_batch_size"], shard_params["max_attempts"])
+        if not claims:
+            if not coordinator.has_unfinished():
+                break
+            time.sleep(min(30, shard_params["lease_seconds"] / 4))
+            continue
+
+        logger.info(f"Worker {worker_id}: claimed {', '.join(claims)}.")
+        with coordinator.keep_alive(claims):
+            errors = run_claimed_tables(list(claims), journal.run_id, force)
+
+        for input_table, lease_token in claims.items():
+            if not coordinator.complete(
+                input_table, lease_token, errors.get(input_table), shard_params["max_attempts"]
+            ):
+                logger.warning(f"Worker {worker_id}: lease on '{input_table}' was lost, so its result isn't recorded.")
+            elif input_table in errors:
+                failed_count += 1
+            else:
+                completed_count += 1
+
+    logger.info(f"Worker {worker_id}: {completed_count} tables completed, {failed_count} failed.")
+
+
+def copy_newer_files(source_dir, target_dir):
+    """Copy the files under source_dir that are missing from target_dir, or newer than its copy. Returns the count."""
+    copied_count = 0
+    for dir_path, _, filenames in os.walk(source_dir):
+        for filename in filenames:
+            source_path = os.path.join(dir_path, filename)
+            target_path = os.path.join(target_dir, os.path.relpath(source_path, source_dir))
+            if os.path.exists(target_path) and os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+                continue
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            # copied alongside, then renamed - so a reader never sees a partial file
+            tmp_path = os.path.join(os.path.dirname(target_path), f".tmp_{filename}")
+            shutil.copy2(source_path, tmp_path)
+            os.replace(tmp_path, target_path)
+            copied_count += 1
+
+    return copied_count
+
+
+def merge_worker_areas(shard_dir):
+    """Merge every worker's suites, validation results, profiles & run state into the project's gx/, then build the
+    data docs - and add their Profiling Results tab - once."""
+    workers_dir = os.path.join(shard_dir, WORKERS_DIR)
+    worker_ids = sorted(os.listdir(workers_dir)) if os.path.isdir(workers_dir) else []
+    table_run_state = run_state.RunState()
+    for worker_id in worker_ids:
+        worker_dir = os.path.join(workers_dir, worker_id)
+        copied_count = sum(
+            copy_newer_files(os.path.join(worker_dir, merged_dir), merged_dir) for merged_dir in MERGED_DIRS
+        )
+        worker_run_state_file = os.path.join(worker_dir, run_state.RUN_STATE_FILE)
+        if os.path.exists(worker_run_state_file):
+            table_run_state.merge(run_state.RunState(worker_run_state_file).state)
+        logger.info(f"Merged {copied_count} files from worker {worker_id}.")
+
+    data_docs_builder.build_data_docs(common.get_gx_context())
+    update_gx_data_docs.update_index_page()
+
+
+def log_status(coordinator):
+    """Log the number of tables per status, and each failed table's error. Returns the number of failed tables."""
+    table_status = coordinator.get_status()
+    status_counts = {}
+    for status, *_ in table_status.values():
+        status_counts[status] = status_counts.get(status, 0) + 1
+    logger.info(
+        f"{len(table_status)} tables: "
+        + ", ".join(f"{count} {status}" for status, count in sorted(status_counts.items()))
+    )
+    for input_table, (status, worker_id, attempts, error) in table_status.items():
+        if status == "failed":
+            logger.error(f"{input_table}: failed after {attempts} attempt(s), last on worker {worker_id} - {error}")
+
+    return status_counts.get("failed", 0)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the profile & suite stages on several worker processes or hosts, which share the table list "
+        "through leases in a shared directory (other_params.shard.dir).",
+        epilog="Commands: init (register the assets & queue the tables), worker (claim & run tables, in the worker's "
+        "own area of the shared directory, until none are left), status (the tables' progress), merge (merge the "
+        "workers' results into gx/ & build the data docs once).",
+    )
+    parser.add_argument("command", choices=["init", "worker", "status", "merge"])
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="Default: host-pid.")
+    parser.add_argument("--force", action="store_true", help="Profile/suite every table, even if it's unchanged.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        input_tables, other_params = common.load_config_from_yaml()
+        shard_params = get_shard_params(other_params)
+        # absolute, as workers run in their own directories
+        shard_dir = os.path.abspath(shard_params["dir"])
+        coordinator = shard_coordinator.ShardCoordinator(shard_dir, shard_params["lease_seconds"])
+
+        if args.command == "init":
+            init_shards(coordinator, input_tables, other_params)
+        elif args.command == "worker":
+            if not coordinator.get_status():
+                raise ValueError("No tables queued - run 'gxshard.py init' first.")
+            run_worker(coordinator, shard_params, args.worker_id, args.force)
+        elif args.command == "merge":
+            merge_worker_areas(shard_dir)
+        failed_count = log_status(coordinator)
+    except Exception as e:
+        logger.error(f"\nAn error occurred: {e}")
+        sys.exit(1)
+
+    if args.command in ["status", "merge"] and failed_count:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
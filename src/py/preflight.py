@@ -0,0 +1,107 @@
+import copy
+import math
+
+import common
+import snowflake_client
+
+# Set up logging
+logger = common.get_logger()
+
+
+def choose_sampling(row_count, table_params, preflight_params):
+    """Choose a table's sampling config from its row count, or return None to keep the configured sampling.
+
+    Tables with no more rows than row_count_limit are read whole ('limit') - sampling them would only add work. Tables
+    of more than block_sampling_min_rows rows that are configured with a sample that scans every row ('row' or
+    'bernoulli') get a 'block' sample instead, sized to return about block_sampling_oversample times row_count_limit
+    rows (capped by the LIMIT) - so Snowflake only reads the sampled micro-partitions.
+    """
+    if row_count is None:
+        return None
+
+    row_count_limit = table_params["row_count_limit"]
+    sampling = table_params.get("sampling") or {}
+    if row_count <= row_count_limit:
+        return {"mode": "limit"}
+    full_scan_sample = sampling.get("mode") in ["row", "bernoulli"]
+    if full_scan_sample and row_count > preflight_params.get("block_sampling_min_rows", 10_000_000):
+        oversample = preflight_params.get("block_sampling_oversample", 2)
+        # Snowflake's sample percent has at most 6 decimal places
+        percent = min(100, math.ceil(100 * oversample * row_count_limit / row_count * 1e6) / 1e6)
+        return {"mode": "block", "percent": percent, "seed": sampling.get("seed", 0)}
+
+    return None
+
+
+def expand_input_tables(conn, input_tables):
+    """Expand the glob patterns in input_tables (e.g. 'dim_*') to the current schema's tables they match. The schema's
+    tables are only listed if there is a pattern."""
+    if not any(common.is_table_pattern(input_table) for input_table in input_tables):
+        return input_tables
+
+    input_tables = common.expand_table_patterns(input_tables, snowflake_client.list_tables(conn))
+    if not input_tables:
+        raise ValueError("No tables match input_tables.")
+    return input_tables
+
+
+def run_preflight(connection_pool, input_tables, other_params):
+    """Read every input table's columns, types, row count & size with one INFORMATION_SCHEMA query, before any rows.
+
+    Glob patterns in input_tables (e.g. 'dim_*') are first expanded to the current schema's tables they match.
+
+    Returns a dict of:
+        - input_tables: the (expanded) tables in the order to run them - largest (by bytes) first, if
+          preflight.largest_first
+        - empty_tables: the tables with no rows, to skip if preflight.skip_empty_tables
+        - other_params: other_params, with each table's sampling chosen from its row count (see choose_sampling) as
+          a table_params override, if preflight.adaptive_sampling. A table's own sampling override is kept.
+        - table_stats: the tables' stats, from snowflake_client.get_table_stats
+    Tables missing from INFORMATION_SCHEMA (e.g. in another schema) are kept as they are.
+    """
+    preflight_params = other_params.get("preflight") or {}
+    with connection_pool.connection() as conn:
+        input_tables = expand_input_tables(conn, input_tables)
+        table_stats = snowflake_client.get_table_stats(conn, input_tables)
+
+    def get_stat(input_table, key):
+        return (table_stats.get(input_table.upper()) or {}).get(key)
+
+    empty_tables = []
+    if preflight_params.get("skip_empty_tables"):
+        empty_tables = [input_table for input_table in input_tables if get_stat(input_table, "row_count") == 0]
+
+    ordered_tables = list(input_tables)
+    if preflight_params.get("largest_first"):
+        # tables without a size (e.g. views) go last, in their configured order
+        ordered_tables.sort(key=lambda input_table: -(get_stat(input_table, "bytes") or -1))
+
+    planned_params = other_params
+    if preflight_params.get("adaptive_sampling"):
+        planned_params = copy.deepcopy(other_params)
+        planned_params["table_params"] = planned_params.get("table_params") or {}
+        for input_table in input_tables:
+            table_overrides = planned_params["table_params"].get(input_table) or {}
+            if "sampling" in table_overrides:
+                continue
+            table_params = common.get_table_params(other_params, input_table)
+            sampling = choose_sampling(get_stat(input_table, "row_count"), table_params, preflight_params)
+            if sampling is not None and sampling != table_params.get("sampling"):
+                planned_params["table_params"][input_table] = {**table_overrides, "sampling": sampling}
+
+    logger.info(
+        f"Preflight: {len(table_stats)} of {len(input_tables)} tables found in INFORMATION_SCHEMA, "
+        f"{len(empty_tables)} empty table(s) to skip."
+    )
+    for input_table in ordered_tables:
+        logger.debug(
+            f"{input_table}: {get_stat(input_table, 'row_count')} rows, {get_stat(input_table, 'bytes')} bytes, "
+            f"sampling {common.get_table_params(planned_params, input_table).get('sampling')}"
+        )
+
+    return {
+        "input_tables": ordered_tables,
+        "empty_tables": empty_tables,
+        "other_params": planned_params,
+        "table_stats": table_stats,
+    }
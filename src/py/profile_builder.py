@@ -0,0 +1,210 @@
+from datetime import datetime
+from datetime import timezone
+
+import great_expectations as gx
+from great_expectations.core import ExpectationConfiguration
+from great_expectations.core import ExpectationSuite
+from great_expectations.core import ExpectationSuiteValidationResult
+from great_expectations.core import ExpectationValidationResult
+from great_expectations.core.profiler_types_mapping import ProfilerTypeMapping
+from great_expectations.core.util import convert_to_json_serializable
+
+# Quantiles reported for numeric columns - the renderer labels 0.25/0.5/0.75 as Q1/Median/Q3
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# The type_list for each column type, as used by the renderers to label a column's type
+TYPE_LISTS = {
+    "int": sorted(ProfilerTypeMapping.INT_TYPE_NAMES),
+    "float": sorted(ProfilerTypeMapping.FLOAT_TYPE_NAMES),
+    "string": sorted(ProfilerTypeMapping.STRING_TYPE_NAMES),
+    "datetime": sorted(ProfilerTypeMapping.DATETIME_TYPE_NAMES),
+    "bool": sorted(ProfilerTypeMapping.BOOLEAN_TYPE_NAMES),
+}
+
+
+def _percent(count, total):
+    return 100.0 * count / total if total else None
+
+
+def _build_evr(expectation_type, kwargs, result, profiler_name, success=True):
+    expectation_config = ExpectationConfiguration(
+        expectation_type=expectation_type,
+        kwargs={**kwargs, "result_format": "SUMMARY"},
+        meta={profiler_name: {"confidence": "very low"}},
+    )
+    return ExpectationValidationResult(
+        success=success,
+        expectation_config=expectation_config,
+        result=convert_to_json_serializable(result),
+        exception_info={"raised_exception": False, "exception_message": None, "exception_traceback": None},
+    )
+
+
+def build_column_evrs(column_stats, row_count, profiler_name):
+    """Build a column's validation results (EVRs) from its stats, matching BasicDatasetProfiler's output.
+
+    column_stats keys: column, type ('int', 'float', 'string', 'datetime', 'bool' or 'unknown'), type_name,
+    null_count, distinct_count and - where known - min, max, mean, stdev, quantiles (values for QUANTILES) and
+    top_values (a list of (value, count) pairs, most frequent first).
+    """
+    column, column_type = column_stats["column"], column_stats["type"]
+    null_count, distinct_count = column_stats["null_count"], column_stats["distinct_count"]
+    nonnull_count = row_count - null_count
+    missing = {
+        "element_count": row_count,
+        "missing_count": null_count,
+        "missing_percent": _percent(null_count, row_count),
+    }
+
+    evrs = [
+        _build_evr(
+            "expect_column_values_to_be_in_type_list",
+            {"column": column, "type_list": TYPE_LISTS.get(column_type)},
+            {"observed_value": column_stats.get("type_name", column_type)},
+            profiler_name,
+        ),
+        _build_evr(
+            "expect_column_unique_value_count_to_be_between",
+            {"column": column, "min_value": None, "max_value": None},
+            {"observed_value": distinct_count, **missing},
+            profiler_name,
+        ),
+        _build_evr(
+            "expect_column_proportion_of_unique_values_to_be_between",
+            {"column": column, "min_value": None, "max_value": None},
+            {"observed_value": distinct_count / nonnull_count if nonnull_count else None, **missing},
+            profiler_name,
+        ),
+        _build_evr(
+            "expect_column_values_to_not_be_null",
+            {"column": column},
+            {
+                "element_count": row_count,
+                "unexpected_count": null_count,
+                "unexpected_percent": _percent(null_count, row_count),
+                "unexpected_percent_total": _percent(null_count, row_count),
+                "partial_unexpected_list": [],
+            },
+            profiler_name,
+        ),
+    ]
+
+    for stat in ["min", "max", "mean", "stdev"]:
+        if column_stats.get(stat) is not None:
+            evrs.append(
+                _build_evr(
+                    f"expect_column_{stat}_to_be_between",
+                    {"column": column, "min_value": None, "max_value": None},
+                    {"observed_value": column_stats[stat], **missing},
+                    profiler_name,
+                )
+            )
+
+    if column_stats.get("quantiles") is not None:
+        evrs.append(
+            _build_evr(
+                "expect_column_quantile_values_to_be_between",
+                {
+                    "column": column,
+                    "quantile_ranges": {"quantiles": QUANTILES, "value_ranges": [[None, None] for _ in QUANTILES]},
+                },
+                {"observed_value": {"quantiles": QUANTILES, "values": column_stats["quantiles"]}, **missing},
+                profiler_name,
+            )
+        )
+
+    top_values = column_stats.get("top_values")
+    if top_values:
+        value_counts = [{"value": value, "count": count} for value, count in top_values]
+        if distinct_count <= len(top_values):
+            # the top values are every distinct value, so they can be charted as the full value set
+            evrs.append(
+                _build_evr(
+                    "expect_column_distinct_values_to_be_in_set",
+                    {"column": column, "value_set": None},
+                    {
+                        "observed_value": [value for value, _ in top_values],
+                        "element_count": row_count,
+                        "missing_count": null_count,
+                        "missing_percent": _percent(null_count, row_count),
+                        "details": {"value_counts": value_counts},
+                    },
+                    profiler_name,
+                )
+            )
+        evrs.append(
+            _build_evr(
+                "expect_column_values_to_be_in_set",
+                {"column": column, "value_set": []},
+                {
+                    **missing,
+                    "unexpected_count": nonnull_count,
+                    "unexpected_percent": 100.0 if nonnull_count else 0.0,
+                    "partial_unexpected_list": [value for value, _ in top_values],
+                    "partial_unexpected_counts": value_counts,
+                },
+                profiler_name,
+                success=nonnull_count == 0,
+            )
+        )
+
+    return evrs
+
+
+def build_profiling_results(input_table, row_count, columns_stats, profiler_name):
+    """Build an (expectation suite, validation result) pair from per-column stats.
+
+    The result has the same structure as BasicDatasetProfiler's, so ProfilingResultsPageRenderer and
+    ExpectationSuitePageRenderer can render it as-is.
+    """
+    columns = [column_stats["column"] for column_stats in columns_stats]
+
+    evrs = [
+        _build_evr(
+            "expect_table_row_count_to_be_between",
+            {"min_value": 0, "max_value": None},
+            {"observed_value": row_count},
+            profiler_name,
+        ),
+        _build_evr(
+            "expect_table_columns_to_match_ordered_list",
+            {"column_list": None},
+            {"observed_value": columns},
+            profiler_name,
+        ),
+    ]
+    for column_stats in columns_stats:
+        evrs.extend(build_column_evrs(column_stats, row_count, profiler_name))
+
+    suite_meta = {
+        "great_expectations_version": gx.__version__,
+        "columns": {column: {"description": ""} for column in columns},
+        profiler_name: {"created_by": profiler_name, "created_at": datetime.now().timestamp()},
+    }
+    expectation_suite = ExpectationSuite(
+        expectation_suite_name=input_table,
+        expectations=[evr.expectation_config for evr in evrs],
+        meta=suite_meta,
+        data_context=None,
+    )
+
+    successful_count = sum(evr.success for evr in evrs)
+    validation_result = ExpectationSuiteValidationResult(
+        success=successful_count == len(evrs),
+        results=evrs,
+        statistics={
+            "evaluated_expectations": len(evrs),
+            "successful_expectations": successful_count,
+            "unsuccessful_expectations": len(evrs) - successful_count,
+            "success_percent": _percent(successful_count, len(evrs)),
+        },
+        meta={
+            "great_expectations_version": gx.__version__,
+            "expectation_suite_name": input_table,
+            "run_id": {"run_name": "profiling", "run_time": datetime.now(timezone.utc).isoformat()},
+            "batch_kwargs": {"data_asset_name": input_table},
+            "expectation_suite_meta": suite_meta,
+        },
+    )
+
+    return expectation_suite, validation_result
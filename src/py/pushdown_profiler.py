@@ -0,0 +1,89 @@
+import json
+
+import common
+import profile_builder
+import snowflake_client
+import sql_builder
+import tracing
+
+# Set up logging
+logger = common.get_logger()
+
+PROFILER_NAME = "SqlPushdownProfiler"
+
+
+def get_column_type(snowflake_type_name, scale):
+    """Map a Snowflake type to a profiler column type: int, float, string, datetime, bool or unknown."""
+    if snowflake_type_name == "FIXED":
+        return "int" if not scale else "float"
+    if snowflake_type_name == "REAL":
+        return "float"
+    if snowflake_type_name == "TEXT":
+        return "string"
+    if snowflake_type_name == "BOOLEAN":
+        return "bool"
+    if snowflake_type_name == "DATE" or snowflake_type_name.startswith("TIMESTAMP"):
+        return "datetime"
+    return "unknown"
+
+
+def parse_profile_row(row, select_keys):
+    """Turn the aggregate query's result row into (row_count, {column: {metric: value}})."""
+    row_count, metrics_by_column = None, {}
+    for (column, metric), value in zip(select_keys, row):
+        if column is None:
+            row_count = value
+        elif isinstance(metric, tuple):
+            metrics_by_column.setdefault(column, {}).setdefault("quantiles", []).append(value)
+        elif metric == "top_values":
+            # APPROX_TOP_K returns a JSON array of [value, count] pairs
+            top_values = json.loads(value) if isinstance(value, str) else value
+            metrics_by_column.setdefault(column, {})[metric] = [tuple(pair) for pair in top_values or []]
+        else:
+            metrics_by_column.setdefault(column, {})[metric] = value
+
+    return row_count, metrics_by_column
+
+
+def profile_table(conn, input_table, columns=None, top_k=10):
+    """Profile the whole table with a single aggregate query, returning (expectation suite, validation result).
+
+    Null counts, approximate distinct counts, min/max/mean, approximate quantiles and approximate top-k values are
+    all computed in the warehouse, so no rows are transferred to the client.
+    """
+    snowflake_column_types = [
+        (column, snowflake_type_name, scale)
+        for column, snowflake_type_name, scale in snowflake_client.get_table_column_types(conn, input_table)
+        if columns is None or column in columns
+    ]
+    column_types = [
+        (column, get_column_type(snowflake_type_name, scale))
+        for column, snowflake_type_name, scale in snowflake_column_types
+    ]
+    sql_query, select_keys = sql_builder.build_column_profile_query(
+        input_table, column_types, profile_builder.QUANTILES, top_k
+    )
+    logger.debug(sql_query)
+
+    snowflake_cursor = conn.cursor()
+    with tracing.span("query") as query_span:
+        snowflake_cursor.execute(sql_query)
+        row_count, metrics_by_column = parse_profile_row(snowflake_cursor.fetchone(), select_keys)
+        query_span["rows"] = row_count
+    snowflake_cursor.close()
+
+    columns_stats = []
+    for (column, column_type), (_, snowflake_type_name, _) in zip(column_types, snowflake_column_types):
+        metrics = metrics_by_column[column]
+        columns_stats.append(
+            {
+                "column": column,
+                "type": column_type,
+                "type_name": snowflake_type_name,
+                "null_count": row_count - metrics["nonnull_count"],
+                **{key: value for key, value in metrics.items() if key != "nonnull_count"},
+            }
+        )
+
+    with tracing.span("profile"):
+        return profile_builder.build_profiling_results(input_table, row_count, columns_stats, PROFILER_NAME)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+RENDER_CACHE_DIR = "gx/uncommitted/render_cache"
+RENDER_KEY_PREFIX = "<!-- render_key: "
+
+
+def get_render_key(page_type, input_table, expectation_or_result_dicts):
+    """Hash a page's inputs - the suite's expectations or the validation results - ignoring run ids & timestamps."""
+    content = json.dumps(expectation_or_result_dicts, sort_keys=True, default=str)
+    return hashlib.sha256(f"{page_type}:{input_table}:{content}".encode()).hexdigest()
+
+
+def read_render_key(html_file_path):
+    """Return the render key stamped on the last line of an HTML page, or None."""
+    try:
+        with open(html_file_path, "rb") as file:
+            file.seek(max(0, os.path.getsize(html_file_path) - 128))
+            last_line = file.read().decode(errors="ignore").rstrip().rsplit("\n", 1)[-1]
+    except FileNotFoundError:
+        return None
+
+    if last_line.startswith(RENDER_KEY_PREFIX):
+        prefix_length = len(RENDER_KEY_PREFIX)
+        return last_line[prefix_length:].split(" ", 1)[0]
+    return None
+
+
+def get_or_render(render_key, render_func):
+    """Return the cached HTML for render_key, or call render_func() and cache its HTML.
+
+    The returned HTML is stamped with its render key on the last line (an HTML comment).
+    """
+    cache_file_path = os.path.join(RENDER_CACHE_DIR, f"{render_key}.html")
+    if os.path.exists(cache_file_path):
+        os.utime(cache_file_path)  # keep recently used entries when the cache is pruned
+        with open(cache_file_path) as file:
+            return file.read()
+
+    html = f"{render_func()}\n{RENDER_KEY_PREFIX}{render_key} -->\n"
+    common.write_file_atomically(cache_file_path, html)
+
+    return html
+
+
+def prune_render_cache(max_entries=1000):
+    """Delete the least recently used cache entries beyond max_entries."""
+    if not os.path.isdir(RENDER_CACHE_DIR):
+        return
+
+    cache_file_paths = sorted(
+        (os.path.join(RENDER_CACHE_DIR, filename) for filename in os.listdir(RENDER_CACHE_DIR)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for cache_file_path in cache_file_paths[max_entries:]:
+        os.remove(cache_file_path)
+        logger.debug(f"Removed render cache entry: {cache_file_path}")
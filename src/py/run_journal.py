@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import common
+import tracing
+
+# Set up logging
+logger = common.get_logger()
+
+RUN_JOURNAL_DIR = "gx/uncommitted/run_journals"
+
+# the journals of the runs started in this process - whose stages (e.g. run in turn by bench_pipeline) share them
+_started_journals = set()
+
+
+class RunJournal:
+    """Append-only journal of the work a run has completed (or failed): a JSON line per (table, stage) entry - e.g.
+    ('dim_card', 'profile') - or, with a table of None, per pipeline stage (see gxbulk).
+
+    Each entry is appended with a single write & fsync, so a crash can at most leave a partial last line - which is
+    dropped when the journal is next opened. A run resumed with its run id appends to its journal, and skips the work
+    it records as completed - a run that isn't resumed mustn't have a journal already (other than one started by this
+    process).
+    """
+
+    def __init__(self, run_id=None, resume=False):
+        self.run_id = run_id or tracing.RUN_ID
+        self.file_path = os.path.join(RUN_JOURNAL_DIR, f"{self.run_id}.jsonl")
+        self._lock = threading.Lock()
+        self.entries = {}  # (table, stage) -> its last entry
+        if resume:
+            if not os.path.exists(self.file_path):
+                raise ValueError(f"No run journal to resume for run '{self.run_id}' (no {self.file_path}).")
+        elif os.path.abspath(self.file_path) not in _started_journals:
+            if os.path.exists(self.file_path):
+                # its completed work would be skipped - as if it were resumed
+                raise ValueError(f"Run '{self.run_id}' already has a run journal ({self.file_path}) - resume it.")
+            _started_journals.add(os.path.abspath(self.file_path))
+        if os.path.exists(self.file_path):
+            self._load()
+
+    def _load(self):
+        with open(self.file_path, "rb") as file:
+            content = file.read()
+
+        complete_length = content.rfind(b"\n") + 1
+        if complete_length < len(content):
+            # a crash mid-append - drop the partial entry, so the next one starts on a line of its own
+            logger.warning(f"Dropped a partial entry at the end of the run journal {self.file_path}.")
+            with open(self.file_path, "r+b") as file:
+                file.truncate(complete_length)
+
+        for line in content[:complete_length].splitlines():
+            entry = json.loads(line)
+            self.entries[(entry["table"], entry["stage"])] = entry
+
+    def get(self, input_table, stage):
+        """Return the table's (or, with a table of None, the run's) last entry for the stage, or an empty dict."""
+        return self.entries.get((input_table, stage), {})
+
+    def is_completed(self, input_table, stage):
+        """True if the journal records the stage as completed for the table (or, with a table of None, the run)."""
+        return self.get(input_table, stage).get("status") == "completed"
+
+    def record(self, input_table, stage, status="completed", **details):
+        """Append an entry for the table's (or, with a table of None, the run's) stage."""
+        entry = {
+            "table": input_table,
+            "stage": stage,
+            "status": status,
+            "at": datetime.now().isoformat(timespec="seconds"),
+            **details,
+        }
+        line = (json.dumps(entry, sort_keys=True, default=str) + "\n").encode()
+        with self._lock:
+            os.makedirs(RUN_JOURNAL_DIR, exist_ok=True)
+            fd = os.open(self.file_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.entries[(input_table, stage)] = entry
+
+    def record_failures(self, results, stage):
+        """Record the failed tables of a table_runner run, with their errors."""
+        for result in results:
+            if result["status"] == "failed":
+                self.record(result["table"], stage, "failed", error=result["error"])
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+RUN_STATE_FILE = "gx/uncommitted/run_state.json"
+
+# config params that change the sample (and so the profile/suite) even if the table itself is unchanged
+FINGERPRINT_PARAMS = [
+    "row_count_limit",
+    "sampling",
+    "cols_to_include",
+    "cols_to_exclude",
+    "profiler_backend",
+    "partitions",
+    "partition_by",
+]
+
+
+def get_params_fingerprint_source(table_params):
+    """Return the table's params that are part of its fingerprints."""
+    return {key: table_params.get(key) for key in FINGERPRINT_PARAMS}
+
+
+def get_table_fingerprints(table_stats, input_tables, other_params):
+    """Fingerprint each input table from its Snowflake metadata (LAST_ALTERED, ROW_COUNT, BYTES - see
+    snowflake_client.get_table_stats) and sampling params.
+
+    Tables without table-level metadata (e.g. views) get a fingerprint of None, so they are never skipped.
+    """
+    fingerprints = {}
+    for input_table in input_tables:
+        stats = table_stats.get(input_table.upper())
+        if not stats or stats["row_count"] is None:
+            fingerprints[input_table] = None
+            continue
+
+        table_params = common.get_table_params(other_params, input_table)
+        fingerprint_source = {
+            **{key: stats[key] for key in ["last_altered", "row_count", "bytes"]},
+            "params": get_params_fingerprint_source(table_params),
+        }
+        fingerprints[input_table] = hashlib.sha256(
+            json.dumps(fingerprint_source, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    return fingerprints
+
+
+def get_schema_fingerprints(table_stats, input_tables, other_params):
+    """Fingerprint each input table's schema - its columns & their types - and sampling params, but not its data.
+
+    Tables that aren't found in INFORMATION_SCHEMA get a fingerprint of None.
+    """
+    fingerprints = {}
+    for input_table in input_tables:
+        stats = table_stats.get(input_table.upper())
+        if not stats or not stats["columns"]:
+            fingerprints[input_table] = None
+            continue
+
+        table_params = common.get_table_params(other_params, input_table)
+        fingerprint_source = {"columns": stats["columns"], "params": get_params_fingerprint_source(table_params)}
+        fingerprints[input_table] = hashlib.sha256(
+            json.dumps(fingerprint_source, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    return fingerprints
+
+
+class RunState:
+    """Per-table record of the fingerprint each stage ('profile', 'suite') last completed with."""
+
+    def __init__(self, file_path=RUN_STATE_FILE):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(file_path):
+            with open(file_path) as file:
+                self.state = json.load(file)
+
+    def get(self, input_table, stage):
+        """Return what was recorded for the table's stage, or an empty dict."""
+        return self.state.get(input_table, {}).get(stage, {})
+
+    def is_unchanged(self, input_table, stage, fingerprint):
+        """True if the stage last completed for the table with the same (known) fingerprint."""
+        return fingerprint is not None and self.get(input_table, stage).get("fingerprint") == fingerprint
+
+    def record(self, input_table, stage, fingerprint, **details):
+        """Record that the table's stage completed with the given fingerprint, and save the state."""
+        with self._lock:
+            self.state.setdefault(input_table, {})[stage] = {
+                "fingerprint": fingerprint,
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+                **details,
+            }
+            common.write_file_atomically(self.file_path, json.dumps(self.state, indent=2, sort_keys=True))
+
+    def merge(self, other_state):
+        """Merge another run state's entries (e.g. a gxshard worker's) into this one - the most recently completed
+        entry of each table's stage wins - and save the state."""
+        with self._lock:
+            for input_table, stages in other_state.items():
+                for stage, entry in stages.items():
+                    current_entry = self.state.get(input_table, {}).get(stage, {})
+                    if entry.get("completed_at", "") > current_entry.get("completed_at", ""):
+                        self.state.setdefault(input_table, {})[stage] = entry
+            common.write_file_atomically(self.file_path, json.dumps(self.state, indent=2, sort_keys=True))
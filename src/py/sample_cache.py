@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import common
+import tracing
+
+# Set up logging
+logger = common.get_logger()
+
+SAMPLE_CACHE_DIR = "gx/uncommitted/sample_cache"
+
+
+def get_sample_key(input_table, sql_query, fingerprint):
+    """Hash what a sample depends on - the table, its sampling query and the table's fingerprint (see run_state)."""
+    return hashlib.sha256(f"{input_table}:{sql_query}:{fingerprint}".encode()).hexdigest()
+
+
+def get_sample_file_path(sample_key):
+    return os.path.join(SAMPLE_CACHE_DIR, f"{sample_key}.arrow")
+
+
+def read_sample(sample_key, ttl_seconds=86400):
+    """Return the cached sample as a DataFrame, or None if there's none (or it's older than ttl_seconds).
+
+    The Arrow IPC file is memory-mapped, so columns that pandas can use as they are (e.g. numbers without nulls) are
+    never copied into memory.
+    """
+    import pyarrow as pa
+
+    cache_file_path = get_sample_file_path(sample_key)
+    try:
+        # an entry's mtime is when it was written - its atime is when it was last used (see prune_sample_cache)
+        if time.time() - os.path.getmtime(cache_file_path) > ttl_seconds:
+            return None
+        with tracing.span("sample_cache") as cache_span:
+            with pa.memory_map(cache_file_path) as source:
+                arrow_table = pa.ipc.open_file(source).read_all()
+            df = arrow_table.to_pandas(split_blocks=True)
+            cache_span["rows"], cache_span["bytes"] = len(df), os.path.getsize(cache_file_path)
+    except FileNotFoundError:
+        return None
+
+    os.utime(cache_file_path, (time.time(), os.path.getmtime(cache_file_path)))
+    logger.debug(f"Sample read from the cache: {cache_file_path}")
+    return df
+
+
+def write_sample(sample_key, df):
+    """Write the sample to the cache as an Arrow IPC file, in one atomic write.
+
+    Samples that Arrow can't convert (e.g. columns of mixed types) are just not cached.
+    """
+    import pyarrow as pa
+
+    try:
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.debug(f"Sample not cached - it can't be converted to Arrow: {e}")
+        return
+
+    cache_file_path = get_sample_file_path(sample_key)
+    os.makedirs(SAMPLE_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SAMPLE_CACHE_DIR, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as file, pa.ipc.new_file(file, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        os.replace(tmp_path, cache_file_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def get_or_fetch(input_table, sql_query, fingerprint, sample_cache_params, fetch_func):
+    """Return the table's cached sample, or call fetch_func() and cache the DataFrame it returns.
+
+    Nothing is cached without sample_cache_params (i.e. the cache is disabled) or a fingerprint (e.g. for views,
+    whose changes can't be detected).
+    """
+    if not sample_cache_params or fingerprint is None:
+        return fetch_func()
+
+    sample_key = get_sample_key(input_table, sql_query, fingerprint)
+    df = read_sample(sample_key, sample_cache_params.get("ttl_seconds", 86400))
+    if df is None:
+        df = fetch_func()
+        write_sample(sample_key, df)
+
+    return df
+
+
+def prune_sample_cache(ttl_seconds=86400, max_size_mb=2048):
+    """Delete the cache entries older than ttl_seconds, then the least recently used beyond max_size_mb in total."""
+    if not os.path.isdir(SAMPLE_CACHE_DIR):
+        return
+
+    now = time.time()
+    cache_entries = []  # (last used, size, path)
+    for filename in os.listdir(SAMPLE_CACHE_DIR):
+        if not filename.endswith(".arrow"):
+            continue  # e.g. a sample that is still being written
+        cache_file_path = os.path.join(SAMPLE_CACHE_DIR, filename)
+        stat = os.stat(cache_file_path)
+        if now - stat.st_mtime > ttl_seconds:
+            os.remove(cache_file_path)
+            logger.debug(f"Removed expired sample cache entry: {cache_file_path}")
+        else:
+            cache_entries.append((stat.st_atime, stat.st_size, cache_file_path))
+
+    total_size = 0
+    for _, size, cache_file_path in sorted(cache_entries, reverse=True):
+        total_size += size
+        if total_size > max_size_mb * 1024 * 1024:
+            os.remove(cache_file_path)
+            logger.debug(f"Removed sample cache entry: {cache_file_path}")
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import common
+
+# Set up logging
+logger = common.get_logger()
+
+COORDINATOR_DB_FILE = "coordinator.db"
+
+
+class ShardCoordinator:
+    """Table leases for a sharded run, held in a SQLite database in a directory shared by the workers (see gxshard).
+
+    A worker claims tables - the pending ones, in priority order, or those whose lease has expired (e.g. their worker
+    died), which it steals - renews its leases while it works, and completes them. Each claim has a token of its own,
+    so a worker whose lease expired (and was stolen) can't complete the table.
+    """
+
+    def __init__(self, shard_dir, lease_seconds=900):
+        self.db_path = os.path.join(shard_dir, COORDINATOR_DB_FILE)
+        self.lease_seconds = lease_seconds
+        os.makedirs(shard_dir, exist_ok=True)
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "table_name TEXT PRIMARY KEY, priority INTEGER, status TEXT, worker_id TEXT, lease_token TEXT, "
+                "lease_expires_at REAL, attempts INTEGER DEFAULT 0, error TEXT)"
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction - BEGIN IMMEDIATE takes the database's write lock up front, so claims don't race."""
+        db = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def seed(self, input_tables):
+        """Replace the tables to run with input_tables, all pending - in priority order."""
+        with self._transaction() as db:
+            db.execute("DELETE FROM leases")
+            db.executemany(
+                "INSERT INTO leases (table_name, priority, status) VALUES (?, ?, 'pending')",
+                [(input_table, priority) for priority, input_table in enumerate(input_tables)],
+            )
+
+    def claim(self, worker_id, count=1, max_attempts=2):
+        """Lease up to count tables to the worker: pending tables, then those whose lease has expired (stolen from
+        their worker) - unless they've been tried max_attempts times already. Returns {table: lease token}.
+
+        Every claim is an attempt, steals included: a lease that isn't renewed usually means its worker died running
+        the table (e.g. it ran out of memory), and a table that keeps killing its workers mustn't be retried forever.
+        So with max_attempts 2, a table whose lease is stolen and that then fails is failed.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT table_name, status FROM leases "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires_at < ?)) AND attempts < ? "
+                "ORDER BY status = 'leased', priority LIMIT ?",
+                (now, max_attempts, count),
+            ).fetchall()
+            claims = {}
+            for table_name, status in rows:
+                if status == "leased":
+                    logger.warning(f"Lease on '{table_name}' expired - stolen by worker {worker_id}.")
+                claims[table_name] = uuid.uuid4().hex
+                db.execute(
+                    "UPDATE leases SET status = 'leased', worker_id = ?, lease_token = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1 WHERE table_name = ?",
+                    (worker_id, claims[table_name], now + self.lease_seconds, table_name),
+                )
+            # expired leases that can't be retried any more are failed
+            db.execute(
+                "UPDATE leases SET status = 'failed', error = 'lease expired' "
+                "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                (now, max_attempts),
+            )
+
+        return claims
+
+    def renew(self, claims):
+        """Extend the leases still held with the claims' tokens. Returns the tables whose lease was lost."""
+        lost_tables = []
+        with self._transaction() as db:
+            for table_name, lease_token in claims.items():
+                renewed = db.execute(
+                    "UPDATE leases SET lease_expires_at = ? WHERE table_name = ? AND lease_token = ? "
+                    "AND status = 'leased'",
+                    (time.time() + self.lease_seconds, table_name, lease_token),
+                ).rowcount
+                if not renewed:
+                    lost_tables.append(table_name)
+
+        return lost_tables
+
+    @contextmanager
+    def keep_alive(self, claims):
+        """Renew the claims' leases on a background thread - 3 times per lease period - while the block runs."""
+        stopped = threading.Event()
+
+        def renew_leases():
+            while not stopped.wait(self.lease_seconds / 3):
+                for table_name in self.renew(claims):
+                    logger.warning(f"Lease on '{table_name}' lost - another worker may be running it.")
+
+        renew_thread = threading.Thread(target=renew_leases, daemon=True)
+        renew_thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            renew_thread.join()
+
+    def complete(self, table_name, lease_token, error=None, max_attempts=2):
+        """Mark the claimed table done - or, with an error, pending again (for any worker to retry) until it's been
+        tried (claimed, see claim) max_attempts times, then failed. Returns False if the lease was lost, so the table
+        wasn't updated."""
+        with self._transaction() as db:
+            if error is None:
+                status = "done"
+            else:
+                (attempts,) = db.execute("SELECT attempts FROM leases WHERE table_name = ?", (table_name,)).fetchone()
+                status = "pending" if attempts < max_attempts else "failed"
+            return bool(
+                db.execute(
+                    "UPDATE leases SET status = ?, error = ?, lease_expires_at = NULL "
+                    "WHERE table_name = ? AND lease_token = ? AND status = 'leased'",
+                    (status, error, table_name, lease_token),
+                ).rowcount
+            )
+
+    def get_status(self):
+        """Return {table: (status, worker id, attempts, error)}, in priority order."""
+        db = sqlite3.connect(self.db_path, timeout=60)
+        try:
+            return {
+                row[0]: row[1:]
+                for row in db.execute(
+                    "SELECT table_name, status, worker_id, attempts, error FROM leases ORDER BY priority"
+                ).fetchall()
+            }
+        finally:
+            db.close()
+
+    def has_unfinished(self):
+        """True if any table is pending or leased - i.e. may still be (re)claimed."""
+        return any(status in ["pending", "leased"] for status, *_ in self.get_status().values())
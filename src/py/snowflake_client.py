@@ -1,13 +1,30 @@
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from queue import Empty
+from queue import Queue
 
+import common
 import pandas as pd
+import sample_cache
 import snowflake.connector
+import sql_builder
+import tracing
 from dotenv import load_dotenv
 from great_expectations.dataset.pandas_dataset import PandasDataset
+from snowflake.connector.constants import FIELD_ID_TO_NAME
+from snowflake.connector.errors import NotSupportedError
+from snowflake.connector.errors import ProgrammingError
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Set up logging
+logger = common.get_logger()
+
 
 def validate_inputs():
     """Validate the presence of required environment variables."""
@@ -33,7 +50,11 @@ def validate_inputs():
     return snowflake_env_vars
 
 
-def setup_snowflake_connection(snowflake_env_vars=validate_inputs()):
+def setup_snowflake_connection(snowflake_env_vars=None):
+    # validate lazily, so importing this module doesn't require the Snowflake env vars
+    if snowflake_env_vars is None:
+        snowflake_env_vars = validate_inputs()
+
     snowflake_params = {
         "account": snowflake_env_vars["SNOWFLAKE_ACCOUNT"],
         "user": snowflake_env_vars["SNOWFLAKE_USER"],
@@ -55,17 +76,431 @@ def setup_snowflake_connection(snowflake_env_vars=validate_inputs()):
     return conn
 
 
-def snowflake_query(conn, input_tbl, row_count_limit):
-    sql_query = f"SELECT * FROM {input_tbl} LIMIT {row_count_limit};"
+class SnowflakeConnectionPool:
+    """Thread-safe pool that opens Snowflake connections once and shares them across tables."""
+
+    def __init__(self, max_size=4, max_age_seconds=3600, health_check_idle_seconds=300):
+        self.max_size = max_size
+        self.max_age_seconds = max_age_seconds
+        self.health_check_idle_seconds = health_check_idle_seconds
+        self.stats = {"connections_opened": 0, "connections_reused": 0, "connections_recycled": 0}
+        self._idle = Queue()  # (conn, opened_at, last_used_at) tuples
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _open(self):
+        with tracing.span("connect"):
+            conn = setup_snowflake_connection()
+        with self._lock:
+            self.stats["connections_opened"] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        with self._lock:
+            self.stats["connections_recycled"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, opened_at, last_used_at):
+        """Return False for connections that are closed, too old, or fail a ping after a long idle."""
+        now = time.monotonic()
+        if conn.is_closed() or now - opened_at > self.max_age_seconds:
+            return False
+        if now - last_used_at > self.health_check_idle_seconds:
+            try:
+                conn.cursor().execute("SELECT 1").close()
+            except Exception:
+                return False
+        return True
+
+    def _acquire(self):
+        while True:
+            try:
+                conn, opened_at, last_used_at = self._idle.get_nowait()
+            except Empty:
+                return self._open()
+            if self._is_healthy(conn, opened_at, last_used_at):
+                with self._lock:
+                    self.stats["connections_reused"] += 1
+                return conn, opened_at
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool, returning it once the caller is done."""
+        self._slots.acquire()
+        conn, opened_at = None, None
+        try:
+            conn, opened_at = self._acquire()
+            yield conn
+        except Exception:
+            # A failed query can leave the session in an unknown state, so don't hand it out again
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put((conn, opened_at, time.monotonic()))
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection held by the pool."""
+        while True:
+            try:
+                conn, _, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool(pool_params=None):
+    """Return the process-wide connection pool, creating it on first use."""
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = SnowflakeConnectionPool(**(pool_params or {}))
+        return _connection_pool
+
+
+def get_sqlalchemy_pool_kwargs(pool_params=None):
+    """Translate the pool settings into SQLAlchemy engine kwargs for the GX Snowflake datasource."""
+    pool_params = pool_params or {}
+    return {
+        "pool_size": pool_params.get("max_size", 4),
+        "pool_recycle": pool_params.get("max_age_seconds", 3600),
+        "pool_pre_ping": True,
+    }
+
+
+def fetch_dataframe_from_tuples(cursor):
+    """Fetch the whole result set as Python tuples and build a DataFrame from them."""
+    result = cursor.fetchall()
+    column_names = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(result, columns=column_names)
+
+
+def fetch_dataframe_from_arrow(cursor):
+    """Fetch the result set as Arrow batches and convert them to a DataFrame with as few copies as possible."""
+    import pyarrow as pa
+
+    batches = list(cursor.fetch_arrow_batches())
+    if not batches:
+        # an empty result set yields no batches, so fall back to the cursor description for the columns
+        return pd.DataFrame(columns=[desc[0] for desc in cursor.description])
+
+    arrow_table = pa.concat_tables(batches)
+    del batches
+    # self_destruct releases each Arrow column as soon as it has been converted
+    return arrow_table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def fetch_dataframe(cursor, fetch_mode="arrow"):
+    """Fetch the cursor's result set into a DataFrame, falling back to tuples if Arrow isn't available."""
+    if fetch_mode == "arrow":
+        try:
+            return fetch_dataframe_from_arrow(cursor)
+        except (ImportError, NotSupportedError, ProgrammingError) as e:
+            logger.debug(f"Arrow fetch unavailable, falling back to tuples: {e}")
+
+    return fetch_dataframe_from_tuples(cursor)
+
+
+def iter_dataframe_batches(cursor, fetch_mode="arrow", batch_rows=50_000):
+    """Yield the cursor's result set one batch at a time, as DataFrames - Arrow batches as the connector returns them,
+    or batch_rows rows at a time with fetchmany. Yields an empty DataFrame (with the columns) if there are no rows."""
+    column_names = [desc[0] for desc in cursor.description]
+    batches = None
+    if fetch_mode == "arrow":
+        try:
+            batches = (
+                arrow_table.to_pandas(split_blocks=True, self_destruct=True)
+                for arrow_table in cursor.fetch_arrow_batches()
+            )
+        except (ImportError, NotSupportedError, ProgrammingError) as e:
+            logger.debug(f"Arrow fetch unavailable, falling back to tuples: {e}")
+    if batches is None:
+        batches = (pd.DataFrame(rows, columns=column_names) for rows in iter(lambda: cursor.fetchmany(batch_rows), []))
+
+    empty = True
+    for df in batches:
+        empty = False
+        yield df
+    if empty:
+        yield pd.DataFrame(columns=column_names)
+
+
+def get_table_columns(conn, input_tbl):
+    """Return the input table's column names, without fetching any rows."""
     snowflake_cursor = conn.cursor()
-    snowflake_cursor.execute(sql_query)
-    result = snowflake_cursor.fetchall()
+    snowflake_cursor.execute(f"SELECT * FROM {input_tbl} LIMIT 0")
+    column_names = [desc[0] for desc in snowflake_cursor.description]
     snowflake_cursor.close()
-    conn.close()
 
-    column_names = [desc[0] for desc in snowflake_cursor.description]
-    df = pd.DataFrame(result, columns=column_names)
+    return column_names
+
+
+def get_table_column_types(conn, input_tbl):
+    """Return the input table's columns as (name, Snowflake type name, scale) tuples, without fetching any rows."""
+    snowflake_cursor = conn.cursor()
+    snowflake_cursor.execute(f"SELECT * FROM {input_tbl} LIMIT 0")
+    column_types = [(desc[0], FIELD_ID_TO_NAME[desc[1]], desc[5]) for desc in snowflake_cursor.description]
+    snowflake_cursor.close()
+
+    return column_types
+
+
+def get_selected_columns(conn, input_tbl, cols_to_include=None, cols_to_exclude=None):
+    """Return the table's columns filtered by the include/exclude patterns, or None to select every column."""
+    if not cols_to_include and not cols_to_exclude:
+        return None
+
+    columns = common.select_columns(get_table_columns(conn, input_tbl), cols_to_include, cols_to_exclude)
+    if not columns:
+        raise ValueError(f"No columns left to select from table '{input_tbl}' after applying cols_to_include/exclude.")
 
-    pandas_dataset = PandasDataset(df)
+    return columns
+
+
+def list_tables(conn):
+    """Return the names of the current schema's tables - case-insensitive (upper case) names in lower case, as
+    input_tables lists them."""
+    snowflake_cursor = conn.cursor()
+    snowflake_cursor.execute(sql_builder.build_list_tables_query())
+    table_names = [
+        table_name.lower() if table_name.isupper() else table_name for (table_name,) in snowflake_cursor.fetchall()
+    ]
+    snowflake_cursor.close()
+
+    return table_names
+
+
+def get_table_stats(conn, input_tables):
+    """Return {TABLE_NAME: {last_altered, row_count, bytes, columns}} for the input tables, using one INFORMATION_SCHEMA
+    query - columns is a list of (column name, data type) pairs. Tables that aren't found are left out."""
+    snowflake_cursor = conn.cursor()
+    snowflake_cursor.execute(sql_builder.build_table_stats_query(input_tables))
+    table_stats = {}
+    for table_name, last_altered, row_count, num_bytes, column_name, data_type in snowflake_cursor.fetchall():
+        stats = table_stats.setdefault(
+            table_name, {"last_altered": last_altered, "row_count": row_count, "bytes": num_bytes, "columns": []}
+        )
+        if column_name is not None:
+            stats["columns"].append((column_name, data_type))
+    snowflake_cursor.close()
+
+    return table_stats
+
+
+def snowflake_query(
+    conn,
+    input_tbl,
+    row_count_limit,
+    fetch_mode="arrow",
+    sampling=None,
+    columns=None,
+    fingerprint=None,
+    sample_cache_params=None,
+):
+    """Query a sample of the input table. The connection is left open so it can be reused.
+
+    With sample_cache_params, the sample is read from (or written to) the local sample cache - see sample_cache.
+    """
+    sql_query = sql_builder.build_sample_query(input_tbl, row_count_limit, sampling, columns)
+
+    def fetch_sample():
+        snowflake_cursor = conn.cursor()
+        with tracing.span("query"):
+            snowflake_cursor.execute(sql_query)
+        with tracing.span("fetch") as fetch_span:
+            df = fetch_dataframe(snowflake_cursor, fetch_mode)
+            fetch_span["rows"], fetch_span["bytes"] = len(df), int(df.memory_usage(index=False, deep=True).sum())
+        snowflake_cursor.close()
+        return df
+
+    df = sample_cache.get_or_fetch(input_tbl, sql_query, fingerprint, sample_cache_params, fetch_sample)
+
+    with tracing.span("dataframe"):
+        pandas_dataset = PandasDataset(df)
 
     return pandas_dataset
+
+
+def snowflake_query_batches(
+    conn, input_tbl, row_count_limit, fetch_mode="arrow", sampling=None, columns=None, batch_rows=50_000, where=None
+):
+    """Query a sample of the input table (optionally filtered by a 'where' predicate), yielding it one batch at a
+    time (see iter_dataframe_batches)."""
+    sql_query = sql_builder.build_sample_query(input_tbl, row_count_limit, sampling, columns, where)
+    snowflake_cursor = conn.cursor()
+    try:
+        with tracing.span("query"):
+            snowflake_cursor.execute(sql_query)
+        yield from iter_dataframe_batches(snowflake_cursor, fetch_mode, batch_rows)
+    finally:
+        snowflake_cursor.close()
+
+
+async def snowflake_query_async(conn, input_tbl, table_params, poll_interval=0.5, fingerprint=None):
+    """Submit the input table's sampling query without waiting for it, poll until it completes, then fetch it.
+
+    The blocking connector calls run in threads, so other tables' queries are submitted & polled meanwhile. A sample
+    found in the sample cache isn't queried at all.
+    """
+    columns = await asyncio.to_thread(
+        get_selected_columns,
+        conn,
+        input_tbl,
+        table_params.get("cols_to_include"),
+        table_params.get("cols_to_exclude"),
+    )
+    sql_query = sql_builder.build_sample_query(
+        input_tbl, table_params["row_count_limit"], table_params.get("sampling"), columns
+    )
+    sample_cache_params = table_params.get("sample_cache") if fingerprint is not None else None
+    sample_key = sample_cache.get_sample_key(input_tbl, sql_query, fingerprint)
+    if sample_cache_params:
+        df = await asyncio.to_thread(
+            sample_cache.read_sample, sample_key, sample_cache_params.get("ttl_seconds", 86400)
+        )
+        if df is not None:
+            with tracing.span("dataframe"):
+                return PandasDataset(df)
+
+    snowflake_cursor = conn.cursor()
+    try:
+        # the 'query' span covers the warehouse's queue & execution time, as snowflake_query's does
+        with tracing.span("query"):
+            await asyncio.to_thread(snowflake_cursor.execute_async, sql_query)
+            while conn.is_still_running(
+                await asyncio.to_thread(conn.get_query_status_throw_if_error, snowflake_cursor.sfqid)
+            ):
+                await asyncio.sleep(poll_interval)
+
+        def fetch_results():
+            with tracing.span("fetch") as fetch_span:
+                snowflake_cursor.get_results_from_sfqid(snowflake_cursor.sfqid)
+                df = fetch_dataframe(snowflake_cursor, table_params.get("fetch_mode", "arrow"))
+                fetch_span["rows"], fetch_span["bytes"] = len(df), int(df.memory_usage(index=False, deep=True).sum())
+            if sample_cache_params:
+                sample_cache.write_sample(sample_key, df)
+            with tracing.span("dataframe"):
+                return PandasDataset(df)
+
+        return await asyncio.to_thread(fetch_results)
+    finally:
+        snowflake_cursor.close()
+
+
+class PrefetchedSample(Future):
+    """A prefetched sample's future, which holds one of prefetch_samples' slots from its query's submission until the
+    consumer has read its result - or its query has failed."""
+
+    def __init__(self, slots):
+        super().__init__()
+        self._slots = slots
+        self._slot_held = False
+        self._slot_lock = threading.Lock()
+
+    def hold_slot(self):
+        self._slot_held = True
+
+    def release_slot(self):
+        with self._slot_lock:
+            if self._slot_held:
+                self._slot_held = False
+                self._slots.release()
+
+    def result(self, timeout=None):
+        try:
+            return super().result(timeout)
+        finally:
+            if self.done():
+                self.release_slot()
+
+
+def acquire_prefetch_slot(slots, stopped, poll_interval=0.5):
+    """Wait for one of a prefetch's slots. Returns True once it's held - or False if the prefetch has been stopped."""
+    while not slots.acquire(timeout=poll_interval):
+        if stopped.is_set():
+            return False
+    if stopped.is_set():
+        slots.release()
+        return False
+    return True
+
+
+async def prefetch_sample(conn, future, input_table, table_params, poll_interval=0.5, fingerprint=None):
+    """Query a table's sample (see snowflake_query_async) into its PrefetchedSample future."""
+    with tracing.current_table(input_table):
+        try:
+            future.set_result(await snowflake_query_async(conn, input_table, table_params, poll_interval, fingerprint))
+        except Exception as e:
+            future.set_exception(e)
+            future.release_slot()
+
+
+async def prefetch_samples_async(conn, futures, other_params, slots, stopped, poll_interval=0.5, fingerprints=None):
+    """Query the samples of futures' tables - {input table: PrefetchedSample} - in order, each once it has a slot.
+    Tables still waiting for a slot when the prefetch is stopped aren't queried."""
+    tasks = []
+    for input_table, future in futures.items():
+        if not await asyncio.to_thread(acquire_prefetch_slot, slots, stopped, poll_interval):
+            break
+        future.hold_slot()
+        table_params = common.get_table_params(other_params, input_table)
+        fingerprint = (fingerprints or {}).get(input_table)
+        tasks.append(
+            asyncio.create_task(prefetch_sample(conn, future, input_table, table_params, poll_interval, fingerprint))
+        )
+    await asyncio.gather(*tasks)
+
+
+def prefetch_samples(
+    connection_pool, input_tables, other_params, max_in_flight=8, poll_interval=0.5, fingerprints=None
+):
+    """Query every input table's sample asynchronously, on one pooled connection, in a background thread.
+
+    Returns ({input table: Future}, stop) - each future resolves to the table's PandasDataset as soon as its query
+    has completed & been fetched (or to the query's exception), so the caller can profile tables as they arrive.
+
+    At most max_in_flight samples are being queried, or have been fetched but not yet taken (their future's result
+    read), at once - later queries wait for a slot, so a slow consumer doesn't end up with every sample in memory.
+    stop() stops submitting queries (cancelling the futures of the tables not yet queried), then waits for the thread
+    to finish & return its connection to the pool - call it once done with the samples.
+    """
+    slots = threading.BoundedSemaphore(max_in_flight)
+    stopped = threading.Event()
+    futures = {input_table: PrefetchedSample(slots) for input_table in input_tables}
+
+    def run():
+        try:
+            with connection_pool.connection() as conn:
+                asyncio.run(
+                    prefetch_samples_async(conn, futures, other_params, slots, stopped, poll_interval, fingerprints)
+                )
+        except Exception as e:
+            # e.g. no connection could be opened - fail the tables still waiting for their sample
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        for future in futures.values():
+            future.cancel()  # the tables not queried, as the prefetch was stopped
+
+    thread = threading.Thread(target=run, name="prefetch_samples", daemon=True)
+    thread.start()
+
+    def stop():
+        stopped.set()
+        thread.join()
+
+    return futures, stop
@@ -0,0 +1,130 @@
+SAMPLING_MODES = ["limit", "row", "block", "bernoulli", "stratified"]
+
+
+def build_select_list(columns=None):
+    """Build the SELECT list - only the given columns (quoted, to keep their case), or * if there are none."""
+    if not columns:
+        return "*"
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def build_sample_query(input_table, row_count_limit, sampling=None, columns=None, where=None):
+    """Build the SQL used to sample an input table, projecting only 'columns' (if given).
+
+    'sampling' is the table's sampling config from config.yaml:
+        - limit:      SELECT ... LIMIT n - the first n rows returned (default)
+        - row:        fixed-size row sample of n rows (SAMPLE ROW (n ROWS))
+        - block:      seeded block/micro-partition sample of 'percent' of the table (SAMPLE BLOCK)
+        - bernoulli:  seeded row-level sample of 'percent' of the table (SAMPLE BERNOULLI)
+        - stratified: up to n rows, spread evenly over the values of 'stratify_by'
+    Every mode is capped at row_count_limit rows. 'where' optionally filters the rows, e.g. to one partition of the
+    table (see build_partition_predicate) - before a 'row' sample is taken, so it has n rows of the filtered rows.
+    """
+    sampling = sampling or {}
+    mode = sampling.get("mode", "limit")
+    select_list = build_select_list(columns)
+    where_clause = f" WHERE {where}" if where else ""
+
+    if mode == "limit":
+        return f"SELECT {select_list} FROM {input_table}{where_clause} LIMIT {row_count_limit}"
+
+    if mode == "row":
+        # a fixed-size sample filtered afterwards would keep only the filtered share of its n rows - e.g. n/p of them
+        # for each of p partitions. Filtered first, the partitions' samples are of disjoint rows, so they add up to n.
+        sampled_rows = f"(SELECT * FROM {input_table}{where_clause})" if where else input_table
+        return f"SELECT {select_list} FROM {sampled_rows} SAMPLE ROW ({row_count_limit} ROWS)"
+
+    if mode in ["block", "bernoulli"]:
+        percent = sampling.get("percent")
+        if percent is None or not 0 < percent <= 100:
+            raise ValueError(f"Sampling mode '{mode}' for table '{input_table}' needs a 'percent' between 0 and 100.")
+        seed = sampling.get("seed", 0)
+        return (
+            f"SELECT {select_list} FROM {input_table} "
+            f"SAMPLE {mode.upper()} ({percent}) SEED ({seed}){where_clause} "
+            f"LIMIT {row_count_limit}"
+        )
+
+    if mode == "stratified":
+        stratify_by = sampling.get("stratify_by")
+        if not stratify_by:
+            raise ValueError(f"Sampling mode 'stratified' for table '{input_table}' needs a 'stratify_by' column.")
+        seed = sampling.get("seed", 0)
+        # take the 1st (random) row of every stratum, then the 2nd, etc. until row_count_limit is reached
+        return (
+            f"SELECT {select_list} FROM {input_table}{where_clause} "
+            f"ORDER BY ROW_NUMBER() OVER (PARTITION BY {stratify_by} ORDER BY RANDOM({seed})) "
+            f"LIMIT {row_count_limit}"
+        )
+
+    raise ValueError(f"Invalid sampling mode '{mode}' for table '{input_table}'. Expected one of {SAMPLING_MODES}.")
+
+
+def build_partition_predicate(partition_index, partition_count, partition_by=None):
+    """Build the predicate selecting one of partition_count hash partitions of a table's rows.
+
+    Rows are assigned by the hash of the partition_by columns - or, without any, of the whole row.
+    """
+    if isinstance(partition_by, str):
+        partition_by = [partition_by]
+    hash_input = build_select_list(partition_by)
+    return f"MOD(ABS(HASH({hash_input})), {partition_count}) = {partition_index}"
+
+
+def build_list_tables_query():
+    """Build the INFORMATION_SCHEMA query listing the current schema's tables (and views)."""
+    return "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = CURRENT_SCHEMA() ORDER BY TABLE_NAME"
+
+
+def build_table_stats_query(input_tables):
+    """Build the INFORMATION_SCHEMA query returning the input tables' last-altered time, row count, size & columns.
+
+    There's one row per column (in order), or a single row with a NULL column for a table without any.
+    """
+    table_names = ", ".join(f"'{input_table.upper()}'" for input_table in input_tables)
+    return (
+        "SELECT T.TABLE_NAME, T.LAST_ALTERED, T.ROW_COUNT, T.BYTES, C.COLUMN_NAME, C.DATA_TYPE "
+        "FROM INFORMATION_SCHEMA.TABLES T LEFT JOIN INFORMATION_SCHEMA.COLUMNS C "
+        "ON C.TABLE_SCHEMA = T.TABLE_SCHEMA AND C.TABLE_NAME = T.TABLE_NAME "
+        f"WHERE T.TABLE_SCHEMA = CURRENT_SCHEMA() AND T.TABLE_NAME IN ({table_names}) "
+        "ORDER BY T.TABLE_NAME, C.ORDINAL_POSITION"
+    )
+
+
+def build_column_profile_query(input_table, column_types, quantiles, top_k=10):
+    """Build one aggregate query computing every column's profiling metrics in the warehouse.
+
+    column_types is a list of (column, type) pairs, where type is one of 'int', 'float', 'string', 'datetime',
+    'bool' or 'unknown'. Returns (sql, select_keys), where select_keys[i] is the (column, metric) pair computed
+    by the i'th item of the result row - row_count has a column of None.
+    """
+    select_items, select_keys = ["COUNT(*)"], [(None, "row_count")]
+
+    for column, column_type in column_types:
+        quoted_column = f'"{column}"'
+        metrics = [
+            ("nonnull_count", f"COUNT({quoted_column})"),
+            ("distinct_count", f"APPROX_COUNT_DISTINCT({quoted_column})"),
+        ]
+        if column_type in ["int", "float"]:
+            metrics += [
+                ("min", f"MIN({quoted_column})"),
+                ("max", f"MAX({quoted_column})"),
+                ("mean", f"AVG({quoted_column})::FLOAT"),
+            ]
+            metrics += [
+                (("quantile", quantile), f"APPROX_PERCENTILE({quoted_column}, {quantile})::FLOAT")
+                for quantile in quantiles
+            ]
+        elif column_type == "datetime":
+            metrics += [("min", f"MIN({quoted_column})"), ("max", f"MAX({quoted_column})")]
+        if column_type in ["string", "bool"]:
+            metrics.append(("top_values", f"APPROX_TOP_K({quoted_column}, {top_k})"))
+
+        for metric, select_item in metrics:
+            select_items.append(select_item)
+            select_keys.append((column, metric))
+
+    sql = f"SELECT {', '.join(select_items)} FROM {input_table}"
+
+    return sql, select_keys
@@ -0,0 +1,470 @@
+import math
+from datetime import datetime
+from datetime import timezone
+from decimal import Decimal
+
+import common
+import great_expectations as gx
+import tracing
+from great_expectations.core import ExpectationSuite
+from great_expectations.core import ExpectationSuiteValidationResult
+from great_expectations.core import ExpectationValidationResult
+from great_expectations.core.run_identifier import RunIdentifier
+from great_expectations.data_context.types.resource_identifiers import ExpectationSuiteIdentifier
+from great_expectations.data_context.types.resource_identifiers import ValidationResultIdentifier
+
+# Set up logging
+logger = common.get_logger()
+
+VALIDATION_ENGINE_NAME = "SqlSuiteValidator"
+
+# kwargs the compiled expectations understand - an expectation with any other kwarg (e.g. row_condition) falls back
+SUPPORTED_KWARGS = {
+    "column",
+    "min_value",
+    "max_value",
+    "strict_min",
+    "strict_max",
+    "mostly",
+    "value_set",
+    "column_set",
+    "exact_match",
+    "quantile_ranges",
+    "allow_relative_error",
+    "result_format",
+    "include_config",
+    "catch_exceptions",
+    "meta",
+}
+
+
+class NotCompilableError(Exception):
+    """Raised for an expectation that can't be validated from the compiled query - it's validated by GX instead."""
+
+    pass
+
+
+def quote_column(column):
+    """Quote a column name as GX's Snowflake dialect resolves it - an all lower case name is case-insensitive."""
+    return f'"{column.upper()}"' if column == column.lower() else f'"{column}"'
+
+
+def normalize_column(column, dialect="snowflake"):
+    """Return a result set's column name as GX reports it - for Snowflake, case-insensitive names in lower case."""
+    return column.lower() if dialect == "snowflake" and column == column.upper() else column
+
+
+def sql_literal(value):
+    """Render a kwarg value as a SQL literal."""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):
+            # repr would render e.g. 'inf' - a column name in SQL, not a number
+            raise NotCompilableError(f"Unsupported value: {value!r}")
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise NotCompilableError(f"Unsupported value: {value!r}")
+
+
+def to_python(value):
+    """Convert a numeric result value (the connector returns NUMBER columns as Decimal) to an int or float."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def is_between(value, min_value, max_value, strict_min=False, strict_max=False):
+    """As GX's column aggregate expectations: is value within [min_value, max_value] (or the strict interval)?"""
+    if value is None:
+        return False
+    try:
+        above_min = min_value is None or (value > min_value if strict_min else value >= min_value)
+        below_max = max_value is None or (value < max_value if strict_max else value <= max_value)
+    except TypeError as e:
+        # e.g. a datetime column's bounds stored as strings - GX parses them, so leave it to GX
+        raise NotCompilableError(f"Can't compare {value!r} with its bounds: {e}")
+    return above_min and below_max
+
+
+def get_column_map_result(element_count, nonnull_count, unexpected_count, mostly=None):
+    """Build a column map expectation's (success, result) from its counts, as GX does for the 'BASIC' result format.
+
+    No rows are fetched, so the partial unexpected lists are always empty.
+    """
+    missing_count = element_count - nonnull_count
+    success = nonnull_count == 0 or (nonnull_count - unexpected_count) / nonnull_count >= (
+        1.0 if mostly is None else mostly
+    )
+
+    def percent(count, total):
+        return count / total * 100 if total else None
+
+    return success, {
+        "element_count": element_count,
+        "missing_count": missing_count,
+        "missing_percent": percent(missing_count, element_count),
+        "partial_unexpected_counts": [],
+        "partial_unexpected_list": [],
+        "unexpected_count": unexpected_count,
+        "unexpected_percent": percent(unexpected_count, nonnull_count),
+        "unexpected_percent_nonmissing": percent(unexpected_count, nonnull_count),
+        "unexpected_percent_total": percent(unexpected_count, element_count),
+    }
+
+
+def get_between_condition(column, kwargs):
+    """Build the SQL condition for a non-null value outside [min_value, max_value] (or the strict interval)."""
+    conditions = []
+    if kwargs.get("min_value") is not None:
+        conditions.append(f"{column} {'>' if kwargs.get('strict_min') else '>='} {sql_literal(kwargs['min_value'])}")
+    if kwargs.get("max_value") is not None:
+        conditions.append(f"{column} {'<' if kwargs.get('strict_max') else '<='} {sql_literal(kwargs['max_value'])}")
+    return f"{column} IS NOT NULL AND NOT ({' AND '.join(conditions)})"
+
+
+def get_column_metrics(kwargs):
+    """Return a column expectation's quoted column, and the key & metrics of the column's non-null count - which every
+    column expectation needs."""
+    column, nonnull_key = quote_column(kwargs["column"]), f"nonnull:{kwargs['column']}"
+    return column, nonnull_key, {nonnull_key: f"COUNT({column})"}
+
+
+def compile_table_row_count(expectation_type, kwargs, index):
+    def evaluate(values, columns):
+        row_count = values["row_count"]
+        return is_between(row_count, kwargs.get("min_value"), kwargs.get("max_value")), {"observed_value": row_count}
+
+    return {}, {}, evaluate
+
+
+def compile_table_columns(expectation_type, kwargs, index):
+    def evaluate(values, columns):
+        column_set = set(kwargs.get("column_set") or [])
+        if set(columns) == column_set:
+            return True, {"observed_value": columns}
+        # as GX, a mismatch's columns are sorted - and without exact_match the expected columns only need to be present
+        unexpected, missing = sorted(set(columns) - column_set), sorted(column_set - set(columns))
+        mismatched = {key: value for key, value in [("unexpected", unexpected), ("missing", missing)] if value}
+        return not kwargs.get("exact_match") and not missing, {
+            "observed_value": sorted(columns),
+            "details": {"mismatched": mismatched},
+        }
+
+    return {}, {}, evaluate
+
+
+def compile_column_nullity(expectation_type, kwargs, index):
+    _, nonnull_key, metrics = get_column_metrics(kwargs)
+    mostly = 1.0 if kwargs.get("mostly") is None else kwargs["mostly"]
+
+    def evaluate(values, columns):
+        element_count, nonnull_count = values["row_count"], values[nonnull_key]
+        # the nulls (or non-nulls) are the unexpected values, so they are relative to every row
+        if expectation_type == "expect_column_values_to_not_be_null":
+            unexpected_count = element_count - nonnull_count
+        else:
+            unexpected_count = nonnull_count
+        success = element_count == 0 or (element_count - unexpected_count) / element_count >= mostly
+        return success, {
+            "element_count": element_count,
+            "partial_unexpected_counts": [],
+            "partial_unexpected_list": [],
+            "unexpected_count": unexpected_count,
+            "unexpected_percent": unexpected_count / element_count * 100 if element_count else None,
+        }
+
+    return metrics, {}, evaluate
+
+
+def get_column_map_condition(expectation_type, column, kwargs):
+    """Build the SQL condition for a column map expectation's unexpected values."""
+    if None in (kwargs.get("value_set") or []):
+        raise NotCompilableError("A null in value_set isn't supported")
+    if expectation_type == "expect_column_values_to_be_in_set":
+        if not kwargs["value_set"]:
+            return f"{column} IS NOT NULL"
+        return f"{column} IS NOT NULL AND {column} NOT IN ({', '.join(map(sql_literal, kwargs['value_set']))})"
+    if expectation_type == "expect_column_values_to_not_be_in_set":
+        if not kwargs["value_set"]:
+            return "1 = 0"
+        return f"{column} IN ({', '.join(map(sql_literal, kwargs['value_set']))})"
+    if kwargs.get("min_value") is None and kwargs.get("max_value") is None:
+        raise NotCompilableError("min_value and max_value can't both be None")
+    return get_between_condition(column, kwargs)
+
+
+def compile_column_map(expectation_type, kwargs, index):
+    column, nonnull_key, metrics = get_column_metrics(kwargs)
+    unexpected_key = f"unexpected:{index}"
+    condition = get_column_map_condition(expectation_type, column, kwargs)
+    metrics[unexpected_key] = f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END)"
+
+    def evaluate(values, columns):
+        return get_column_map_result(
+            values["row_count"], values[nonnull_key], values[unexpected_key] or 0, kwargs.get("mostly")
+        )
+
+    return metrics, {}, evaluate
+
+
+def compile_column_uniqueness(expectation_type, kwargs, index):
+    column, nonnull_key, metrics = get_column_metrics(kwargs)
+    # the rows whose (non-null) value appears more than once - counted by a window column of the sample, rather than a
+    # subquery reading it again: with a LIMIT or an unseeded sample, a second read of the sample can return other rows
+    value_count_column = f'"VALUE_COUNT:{kwargs["column"]}"'
+    duplicated_key = f"duplicated:{kwargs['column']}"
+    metrics[duplicated_key] = f"SUM(CASE WHEN {value_count_column} > 1 THEN 1 ELSE 0 END)"
+
+    def evaluate(values, columns):
+        return get_column_map_result(
+            values["row_count"], values[nonnull_key], values[duplicated_key] or 0, kwargs.get("mostly")
+        )
+
+    return metrics, {value_count_column: f"COUNT({column}) OVER (PARTITION BY {column})"}, evaluate
+
+
+# the column aggregate expectations' (metric, SQL aggregate of the column)
+COLUMN_AGGREGATES = {
+    "expect_column_min_to_be_between": ("min", "MIN({column})"),
+    "expect_column_max_to_be_between": ("max", "MAX({column})"),
+    "expect_column_mean_to_be_between": ("mean", "CAST(AVG({column}) AS FLOAT)"),
+    "expect_column_median_to_be_between": ("median", "MEDIAN({column})"),
+    "expect_column_stdev_to_be_between": ("stdev", "STDDEV_SAMP({column})"),
+    "expect_column_unique_value_count_to_be_between": ("distinct", "COUNT(DISTINCT {column})"),
+    "expect_column_proportion_of_unique_values_to_be_between": ("distinct", "COUNT(DISTINCT {column})"),
+}
+
+
+def compile_column_aggregate(expectation_type, kwargs, index):
+    column, nonnull_key, metrics = get_column_metrics(kwargs)
+    if kwargs.get("min_value") is None and kwargs.get("max_value") is None:
+        raise NotCompilableError("min_value and max_value can't both be None")
+    metric, aggregate = COLUMN_AGGREGATES[expectation_type]
+    metric_key = f"{metric}:{kwargs['column']}"
+    metrics[metric_key] = aggregate.format(column=column)
+
+    def evaluate(values, columns):
+        observed_value = to_python(values[metric_key])
+        if expectation_type == "expect_column_proportion_of_unique_values_to_be_between":
+            observed_value = observed_value / values[nonnull_key] if values[nonnull_key] else None
+        success = is_between(
+            observed_value,
+            kwargs.get("min_value"),
+            kwargs.get("max_value"),
+            kwargs.get("strict_min"),
+            kwargs.get("strict_max"),
+        )
+        return success, {"observed_value": observed_value}
+
+    return metrics, {}, evaluate
+
+
+def compile_column_quantiles(expectation_type, kwargs, index):
+    column, _, metrics = get_column_metrics(kwargs)
+    quantiles = kwargs["quantile_ranges"]["quantiles"]
+    value_ranges = kwargs["quantile_ranges"]["value_ranges"]
+    quantile_keys = [f"quantile:{kwargs['column']}:{quantile}" for quantile in quantiles]
+    for quantile_key, quantile in zip(quantile_keys, quantiles):
+        # as GX does for Snowflake, the quantile is rounded to avoid its precision errors
+        metrics[quantile_key] = f"PERCENTILE_DISC({round(quantile, 10)}) WITHIN GROUP (ORDER BY {column})"
+
+    def evaluate(values, columns):
+        quantile_values = [to_python(values[quantile_key]) for quantile_key in quantile_keys]
+        success_details = [is_between(value, low, high) for value, (low, high) in zip(quantile_values, value_ranges)]
+        return all(success_details), {
+            "details": {"success_details": success_details},
+            "observed_value": {"quantiles": quantiles, "values": quantile_values},
+        }
+
+    return metrics, {}, evaluate
+
+
+# expectation type -> its compiler: (expectation type, kwargs, index) -> (metrics, sample columns, evaluate function)
+EXPECTATION_COMPILERS = {
+    "expect_table_row_count_to_be_between": compile_table_row_count,
+    "expect_table_columns_to_match_set": compile_table_columns,
+    "expect_column_values_to_not_be_null": compile_column_nullity,
+    "expect_column_values_to_be_null": compile_column_nullity,
+    "expect_column_values_to_be_in_set": compile_column_map,
+    "expect_column_values_to_not_be_in_set": compile_column_map,
+    "expect_column_values_to_be_between": compile_column_map,
+    "expect_column_values_to_be_unique": compile_column_uniqueness,
+    **{expectation_type: compile_column_aggregate for expectation_type in COLUMN_AGGREGATES},
+    "expect_column_quantile_values_to_be_between": compile_column_quantiles,
+}
+
+
+def compile_expectation(expectation_config, index):
+    """Compile an expectation into the metrics it needs - {metric key: SQL select item} - the columns they need added
+    to the sample's rows - {column alias: SQL window expression} - and a function computing its (success, result)
+    from {metric key: value} & the sample's columns.
+
+    Raises NotCompilableError for expectations (or kwargs) that aren't supported.
+    """
+    expectation_type, kwargs = expectation_config.expectation_type, expectation_config.kwargs
+    unsupported_kwargs = set(kwargs) - SUPPORTED_KWARGS
+    if unsupported_kwargs:
+        raise NotCompilableError(f"Unsupported kwargs: {sorted(unsupported_kwargs)}")
+    if any(isinstance(value, dict) and "$PARAMETER" in value for value in kwargs.values()):
+        raise NotCompilableError("Evaluation parameters aren't supported")
+    if kwargs.get("allow_relative_error"):
+        raise NotCompilableError("Approximate quantiles aren't supported")
+    if expectation_type not in EXPECTATION_COMPILERS:
+        raise NotCompilableError(f"Unsupported expectation: {expectation_type}")
+
+    metrics, sample_columns, evaluate = EXPECTATION_COMPILERS[expectation_type](expectation_type, kwargs, index)
+    return {"row_count": "COUNT(*)", **metrics}, sample_columns, evaluate
+
+
+def compile_suite(expectation_suite, sample_query):
+    """Compile the suite's expectations into one aggregate query over the sample query - which reads it only once.
+
+    Returns (sql, select_keys, compiled, not_compiled), where compiled is a list of (expectation index, evaluate
+    function), and not_compiled the indexes of the expectations that have to be validated by GX. sql is None if no
+    expectation could be compiled.
+    """
+    select_items, sample_columns, compiled, not_compiled = {}, {}, [], []
+    for index, expectation_config in enumerate(expectation_suite.expectations):
+        try:
+            metrics, expectation_sample_columns, evaluate = compile_expectation(expectation_config, index)
+        except (NotCompilableError, KeyError, TypeError) as e:
+            logger.debug(f"Not compiled - {expectation_config.expectation_type}: {e}")
+            not_compiled.append(index)
+            continue
+        select_items.update(metrics)
+        sample_columns.update(expectation_sample_columns)
+        compiled.append((index, evaluate))
+
+    if not compiled:
+        return None, [], compiled, not_compiled
+
+    if sample_columns:
+        window_items = ", ".join(f"{expression} AS {alias}" for alias, expression in sample_columns.items())
+        sample_query = f"SELECT *, {window_items} FROM ({sample_query}) SAMPLE_ROWS"
+    select_keys = list(select_items)
+    sql = f"WITH sample AS ({sample_query}) SELECT {', '.join(select_items[key] for key in select_keys)} FROM sample"
+
+    return sql, select_keys, compiled, not_compiled
+
+
+def get_batch_id(batch_request):
+    """Return the id GX gives the batch request's batch (see great_expectations.datasource.fluent.interfaces.Batch)."""
+    options = [f"{key}_{value}" for key, value in (batch_request.options or {}).items() if key != "path"]
+    return "-".join([batch_request.datasource_name, batch_request.data_asset_name, *options])
+
+
+def query_metrics(connection_pool, datasource, sample_query, sql, select_keys):
+    """Run a compiled suite's query, returning (the sample's columns, {metric key: value})."""
+    with connection_pool.connection() as conn:
+        snowflake_cursor = conn.cursor()
+        # describe only compiles the sample query (no warehouse is used) - for its columns
+        columns = [
+            normalize_column(metadata.name, datasource.type) for metadata in snowflake_cursor.describe(sample_query)
+        ]
+        with tracing.span("validate_sql") as validate_span:
+            snowflake_cursor.execute(sql)
+            values = dict(zip(select_keys, snowflake_cursor.fetchone()))
+            validate_span["rows"] = values["row_count"]
+        snowflake_cursor.close()
+
+    return columns, values
+
+
+def validate_suite(connection_pool, batch_request, expectation_suite_name):
+    """Validate a saved suite against a query asset's sample with one aggregate query, storing the validation result
+    in the validations store (as a checkpoint's StoreValidationResultAction does). Returns the validation result.
+
+    Expectations that can't be compiled (or evaluated from the query's result) are validated by GX, against the same
+    batch - as is the whole suite, if the compiled query fails.
+    """
+    context = common.get_gx_context()
+    expectation_suite = context.get_expectation_suite(expectation_suite_name)
+    datasource = context.get_datasource(batch_request.datasource_name)
+    asset = datasource.get_asset(batch_request.data_asset_name)
+    run_id = RunIdentifier(run_time=datetime.now(timezone.utc))
+
+    sql, select_keys, compiled, not_compiled = compile_suite(expectation_suite, asset.query)
+    results = {}  # expectation index -> (success, result)
+    if sql is not None:
+        logger.debug(sql)
+        try:
+            columns, values = query_metrics(connection_pool, datasource, asset.query, sql, select_keys)
+        except Exception as e:
+            logger.warning(f"Compiled validation query failed, so validating '{expectation_suite_name}' with GX: {e}")
+            compiled, not_compiled = [], list(range(len(expectation_suite.expectations)))
+
+    for index, evaluate in compiled:
+        try:
+            results[index] = evaluate(values, columns)
+        except NotCompilableError as e:
+            logger.debug(f"Not evaluated - {expectation_suite.expectations[index].expectation_type}: {e}")
+            not_compiled.append(index)
+
+    validation_results = [None] * len(expectation_suite.expectations)
+    for index, (success, result) in results.items():
+        validation_results[index] = ExpectationValidationResult(
+            success=success,
+            expectation_config=expectation_suite.expectations[index],
+            result=result,
+            exception_info={"raised_exception": False, "exception_message": None, "exception_traceback": None},
+        )
+
+    if not_compiled:
+        with tracing.span("validate_fallback"):
+            validator = context.get_validator(
+                batch_request=batch_request,
+                expectation_suite=ExpectationSuite(
+                    expectation_suite_name=expectation_suite_name,
+                    expectations=[expectation_suite.expectations[index] for index in sorted(not_compiled)],
+                    data_context=context,
+                ),
+            )
+            fallback_results = validator.validate(catch_exceptions=True).results
+        for index, fallback_result in zip(sorted(not_compiled), fallback_results):
+            validation_results[index] = fallback_result
+
+    successful_count = sum(validation_result.success for validation_result in validation_results)
+    validation_time = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+    validation_result = ExpectationSuiteValidationResult(
+        success=successful_count == len(validation_results),
+        results=validation_results,
+        evaluation_parameters={},
+        statistics={
+            "evaluated_expectations": len(validation_results),
+            "successful_expectations": successful_count,
+            "unsuccessful_expectations": len(validation_results) - successful_count,
+            "success_percent": successful_count / len(validation_results) * 100 if validation_results else None,
+        },
+        meta={
+            "great_expectations_version": gx.__version__,
+            "expectation_suite_name": expectation_suite_name,
+            "run_id": run_id,
+            "batch_spec": {"data_asset_name": asset.name, "query": asset.query, "batch_identifiers": {}},
+            "batch_markers": {"ge_load_time": validation_time},
+            "active_batch_definition": {
+                "datasource_name": batch_request.datasource_name,
+                "data_connector_name": "fluent",
+                "data_asset_name": batch_request.data_asset_name,
+                "batch_identifiers": {},
+            },
+            "validation_time": validation_time,
+            "checkpoint_name": None,
+            "validation_engine": VALIDATION_ENGINE_NAME,
+        },
+    )
+    context.validations_store.set(
+        ValidationResultIdentifier(
+            expectation_suite_identifier=ExpectationSuiteIdentifier(expectation_suite_name),
+            run_id=run_id,
+            batch_identifier=get_batch_id(batch_request),
+        ),
+        validation_result,
+    )
+
+    logger.info(
+        f"Validated '{expectation_suite_name}': {len(validation_results) - len(not_compiled)} expectations with one "
+        f"query, {len(not_compiled)} with GX - {successful_count} of {len(validation_results)} succeeded."
+    )
+    return validation_result
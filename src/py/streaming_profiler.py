@@ -0,0 +1,373 @@
+import math
+import os
+
+import common
+import numpy as np
+import pandas as pd
+import profile_builder
+import snowflake_client
+import sql_builder
+import tracing
+
+# Set up logging
+logger = common.get_logger()
+
+PROFILER_NAME = "StreamingProfiler"
+
+# HyperLogLog registers = 2 ** precision (4096 registers: ~1.6% standard error, in 4KB per column)
+HLL_PRECISION = 12
+# t-digest compression - roughly twice the number of centroids kept per column
+TDIGEST_COMPRESSION = 200
+# Misra-Gries counters kept per top-k value - the counts are exact while a column has fewer distinct values
+TOP_K_CAPACITY_FACTOR = 10
+
+# pandas.api.types.infer_dtype's result -> profiler column type (int, float, string, datetime, bool or unknown)
+INFERRED_TYPES = {
+    "integer": "int",
+    "floating": "float",
+    "mixed-integer-float": "float",
+    "decimal": "float",
+    "string": "string",
+    "boolean": "bool",
+    "datetime64": "datetime",
+    "datetime": "datetime",
+    "date": "datetime",
+}
+
+
+class HyperLogLog:
+    """Mergeable approximate distinct count of 64-bit hashes."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        # the top bits of each hash pick its register, which keeps the highest rank (position of the first 1 bit)
+        # seen in the remaining bits. The remaining bits fit a float64 exactly, so frexp gives their bit length.
+        remaining_bits = 64 - self.precision
+        register_index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        _, bit_length = np.frexp((hashes & np.uint64((1 << remaining_bits) - 1)).astype(np.float64))
+        np.maximum.at(self.registers, register_index, (remaining_bits + 1 - bit_length).astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        estimate = alpha * register_count**2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty_registers = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * register_count and empty_registers:
+            # linear counting is more accurate for small cardinalities
+            estimate = register_count * math.log(register_count / empty_registers)
+        return int(round(estimate))
+
+
+class TDigest:
+    """Mergeable approximate quantiles: a sorted set of (mean, weight) centroids, which are smallest in the tails."""
+
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = math.inf, -math.inf
+
+    def update(self, values):
+        if len(values):
+            self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+            self._add_centroids(values, np.ones(len(values)))
+
+    def merge(self, other):
+        if len(other.means):
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self._add_centroids(other.means, other.weights)
+
+    def _add_centroids(self, means, weights):
+        means, weights = np.concatenate([self.means, means]), np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # merge neighbouring centroids that fall in the same unit of the k1 scale function, k(q) = d/2pi asin(2q-1)
+        cumulative_weights = np.cumsum(weights)
+        scale = (
+            self.compression / (2 * np.pi) * np.arcsin(2 * (cumulative_weights - weights) / cumulative_weights[-1] - 1)
+        )
+        groups = np.floor(scale - scale[0]).astype(np.int64)
+        group_starts = np.flatnonzero(np.diff(groups, prepend=-1))
+
+        self.weights = np.add.reduceat(weights, group_starts)
+        self.means = np.add.reduceat(means * weights, group_starts) / self.weights
+
+    def quantiles(self, quantiles):
+        """Interpolate the quantiles between the centroids' midpoints (and the min & max, at either end)."""
+        cumulative_weights = np.cumsum(self.weights)
+        midpoints = np.concatenate([[0], cumulative_weights - self.weights / 2, [cumulative_weights[-1]]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return [float(value) for value in np.interp(np.asarray(quantiles) * cumulative_weights[-1], midpoints, values)]
+
+
+class TopK:
+    """Mergeable most frequent values (a Misra-Gries summary): counts are exact, or under-counted by at most
+    rows / (capacity + 1)."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+
+    def update(self, value_counts):
+        """Add a batch's value counts (a Series of counts by value, most frequent first)."""
+        if len(value_counts) > self.capacity:
+            value_counts = value_counts.iloc[: self.capacity] - value_counts.iloc[self.capacity]
+            value_counts = value_counts[value_counts > 0]
+        self._add_counts(value_counts.items())
+
+    def merge(self, other):
+        self._add_counts(other.counts.items())
+
+    def _add_counts(self, value_counts):
+        for value, count in value_counts:
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        if len(self.counts) > self.capacity:
+            threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+            self.counts = {value: count - threshold for value, count in self.counts.items() if count > threshold}
+
+    def top(self, k):
+        return sorted(self.counts.items(), key=lambda value_count: value_count[1], reverse=True)[:k]
+
+
+def get_batch_column_type(values):
+    """Return the profiler column type of a batch's non-null values."""
+    return INFERRED_TYPES.get(pd.api.types.infer_dtype(values, skipna=False), "unknown")
+
+
+def merge_column_types(column_type, other_column_type):
+    """Combine the types seen in two batches - int & float columns are floats (e.g. ints in a batch with nulls)."""
+    if column_type is None or column_type == other_column_type:
+        return other_column_type
+    if other_column_type is None:
+        return column_type
+    if {column_type, other_column_type} == {"int", "float"}:
+        return "float"
+    return "unknown"
+
+
+class ColumnAccumulator:
+    """A column's mergeable profiling stats: counts, nulls, min/max, mean & variance (Welford), distinct count
+    (HyperLogLog), quantiles (t-digest) & most frequent values (Misra-Gries)."""
+
+    def __init__(self, column, top_k_capacity):
+        self.column = column
+        self.type, self.type_name = None, None
+        self.null_count = 0
+        self.min, self.max = None, None
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0  # numeric values seen, their mean & sum of squared deviations
+        self.distinct_values = HyperLogLog()
+        self.tdigest = TDigest()
+        self.top_values = TopK(top_k_capacity)
+
+    def _update_type(self, column_type, type_name):
+        merged_type = merge_column_types(self.type, column_type)
+        if merged_type != self.type:
+            self.type_name = type_name if merged_type == column_type else "mixed"
+        self.type = merged_type
+
+    def _update_min_max(self, min_value, max_value):
+        self.min = min_value if self.min is None else min(self.min, min_value)
+        self.max = max_value if self.max is None else max(self.max, max_value)
+
+    def _update_moments(self, count, mean, m2):
+        """Combine another set of values' count, mean & M2 with this column's (Chan et al.'s parallel Welford)."""
+        total_count = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total_count
+        self.m2 += m2 + delta**2 * self.count * count / total_count
+        self.count = total_count
+
+    def update(self, series):
+        """Add a batch of the column's values."""
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if values.empty:
+            return
+
+        column_type = get_batch_column_type(values)
+        self._update_type(column_type, str(series.dtype))
+
+        if column_type in ["int", "float"]:
+            numeric_values = values.to_numpy(dtype=np.float64)
+            self.distinct_values.update(pd.util.hash_array(numeric_values))
+            self._update_min_max(numeric_values.min(), numeric_values.max())
+            batch_mean = numeric_values.mean()
+            self._update_moments(len(numeric_values), batch_mean, np.sum((numeric_values - batch_mean) ** 2))
+            self.tdigest.update(numeric_values)
+            return
+
+        self.distinct_values.update(pd.util.hash_array(values.astype(str).to_numpy(dtype=object)))
+        if column_type == "datetime":
+            self._update_min_max(values.min(), values.max())
+        elif column_type in ["string", "bool"]:
+            self.top_values.update(values.value_counts())
+
+    def merge(self, other):
+        """Add the stats of another accumulator of the same column (e.g. from another batch or partition)."""
+        self.null_count += other.null_count
+        if other.type is None:
+            return
+
+        self._update_type(other.type, other.type_name)
+        if other.min is not None:
+            self._update_min_max(other.min, other.max)
+        if other.count:
+            self._update_moments(other.count, other.mean, other.m2)
+        self.distinct_values.merge(other.distinct_values)
+        self.tdigest.merge(other.tdigest)
+        self.top_values.merge(other.top_values)
+
+    def get_column_stats(self, row_count, top_k):
+        """Return the column's stats, as profile_builder.build_column_evrs expects them."""
+        column_stats = {
+            "column": self.column,
+            "type": self.type or "unknown",
+            "type_name": self.type_name or "unknown",
+            "null_count": self.null_count,
+            "distinct_count": min(self.distinct_values.count(), row_count - self.null_count),
+        }
+        if self.type in ["int", "float"] and self.count:
+            cast = int if self.type == "int" else float
+            column_stats.update(
+                {
+                    "min": cast(self.min),
+                    "max": cast(self.max),
+                    "mean": self.mean,
+                    "stdev": math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None,
+                    "quantiles": self.tdigest.quantiles(profile_builder.QUANTILES),
+                }
+            )
+        elif self.type == "datetime":
+            column_stats.update({"min": self.min, "max": self.max})
+        elif self.type in ["string", "bool"]:
+            column_stats["top_values"] = self.top_values.top(top_k)
+
+        return column_stats
+
+
+class TableAccumulator:
+    """Mergeable profiling stats for every column of a table (or of part of one)."""
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.row_count = 0
+        self.columns = {}  # column -> ColumnAccumulator, in the table's column order
+
+    def update(self, df):
+        """Add a batch of the table's rows."""
+        self.row_count += len(df)
+        for column in df.columns:
+            if column not in self.columns:
+                self.columns[column] = ColumnAccumulator(column, self.top_k * TOP_K_CAPACITY_FACTOR)
+            self.columns[column].update(df[column])
+
+    def merge(self, other):
+        """Add the stats of another accumulator of the same table."""
+        self.row_count += other.row_count
+        for column, column_accumulator in other.columns.items():
+            if column in self.columns:
+                self.columns[column].merge(column_accumulator)
+            else:
+                self.columns[column] = column_accumulator
+
+    def build_profiling_results(self, input_table):
+        """Return (expectation suite, validation result), in BasicDatasetProfiler's format."""
+        columns_stats = [
+            column_accumulator.get_column_stats(self.row_count, self.top_k)
+            for column_accumulator in self.columns.values()
+        ]
+        return profile_builder.build_profiling_results(input_table, self.row_count, columns_stats, PROFILER_NAME)
+
+
+def accumulate_batches(table_accumulator, batches):
+    """Add each of the sample's batches to the accumulator. Fetching a batch (the first fetch also runs the query) and
+    profiling it are timed as separate 'fetch' & 'profile' spans."""
+    batches = iter(batches)
+    while True:
+        with tracing.span("fetch") as fetch_span:
+            df = next(batches, None)
+            fetch_span["rows"] = None if df is None else len(df)
+        if df is None:
+            break
+        with tracing.span("profile") as profile_span:
+            table_accumulator.update(df)
+            profile_span["rows"] = len(df)
+
+
+def profile_table(
+    conn, input_table, row_count_limit, fetch_mode="arrow", sampling=None, columns=None, top_k=10, batch_rows=50_000
+):
+    """Profile the table's sample one result batch at a time, returning (expectation suite, validation result).
+
+    Only one batch of rows is held in memory at once, so memory use doesn't grow with row_count_limit.
+    """
+    table_accumulator = TableAccumulator(top_k)
+    accumulate_batches(
+        table_accumulator,
+        snowflake_client.snowflake_query_batches(
+            conn, input_table, row_count_limit, fetch_mode, sampling, columns, batch_rows
+        ),
+    )
+    with tracing.span("profile"):
+        return table_accumulator.build_profiling_results(input_table)
+
+
+def profile_partition(input_table, partition_index, partition_count, table_params, columns):
+    """Process pool entry point: profile one hash partition of the table's sample, on a Snowflake connection of its
+    own. Returns the partition's TableAccumulator, and the spans recorded in the worker process."""
+    tracing.take_spans()  # drop any spans inherited from the parent process when the worker was forked
+    table_accumulator = TableAccumulator(table_params.get("top_k", 10))
+    with tracing.current_table(input_table):
+        with tracing.span("connect"):
+            conn = snowflake_client.setup_snowflake_connection()
+        try:
+            accumulate_batches(
+                table_accumulator,
+                snowflake_client.snowflake_query_batches(
+                    conn,
+                    input_table,
+                    math.ceil(table_params["row_count_limit"] / partition_count),
+                    table_params.get("fetch_mode", "arrow"),
+                    table_params.get("sampling"),
+                    columns,
+                    table_params.get("stream_batch_rows", 50_000),
+                    sql_builder.build_partition_predicate(
+                        partition_index, partition_count, table_params.get("partition_by")
+                    ),
+                ),
+            )
+        finally:
+            conn.close()
+
+    return table_accumulator, tracing.take_spans()
+
+
+def profile_table_partitioned(process_pool, input_table, table_params, columns=None):
+    """Profile the table's sample in hash partitions, one per process pool task, returning (expectation suite,
+    validation result) for the whole table.
+
+    The sample's row_count_limit is split evenly between the table_params' 'partitions' (by default, one per CPU),
+    and the partitions' accumulators are merged into a single profile.
+    """
+    partition_count = table_params.get("partitions") or os.cpu_count()
+    futures = [
+        process_pool.submit(profile_partition, input_table, partition_index, partition_count, table_params, columns)
+        for partition_index in range(partition_count)
+    ]
+
+    # merge in partition order, so the profile doesn't depend on which partition finishes first
+    table_accumulator = TableAccumulator(table_params.get("top_k", 10))
+    for future in futures:
+        partition_accumulator, spans = future.result()
+        tracing.add_spans(spans)
+        table_accumulator.merge(partition_accumulator)
+    logger.debug(f"Merged {partition_count} partition profiles of table: {input_table}")
+
+    return table_accumulator.build_profiling_results(input_table)
@@ -0,0 +1,98 @@
+from concurrent.futures import as_completed
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+import common
+import tracing
+
+# Set up logging
+logger = common.get_logger()
+
+
+def run_table(func, input_table):
+    """Run func for a single table, capturing (rather than raising) any failure.
+
+    func may return a status of its own (e.g. "skipped"), otherwise the table is marked as "succeeded".
+    """
+    START_TIME = time()
+    try:
+        with tracing.current_table(input_table):
+            status, error = func(input_table) or "succeeded", None
+    except Exception as e:
+        logger.error(f"Error processing table '{input_table}': {e}")
+        status, error = "failed", str(e)
+
+    return {
+        "table": input_table,
+        "status": status,
+        "elapsed_time": round(time() - START_TIME, 2),
+        "error": error,
+    }
+
+
+def run_tables(func, input_tables, max_workers=1):
+    """Run func for each input table using a bounded thread pool.
+
+    A failing table doesn't stop the others; results are returned in the same order as input_tables.
+    """
+    if max_workers <= 1:
+        return [run_table(func, input_table) for input_table in input_tables]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_table, func, input_table): input_table for input_table in input_tables}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    return [results[input_table] for input_table in input_tables]
+
+
+def run_tables_as_completed(func, input_tables, ready_futures, max_workers=1):
+    """Run func for each input table as soon as the table is ready - i.e. its future in ready_futures (e.g. its
+    sample's query) has completed. Tables without a future are ready straight away.
+
+    As run_tables, a failing table doesn't stop the others; results are returned in the same order as input_tables.
+    """
+    ready_tables = {}
+    for input_table in input_tables:
+        future = ready_futures.get(input_table)
+        if future is None:
+            future = Future()
+            future.set_result(None)
+        ready_tables[future] = input_table
+
+    # ready futures are dropped once their table has been started, so a result they hold (e.g. a sample) isn't kept
+    # in memory after func has used it
+    results = {}
+    if max_workers <= 1:
+        for future in as_completed(list(ready_tables)):
+            input_table = ready_tables.pop(future)
+            results[input_table] = run_table(func, input_table)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for future in as_completed(list(ready_tables)):
+                input_table = ready_tables.pop(future)
+                futures[executor.submit(run_table, func, input_table)] = input_table
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+    return [results[input_table] for input_table in input_tables]
+
+
+def log_table_summary(results, description):
+    """Log an ordered, per-table summary of the run. Returns the number of failed tables."""
+    failed = [result for result in results if result["status"] == "failed"]
+    skipped = [result for result in results if result["status"] == "skipped"]
+
+    logger.info(f"\nSummary - {description}:")
+    for result in results:
+        log = logger.error if result["status"] == "failed" else logger.info
+        log(f"{result['table']}: {result['status']} ({result['elapsed_time']} seconds)")
+    logger.info(
+        f"{len(results) - len(failed) - len(skipped)} succeeded, {len(skipped)} skipped (unchanged or empty), "
+        f"{len(failed)} failed - out of {len(results)} tables."
+    )
+
+    return len(failed)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the pipeline's modules are scripts in src/py, imported by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
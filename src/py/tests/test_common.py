@@ -0,0 +1,58 @@
+"""Check the column & table glob patterns of config.yaml are matched case-insensitively, in the configured order."""
+import common
+import pytest
+
+COLUMNS = ["ID", "Name", "DWH_LOAD_ID", "dwh_batch", "DW_MODIFIED_TIMESTAMP_UTC", "AMOUNT"]
+
+
+@pytest.mark.parametrize(
+    "cols_to_include, cols_to_exclude, expected_columns",
+    [
+        (None, None, COLUMNS),
+        ([], [], COLUMNS),
+        (None, ["DWH_*"], ["ID", "Name", "DW_MODIFIED_TIMESTAMP_UTC", "AMOUNT"]),
+        (None, ["dwh_*", "dw_modified_timestamp*"], ["ID", "Name", "AMOUNT"]),
+        (["name", "amount"], None, ["Name", "AMOUNT"]),
+        # the columns keep their order, not the patterns'
+        (["AMOUNT", "I?"], None, ["ID", "AMOUNT"]),
+        # an excluded column isn't selected, even if it's included
+        (["*ID"], ["DWH_*"], ["ID"]),
+        (["DWH_LOAD_ID"], ["*"], []),
+        (["[DN]*"], None, ["Name", "DWH_LOAD_ID", "dwh_batch", "DW_MODIFIED_TIMESTAMP_UTC"]),
+        (["missing"], None, []),
+    ],
+)
+def test_select_columns(cols_to_include, cols_to_exclude, expected_columns):
+    assert common.select_columns(COLUMNS, cols_to_include, cols_to_exclude) == expected_columns
+
+
+TABLE_NAMES = ["DIM_CARD", "DIM_MERCHANT", "DIM_MERCHANT_ALL", "FACT_SALES", "dim_lower"]
+
+
+@pytest.mark.parametrize(
+    "input_tables, expected_tables",
+    [
+        (["dim_card", "fact_sales"], ["dim_card", "fact_sales"]),
+        # a pattern's matches are sorted, and keep Snowflake's names
+        (["dim_*"], ["DIM_CARD", "DIM_MERCHANT", "DIM_MERCHANT_ALL", "dim_lower"]),
+        (["DIM_MERCHANT?ALL", "fact_*"], ["DIM_MERCHANT_ALL", "FACT_SALES"]),
+        # a table matched more than once is listed the first time - so earlier tables & patterns take precedence
+        (["FACT_SALES", "*"], ["FACT_SALES", "DIM_CARD", "DIM_MERCHANT", "DIM_MERCHANT_ALL", "dim_lower"]),
+        (["dim_merchant*", "dim_*"], ["DIM_MERCHANT", "DIM_MERCHANT_ALL", "DIM_CARD", "dim_lower"]),
+        # ... in any case
+        (["dim_card", "DIM_*"], ["dim_card", "DIM_MERCHANT", "DIM_MERCHANT_ALL", "dim_lower"]),
+        (["DIM_*", "Dim_Card"], ["DIM_CARD", "DIM_MERCHANT", "DIM_MERCHANT_ALL", "dim_lower"]),
+        # a table name isn't a pattern, so it's kept as configured - even if it isn't in the schema
+        (["dim_missing", "dim_c*"], ["dim_missing", "DIM_CARD"]),
+        (["stg_*"], []),
+    ],
+)
+def test_expand_table_patterns(input_tables, expected_tables):
+    assert common.expand_table_patterns(input_tables, TABLE_NAMES) == expected_tables
+
+
+@pytest.mark.parametrize(
+    "input_table, is_pattern", [("dim_card", False), ("dim_*", True), ("dim_?", True), ("dim_[ab]", True)]
+)
+def test_is_table_pattern(input_table, is_pattern):
+    assert common.is_table_pattern(input_table) == is_pattern
@@ -0,0 +1,46 @@
+"""Check the suite stage's pandas batches name their columns as GX names the query assets' columns."""
+from contextlib import contextmanager
+
+import create_gx_expectation_suite
+import great_expectations as gx
+import pandas as pd
+import pytest
+import snowflake_client
+import sql_validator
+
+# a Snowflake sample's columns: unquoted (case-insensitive, so upper case) names, and a quoted mixed case one
+SAMPLE = pd.DataFrame({"ID": [1, 2], "Name": ["a", "b"], "AMOUNT": [1.5, None]})
+
+
+class FakeConnectionPool:
+    @contextmanager
+    def connection(self):
+        yield None
+
+
+@pytest.fixture
+def pandas_datasource(monkeypatch):
+    monkeypatch.setattr(snowflake_client, "get_selected_columns", lambda *args: list(SAMPLE.columns))
+    monkeypatch.setattr(snowflake_client, "snowflake_query", lambda *args: SAMPLE.copy())
+    return gx.get_context(mode="ephemeral").sources.add_pandas("test_datasource_pandas")
+
+
+def get_batch_columns(pandas_datasource, dialect):
+    create_gx_expectation_suite.prepare_pandas_batch_request(
+        "dim_a", {"row_count_limit": 10}, FakeConnectionPool(), pandas_datasource, None, dialect
+    )
+    # the batch request's DataFrame is kept by its asset
+    return list(pandas_datasource.get_asset("dim_a").dataframe.columns)
+
+
+def test_snowflake_pandas_batch_columns_match_the_query_asset(pandas_datasource):
+    columns = get_batch_columns(pandas_datasource, "snowflake")
+
+    # as GX's Snowflake dialect reports the query asset's columns - so a suite the assistant creates on the pandas
+    # batch validates against the query asset ('validation_batch_mode: query')
+    assert columns == ["id", "Name", "amount"]
+    assert [sql_validator.quote_column(column) for column in columns] == ['"ID"', '"Name"', '"AMOUNT"']
+
+
+def test_other_dialects_keep_the_sample_columns(pandas_datasource):
+    assert get_batch_columns(pandas_datasource, "sqlite") == ["ID", "Name", "AMOUNT"]
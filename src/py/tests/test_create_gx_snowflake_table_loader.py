@@ -0,0 +1,91 @@
+"""Check sync_query_assets against an ephemeral GX context - it relies on GX 0.17.19's private datasource internals."""
+import sqlite3
+
+import create_gx_snowflake_table_loader
+import great_expectations as gx
+import pytest
+from great_expectations.data_context import EphemeralDataContext
+
+
+@pytest.fixture
+def datasource(tmp_path):
+    database_path = tmp_path / "test.db"
+    conn = sqlite3.connect(database_path)
+    conn.execute("CREATE TABLE DIM_A (ID INTEGER, NAME TEXT)")
+    conn.execute("INSERT INTO DIM_A VALUES (1, 'a'), (2, 'b')")
+    conn.commit()
+    conn.close()
+
+    context = gx.get_context(mode="ephemeral")
+    return context.sources.add_sqlite(name="test_datasource", connection_string=f"sqlite:///{database_path}")
+
+
+@pytest.fixture
+def config_writes(monkeypatch):
+    """Count the context's project config writes."""
+    writes = []
+    save_project_config = EphemeralDataContext._save_project_config
+
+    def count_save_project_config(self, *args, **kwargs):
+        writes.append(args)
+        return save_project_config(self, *args, **kwargs)
+
+    monkeypatch.setattr(EphemeralDataContext, "_save_project_config", count_save_project_config)
+    return writes
+
+
+def test_gx_version_is_pinned():
+    # sync_query_assets uses Datasource._add_asset's private internals - re-check it before upgrading GX
+    assert gx.__version__ == "0.17.19"
+
+
+def test_assets_are_added_with_one_config_write(datasource, config_writes):
+    asset_queries = {"dim_a": "SELECT ID FROM DIM_A", "dim_b": "SELECT NAME FROM DIM_A LIMIT 1"}
+
+    assert create_gx_snowflake_table_loader.sync_query_assets(datasource, asset_queries) == (
+        ["dim_a", "dim_b"],
+        [],
+        [],
+    )
+    assert len(config_writes) == 1
+    context_datasource = datasource._data_context.get_datasource("test_datasource")
+    assert {asset.name: asset.query for asset in context_datasource.assets} == asset_queries
+
+    # the added assets are usable, as assets added with add_query_asset are
+    asset = context_datasource.get_asset("dim_a")
+    batches = asset.get_batch_list_from_batch_request(asset.build_batch_request())
+    assert len(batches) == 1
+
+
+def test_assets_are_updated_and_removed(datasource, config_writes):
+    create_gx_snowflake_table_loader.sync_query_assets(
+        datasource, {"dim_a": "SELECT ID FROM DIM_A", "dim_b": "SELECT NAME FROM DIM_A"}
+    )
+    asset_queries = {"dim_a": "SELECT ID, NAME FROM DIM_A", "dim_c": "SELECT ID FROM DIM_A LIMIT 1"}
+
+    assert create_gx_snowflake_table_loader.sync_query_assets(datasource, asset_queries) == (
+        ["dim_c"],
+        ["dim_a"],
+        ["dim_b"],
+    )
+    assert len(config_writes) == 2
+    assert {asset.name: asset.query for asset in datasource.assets} == asset_queries
+
+
+def test_unchanged_assets_are_not_written(datasource, config_writes):
+    asset_queries = {"dim_a": "SELECT ID FROM DIM_A"}
+    create_gx_snowflake_table_loader.sync_query_assets(datasource, asset_queries)
+
+    assert create_gx_snowflake_table_loader.sync_query_assets(datasource, asset_queries) == ([], [], [])
+    assert len(config_writes) == 1
+
+
+def test_invalid_query_leaves_assets_unchanged(datasource, config_writes):
+    create_gx_snowflake_table_loader.sync_query_assets(datasource, {"dim_a": "SELECT ID FROM DIM_A"})
+
+    with pytest.raises(ValueError):
+        create_gx_snowflake_table_loader.sync_query_assets(
+            datasource, {"dim_a": "SELECT ID FROM DIM_A", "dim_b": "DELETE FROM DIM_A"}
+        )
+    assert [asset.name for asset in datasource.assets] == ["dim_a"]
+    assert len(config_writes) == 1
@@ -0,0 +1,51 @@
+"""Check the sampling that adaptive sampling chooses from a table's row count."""
+import preflight
+import pytest
+
+PREFLIGHT_PARAMS = {"block_sampling_min_rows": 10_000_000, "block_sampling_oversample": 2}
+
+
+@pytest.mark.parametrize(
+    "row_count, sampling, expected_sampling",
+    [
+        # no row count (e.g. a view) - the configured sampling is kept
+        (None, {"mode": "row"}, None),
+        # no more rows than row_count_limit - the table is read whole
+        (0, None, {"mode": "limit"}),
+        (1000, {"mode": "bernoulli", "percent": 10}, {"mode": "limit"}),
+        (1000, {"mode": "stratified", "stratify_by": "REGION"}, {"mode": "limit"}),
+        # more rows, but not more than block_sampling_min_rows - the configured sampling is kept
+        (1001, None, None),
+        (10_000_000, {"mode": "row"}, None),
+        # a large table with a sample that scans every row gets a block sample of ~2 x 1000 rows
+        (20_000_000, {"mode": "row"}, {"mode": "block", "percent": 0.01, "seed": 0}),
+        (20_000_000, {"mode": "bernoulli", "percent": 50, "seed": 5}, {"mode": "block", "percent": 0.01, "seed": 5}),
+        # ... with at most 6 decimal places (rounded up, so it isn't 0)
+        (3_000_000_000, {"mode": "row"}, {"mode": "block", "percent": 6.7e-05, "seed": 0}),
+        (10**15, {"mode": "row"}, {"mode": "block", "percent": 1e-06, "seed": 0}),
+        # samples that don't scan every row are kept
+        (20_000_000, None, None),
+        (20_000_000, {"mode": "limit"}, None),
+        (20_000_000, {"mode": "block", "percent": 1}, None),
+        (20_000_000, {"mode": "stratified", "stratify_by": "REGION"}, None),
+    ],
+)
+def test_choose_sampling(row_count, sampling, expected_sampling):
+    table_params = {"row_count_limit": 1000, "sampling": sampling}
+
+    assert preflight.choose_sampling(row_count, table_params, PREFLIGHT_PARAMS) == expected_sampling
+
+
+@pytest.mark.parametrize(
+    "preflight_params, expected_percent",
+    [
+        ({}, 0.01),  # the defaults: over 10M rows, 2 x oversampled
+        ({"block_sampling_oversample": 5}, 0.025),
+        # the percent is capped at 100
+        ({"block_sampling_min_rows": 1000, "block_sampling_oversample": 50_000}, 100),
+    ],
+)
+def test_block_sampling_params(preflight_params, expected_percent):
+    table_params = {"row_count_limit": 1000, "sampling": {"mode": "row"}}
+
+    assert preflight.choose_sampling(20_000_000, table_params, preflight_params)["percent"] == expected_percent
@@ -0,0 +1,108 @@
+"""Check the run journal survives a crash mid-append, and that a resumed run skips the work it records as completed."""
+import json
+import os
+import re
+
+import create_gx_data_profiler
+import gxbulk
+import pytest
+import run_journal
+import tracing
+
+RUN_ID = "20260101T000000-abc123"
+PROCESS_RUN_ID = tracing.RUN_ID
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(run_journal, "_started_journals", set())
+    monkeypatch.setattr(tracing, "RUN_ID", RUN_ID)
+    return tmp_path / run_journal.RUN_JOURNAL_DIR
+
+
+def test_resumed_journal_has_the_last_entry_per_table_and_stage():
+    journal = run_journal.RunJournal()
+    journal.record("dim_a", "profile", "failed", error="boom")
+    journal.record("dim_a", "profile")
+    journal.record("dim_b", "profile", "failed", error="boom")
+    journal.record(None, "load")
+
+    resumed_journal = run_journal.RunJournal(RUN_ID, resume=True)
+
+    assert resumed_journal.is_completed("dim_a", "profile")
+    assert not resumed_journal.is_completed("dim_b", "profile")
+    assert resumed_journal.get("dim_b", "profile")["error"] == "boom"
+    assert resumed_journal.is_completed(None, "load")
+    assert resumed_journal.get("dim_c", "profile") == {}
+
+
+def test_a_partial_last_line_is_dropped(journal_dir):
+    journal = run_journal.RunJournal()
+    journal.record("dim_a", "profile")
+    journal.record("dim_b", "profile")
+    journal_path = journal_dir / f"{RUN_ID}.jsonl"
+    complete_content = journal_path.read_bytes()
+    with open(journal_path, "ab") as file:
+        file.write(b'{"at": "2026-01-01T00:00:01", "stage": "pro')  # a crash mid-append
+
+    resumed_journal = run_journal.RunJournal(RUN_ID, resume=True)
+    assert journal_path.read_bytes() == complete_content
+    assert set(resumed_journal.entries) == {("dim_a", "profile"), ("dim_b", "profile")}
+
+    # ... so the next entry starts on a line of its own
+    resumed_journal.record("dim_c", "profile")
+    lines = journal_path.read_text().splitlines()
+    assert [json.loads(line)["table"] for line in lines] == ["dim_a", "dim_b", "dim_c"]
+
+
+def test_resuming_a_run_without_a_journal_fails():
+    with pytest.raises(ValueError, match="No run journal to resume"):
+        run_journal.RunJournal("20260101T000000-missing", resume=True)
+
+
+def test_a_new_run_doesnt_reuse_another_runs_journal(journal_dir):
+    os.makedirs(journal_dir)
+    (journal_dir / f"{RUN_ID}.jsonl").write_text(json.dumps({"table": "dim_a", "stage": "profile"}) + "\n")
+
+    with pytest.raises(ValueError, match="already has a run journal"):
+        run_journal.RunJournal()
+
+
+def test_a_runs_stages_share_its_journal():
+    run_journal.RunJournal().record("dim_a", "profile")
+
+    assert run_journal.RunJournal().is_completed("dim_a", "profile")
+
+
+def test_run_ids_have_a_random_suffix():
+    # so runs started in the same second don't share a journal
+    assert re.fullmatch(r"\d{8}T\d{6}-[0-9a-f]{6}", PROCESS_RUN_ID)
+
+
+def test_a_resumed_run_skips_its_completed_stages(monkeypatch):
+    stage_runs = []
+
+    def run_stage(stage, force=False, run_id=None, tables=None):
+        stage_runs.append((stage, run_id))
+        if stage == "suite" and len(stage_runs) == 3:
+            raise RuntimeError("suite stage failed")
+        return 0.0  # the stage's seconds
+
+    monkeypatch.setattr(gxbulk, "run_stage", run_stage)
+    with pytest.raises(RuntimeError):
+        gxbulk.main(["all"])
+    gxbulk.main(["all", "--resume", RUN_ID])
+
+    assert stage_runs == [(stage, RUN_ID) for stage in ["load", "profile", "suite", "suite", "docs"]]
+
+
+def test_a_resumed_run_skips_the_tables_it_profiled():
+    run_journal.RunJournal().record("dim_a", "profile")
+    journal = run_journal.RunJournal(RUN_ID, resume=True)
+
+    def get_skip_reason(input_table):
+        return create_gx_data_profiler.get_skip_reason(input_table, [], journal, None, None, force=True)
+
+    assert get_skip_reason("dim_a") == f"table already profiled in run {RUN_ID}"
+    assert get_skip_reason("dim_b") is None
@@ -0,0 +1,150 @@
+"""Check the sample cache's hits & misses, its TTL, and that pruning removes the least recently used entries first."""
+import os
+import time
+
+import pandas as pd
+import pytest
+import sample_cache
+
+SAMPLE = pd.DataFrame({"id": [1, 2, 3], "name": ["a", None, "c"], "amount": [1.5, 2.5, None]})
+CACHE_PARAMS = {"ttl_seconds": 3600, "max_size_mb": 1}
+
+
+class FakeFetch:
+    """Returns a copy of the sample, counting the calls (i.e. the Snowflake queries)."""
+
+    def __init__(self, df=SAMPLE):
+        self.df = df
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.df.copy()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / sample_cache.SAMPLE_CACHE_DIR
+
+
+def get_sample(fetch, sql_query="SELECT * FROM dim_a LIMIT 3", fingerprint="fp-1", sample_cache_params=CACHE_PARAMS):
+    return sample_cache.get_or_fetch("dim_a", sql_query, fingerprint, sample_cache_params, fetch)
+
+
+def set_times(cache_file_path, last_used, written):
+    os.utime(cache_file_path, (last_used, written))
+
+
+def test_a_cached_sample_is_only_fetched_once():
+    fetch = FakeFetch()
+
+    pd.testing.assert_frame_equal(get_sample(fetch), SAMPLE)
+    pd.testing.assert_frame_equal(get_sample(fetch), SAMPLE)
+    assert fetch.calls == 1
+
+
+@pytest.mark.parametrize("changed", [{"sql_query": "SELECT * FROM dim_a LIMIT 4"}, {"fingerprint": "fp-2"}])
+def test_a_changed_query_or_table_is_fetched_again(changed):
+    fetch = FakeFetch()
+    get_sample(fetch)
+    get_sample(fetch, **changed)
+
+    assert fetch.calls == 2
+
+
+@pytest.mark.parametrize(
+    "bypass", [{"sample_cache_params": None}, {"sample_cache_params": {}}, {"fingerprint": None}], ids=str
+)
+def test_without_cache_params_or_a_fingerprint_nothing_is_cached(cache_dir, bypass):
+    fetch = FakeFetch()
+    get_sample(fetch, **bypass)
+    get_sample(fetch, **bypass)
+
+    assert fetch.calls == 2
+    assert not cache_dir.exists()
+
+
+def test_an_expired_sample_is_fetched_again():
+    fetch = FakeFetch()
+    get_sample(fetch)
+    cache_file_path = sample_cache.get_sample_file_path(
+        sample_cache.get_sample_key("dim_a", "SELECT * FROM dim_a LIMIT 3", "fp-1")
+    )
+    # last used just now - but written over ttl_seconds ago
+    set_times(cache_file_path, time.time(), time.time() - CACHE_PARAMS["ttl_seconds"] - 1)
+
+    get_sample(fetch)
+    assert fetch.calls == 2
+    assert time.time() - os.path.getmtime(cache_file_path) < 60  # re-written
+
+
+def test_a_sample_arrow_cant_convert_isnt_cached(cache_dir):
+    fetch = FakeFetch(pd.DataFrame({"mixed": [1, "a", 2.5]}))
+    get_sample(fetch)
+    get_sample(fetch)
+
+    assert fetch.calls == 2
+    assert not cache_dir.exists()
+
+
+def write_entries(count):
+    """Cache count samples (of the same size), returning their file paths."""
+    cache_file_paths = []
+    for index in range(count):
+        sample_key = sample_cache.get_sample_key(f"dim_{index}", "SELECT 1", "fp")
+        sample_cache.write_sample(sample_key, SAMPLE)
+        cache_file_paths.append(sample_cache.get_sample_file_path(sample_key))
+    return cache_file_paths
+
+
+def test_prune_removes_expired_entries():
+    now = time.time()
+    expired, fresh = write_entries(2)
+    set_times(expired, now, now - 7200)  # recently used, but written 2 hours ago
+    set_times(fresh, now - 3000, now - 3000)
+
+    sample_cache.prune_sample_cache(ttl_seconds=3600)
+
+    assert not os.path.exists(expired)
+    assert os.path.exists(fresh)
+
+
+def test_prune_removes_the_least_recently_used_entries_beyond_max_size(cache_dir):
+    now = time.time()
+    cache_file_paths = write_entries(5)
+    # written in turn, but last used in another order: entry 3, 0, 4, 1, 2 (least recently)
+    for cache_file_path, last_used in zip(cache_file_paths, [now - 10, now - 30, now - 40, now, now - 20]):
+        set_times(cache_file_path, last_used, now - 100)
+    (cache_dir / ".tmp_partial").write_bytes(b"a sample still being written")
+    entry_size = os.path.getsize(cache_file_paths[0])
+
+    sample_cache.prune_sample_cache(ttl_seconds=3600, max_size_mb=3.5 * entry_size / 1024 / 1024)
+
+    assert [os.path.exists(cache_file_path) for cache_file_path in cache_file_paths] == [True, False, False, True, True]
+    assert (cache_dir / ".tmp_partial").exists()
+
+
+def test_reading_an_entry_keeps_it_in_the_cache():
+    now = time.time()
+    fetch = FakeFetch()
+    get_sample(fetch)
+    (read_entry,) = (
+        os.path.join(sample_cache.SAMPLE_CACHE_DIR, filename) for filename in os.listdir(sample_cache.SAMPLE_CACHE_DIR)
+    )
+    (other_entry,) = write_entries(1)
+    set_times(read_entry, now - 60, now - 60)
+    set_times(other_entry, now - 30, now - 30)
+
+    get_sample(fetch)  # a cache hit, which makes it the most recently used entry
+    sample_cache.prune_sample_cache(ttl_seconds=3600, max_size_mb=1.5 * os.path.getsize(read_entry) / 1024 / 1024)
+
+    assert fetch.calls == 1
+    assert os.path.exists(read_entry)
+    assert not os.path.exists(other_entry)
+
+
+def test_pruning_without_a_cache_does_nothing(cache_dir):
+    sample_cache.prune_sample_cache()
+
+    assert not cache_dir.exists()
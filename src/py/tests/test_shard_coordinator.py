@@ -0,0 +1,164 @@
+"""Check the sharded run's table leases: claims, steals of expired leases, stale tokens & attempt limits."""
+import multiprocessing
+
+import pytest
+import shard_coordinator
+
+TABLES = ["dim_a", "dim_b", "dim_c"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(shard_coordinator, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def coordinator(tmp_path, clock):
+    coordinator = shard_coordinator.ShardCoordinator(str(tmp_path / "shards"), lease_seconds=60)
+    coordinator.seed(TABLES)
+    return coordinator
+
+
+def test_claims_lease_pending_tables_in_priority_order(coordinator):
+    first_claims = coordinator.claim("worker-1", count=2)
+    second_claims = coordinator.claim("worker-2", count=2)
+
+    assert list(first_claims) == ["dim_a", "dim_b"]
+    assert list(second_claims) == ["dim_c"]
+    assert coordinator.claim("worker-3") == {}
+    assert coordinator.get_status() == {
+        "dim_a": ("leased", "worker-1", 1, None),
+        "dim_b": ("leased", "worker-1", 1, None),
+        "dim_c": ("leased", "worker-2", 1, None),
+    }
+    assert len(set(first_claims.values()) | set(second_claims.values())) == 3  # each claim has a token of its own
+
+
+def test_seed_replaces_the_tables(coordinator):
+    coordinator.claim("worker-1")
+    coordinator.seed(["dim_c", "dim_d"])
+
+    assert coordinator.get_status() == {"dim_c": ("pending", None, 0, None), "dim_d": ("pending", None, 0, None)}
+
+
+def test_complete_marks_the_table_done(coordinator):
+    claims = coordinator.claim("worker-1", count=3)
+    for table_name, lease_token in claims.items():
+        assert coordinator.complete(table_name, lease_token)
+
+    assert {status for status, *_ in coordinator.get_status().values()} == {"done"}
+    assert not coordinator.has_unfinished()
+    assert coordinator.claim("worker-2") == {}
+
+
+def test_expired_leases_are_stolen_after_pending_tables(coordinator, clock):
+    claims = coordinator.claim("worker-1", count=2)
+    clock.now += 30
+    assert coordinator.renew(claims) == []
+    clock.now += 60  # dim_a & dim_b's leases were renewed, so have another 30 seconds
+    assert list(coordinator.claim("worker-2")) == ["dim_c"]
+    assert coordinator.claim("worker-2") == {}
+
+    clock.now += 31
+    stolen_claims = coordinator.claim("worker-2", count=3)
+
+    assert list(stolen_claims) == ["dim_a", "dim_b"]
+    assert coordinator.get_status()["dim_a"] == ("leased", "worker-2", 2, None)
+
+
+def test_a_stolen_lease_cant_be_renewed_or_completed(coordinator, clock):
+    stale_claims = coordinator.claim("worker-1", count=3)
+    clock.now += 61
+    stolen_claims = coordinator.claim("worker-2")
+
+    # dim_b & dim_c's leases expired, but weren't stolen - so worker-1 can still renew them
+    assert coordinator.renew(stale_claims) == ["dim_a"]
+    assert not coordinator.complete("dim_a", stale_claims["dim_a"])
+    assert not coordinator.complete("dim_a", stale_claims["dim_a"], error="worker-1's late error", max_attempts=3)
+    assert coordinator.get_status()["dim_a"] == ("leased", "worker-2", 2, None)
+    assert coordinator.complete("dim_a", stolen_claims["dim_a"])
+    assert coordinator.get_status()["dim_a"] == ("done", "worker-2", 2, None)
+
+
+def test_a_failed_table_is_retried_until_max_attempts(coordinator):
+    claims = coordinator.claim("worker-1", count=3, max_attempts=2)
+    assert coordinator.complete("dim_a", claims["dim_a"], error="error 1", max_attempts=2)
+    assert coordinator.complete("dim_b", claims["dim_b"])
+    assert coordinator.complete("dim_c", claims["dim_c"])
+    assert coordinator.get_status()["dim_a"] == ("pending", "worker-1", 1, "error 1")
+
+    retry_claims = coordinator.claim("worker-2", count=3, max_attempts=2)
+    assert list(retry_claims) == ["dim_a"]
+    assert coordinator.complete("dim_a", retry_claims["dim_a"], error="error 2", max_attempts=2)
+
+    assert coordinator.get_status()["dim_a"] == ("failed", "worker-2", 2, "error 2")
+    assert coordinator.claim("worker-3", max_attempts=2) == {}
+    assert not coordinator.has_unfinished()
+
+
+def test_a_steal_counts_as_an_attempt(coordinator, clock):
+    coordinator.claim("worker-1", count=3)
+    clock.now += 61
+    claims = coordinator.claim("worker-2", max_attempts=2)
+    assert coordinator.complete("dim_a", claims["dim_a"], error="error", max_attempts=2)
+
+    assert coordinator.get_status()["dim_a"] == ("failed", "worker-2", 2, "error")
+
+
+def test_an_expired_lease_past_max_attempts_is_failed(coordinator, clock):
+    coordinator.claim("worker-1", count=3, max_attempts=1)
+    clock.now += 61
+
+    assert coordinator.claim("worker-2", count=3, max_attempts=1) == {}
+    assert coordinator.get_status()["dim_a"] == ("failed", "worker-1", 1, "lease expired")
+    assert not coordinator.has_unfinished()
+
+
+def claim_tables(shard_dir, worker_id, queue):
+    """Spawned worker: claim & complete tables one at a time until none are left, reporting the ones it ran."""
+    coordinator = shard_coordinator.ShardCoordinator(shard_dir)
+    while True:
+        claims = coordinator.claim(worker_id)
+        if not claims:
+            break
+        for table_name, lease_token in claims.items():
+            if coordinator.complete(table_name, lease_token):
+                queue.put(table_name)
+    queue.put(None)
+
+
+def test_worker_processes_run_each_table_once(tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    input_tables = [f"dim_{index:03d}" for index in range(200)]
+    shard_coordinator.ShardCoordinator(shard_dir).seed(input_tables)
+
+    mp_context = multiprocessing.get_context("spawn")
+    queue = mp_context.Queue()
+    workers = [
+        mp_context.Process(target=claim_tables, args=(shard_dir, f"worker-{index}", queue)) for index in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    completed_tables, finished_workers = [], 0
+    while finished_workers < len(workers):
+        table_name = queue.get(timeout=120)
+        if table_name is None:
+            finished_workers += 1
+        else:
+            completed_tables.append(table_name)
+    for worker in workers:
+        worker.join()
+
+    assert sorted(completed_tables) == input_tables
+    status = shard_coordinator.ShardCoordinator(shard_dir).get_status()
+    assert {(table_status, attempts) for table_status, _, attempts, _ in status.values()} == {("done", 1)}
@@ -0,0 +1,80 @@
+"""Check the sampling queries built for each sampling mode, with & without a column list and a partition filter."""
+import pytest
+import sql_builder
+
+WHERE = "MOD(ABS(HASH(*)), 4) = 1"
+
+
+@pytest.mark.parametrize(
+    "sampling, columns, where, expected_sql",
+    [
+        (None, None, None, "SELECT * FROM dim_a LIMIT 100"),
+        ({"mode": "limit"}, ["ID", "Name"], None, 'SELECT "ID", "Name" FROM dim_a LIMIT 100'),
+        ({"mode": "limit"}, None, WHERE, f"SELECT * FROM dim_a WHERE {WHERE} LIMIT 100"),
+        ({"mode": "row"}, ["ID"], None, 'SELECT "ID" FROM dim_a SAMPLE ROW (100 ROWS)'),
+        # the rows are filtered before the fixed-size sample is taken, so it has 100 of the filtered rows
+        (
+            {"mode": "row"},
+            ["ID"],
+            WHERE,
+            f'SELECT "ID" FROM (SELECT * FROM dim_a WHERE {WHERE}) SAMPLE ROW (100 ROWS)',
+        ),
+        ({"mode": "block", "percent": 5}, None, None, "SELECT * FROM dim_a SAMPLE BLOCK (5) SEED (0) LIMIT 100"),
+        (
+            {"mode": "bernoulli", "percent": 0.5, "seed": 7},
+            ["ID"],
+            WHERE,
+            f'SELECT "ID" FROM dim_a SAMPLE BERNOULLI (0.5) SEED (7) WHERE {WHERE} LIMIT 100',
+        ),
+        (
+            {"mode": "stratified", "stratify_by": "REGION"},
+            None,
+            None,
+            "SELECT * FROM dim_a ORDER BY ROW_NUMBER() OVER (PARTITION BY REGION ORDER BY RANDOM(0)) LIMIT 100",
+        ),
+        (
+            {"mode": "stratified", "stratify_by": "REGION", "seed": 3},
+            ["ID", "REGION"],
+            WHERE,
+            f'SELECT "ID", "REGION" FROM dim_a WHERE {WHERE} '
+            "ORDER BY ROW_NUMBER() OVER (PARTITION BY REGION ORDER BY RANDOM(3)) LIMIT 100",
+        ),
+    ],
+)
+def test_build_sample_query(sampling, columns, where, expected_sql):
+    assert sql_builder.build_sample_query("dim_a", 100, sampling, columns, where) == expected_sql
+
+
+@pytest.mark.parametrize(
+    "sampling, error",
+    [
+        ({"mode": "block"}, "needs a 'percent' between 0 and 100"),
+        ({"mode": "block", "percent": 0}, "needs a 'percent' between 0 and 100"),
+        ({"mode": "bernoulli", "percent": -1}, "needs a 'percent' between 0 and 100"),
+        ({"mode": "bernoulli", "percent": 101}, "needs a 'percent' between 0 and 100"),
+        ({"mode": "stratified"}, "needs a 'stratify_by' column"),
+        ({"mode": "system"}, "Invalid sampling mode 'system'"),
+    ],
+)
+def test_invalid_sampling_is_rejected(sampling, error):
+    with pytest.raises(ValueError, match=error):
+        sql_builder.build_sample_query("dim_a", 100, sampling)
+
+
+@pytest.mark.parametrize("percent", [0.001, 50, 100])
+def test_sampling_percents_up_to_100_are_accepted(percent):
+    assert f"SAMPLE BLOCK ({percent})" in sql_builder.build_sample_query(
+        "dim_a", 100, {"mode": "block", "percent": percent}
+    )
+
+
+@pytest.mark.parametrize(
+    "partition_by, expected_predicate",
+    [
+        (None, "MOD(ABS(HASH(*)), 4) = 1"),
+        ("ID", 'MOD(ABS(HASH("ID")), 4) = 1'),
+        (["ID", "Region"], 'MOD(ABS(HASH("ID", "Region")), 4) = 1'),
+    ],
+)
+def test_build_partition_predicate(partition_by, expected_predicate):
+    assert sql_builder.build_partition_predicate(1, 4, partition_by) == expected_predicate
@@ -0,0 +1,186 @@
+"""Check the compiled suite query's results against GX's own, for a small sample in SQLite."""
+import math
+import sqlite3
+import statistics
+
+import great_expectations as gx
+import pandas as pd
+import pytest
+import sql_validator
+from great_expectations.core import ExpectationConfiguration
+from great_expectations.core import ExpectationSuite
+
+SAMPLE = pd.DataFrame(
+    {
+        "id": [1, 2, 3, 4, 5, 6, 7, 8],
+        "amount": [10.5, 20.0, None, 40.25, 50.0, 20.0, None, 80.0],
+        "name": ["a", "b", "b", None, "c", "d", "d", "d"],
+    }
+)
+
+EXPECTATIONS = [
+    ("expect_table_row_count_to_be_between", {"min_value": 1, "max_value": 10}),
+    ("expect_table_row_count_to_be_between", {"min_value": 10}),
+    ("expect_table_columns_to_match_set", {"column_set": ["id", "amount", "name"], "exact_match": True}),
+    ("expect_table_columns_to_match_set", {"column_set": ["id", "amount"], "exact_match": False}),
+    ("expect_table_columns_to_match_set", {"column_set": ["id", "other"], "exact_match": True}),
+    ("expect_column_values_to_not_be_null", {"column": "amount"}),
+    ("expect_column_values_to_not_be_null", {"column": "amount", "mostly": 0}),
+    ("expect_column_values_to_not_be_null", {"column": "amount", "mostly": 0.75}),
+    ("expect_column_values_to_be_null", {"column": "amount"}),
+    ("expect_column_values_to_be_in_set", {"column": "name", "value_set": ["a", "b", "c"]}),
+    ("expect_column_values_to_be_in_set", {"column": "name", "value_set": ["a", "b", "c"], "mostly": 0}),
+    ("expect_column_values_to_not_be_in_set", {"column": "name", "value_set": ["d"]}),
+    ("expect_column_values_to_be_between", {"column": "amount", "min_value": 20, "max_value": 50}),
+    ("expect_column_values_to_be_between", {"column": "amount", "min_value": 20, "strict_min": True, "mostly": 0.5}),
+    ("expect_column_values_to_be_unique", {"column": "id"}),
+    ("expect_column_values_to_be_unique", {"column": "name"}),
+    ("expect_column_values_to_be_unique", {"column": "amount", "mostly": 0.5}),
+    ("expect_column_min_to_be_between", {"column": "amount", "min_value": 10, "max_value": 11}),
+    ("expect_column_max_to_be_between", {"column": "amount", "max_value": 50}),
+    ("expect_column_mean_to_be_between", {"column": "amount", "min_value": 30, "max_value": 40}),
+    ("expect_column_median_to_be_between", {"column": "amount", "min_value": 30, "max_value": 40}),
+    ("expect_column_stdev_to_be_between", {"column": "amount", "min_value": 20, "max_value": 30}),
+    ("expect_column_unique_value_count_to_be_between", {"column": "name", "min_value": 4, "max_value": 4}),
+    ("expect_column_proportion_of_unique_values_to_be_between", {"column": "name", "max_value": 0.5}),
+]
+
+
+class MedianAggregate:
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+class StdDevSampAggregate(MedianAggregate):
+    def finalize(self):
+        return statistics.stdev(self.values) if len(self.values) > 1 else None
+
+
+def query_compiled_suite(expectation_configs):
+    """Compile the expectations into one suite query over the sample in SQLite, returning {index: (success, result)}
+    for the compiled expectations."""
+    expectation_suite = ExpectationSuite(expectation_suite_name="test_suite", expectations=expectation_configs)
+    sql, select_keys, compiled, not_compiled = sql_validator.compile_suite(
+        expectation_suite, "SELECT * FROM SAMPLE_TABLE"
+    )
+    assert not_compiled == []
+
+    conn = sqlite3.connect(":memory:")
+    conn.create_aggregate("MEDIAN", 1, MedianAggregate)
+    conn.create_aggregate("STDDEV_SAMP", 1, StdDevSampAggregate)
+    SAMPLE.to_sql("SAMPLE_TABLE", conn, index=False)
+    values = dict(zip(select_keys, conn.execute(sql).fetchone()))
+    conn.close()
+
+    return {index: evaluate(values, list(SAMPLE.columns)) for index, evaluate in compiled}
+
+
+def is_same(value, other_value):
+    if isinstance(value, float) or isinstance(other_value, float):
+        return value is not None and other_value is not None and math.isclose(value, other_value, rel_tol=1e-9)
+    return value == other_value
+
+
+@pytest.fixture(scope="module")
+def gx_results():
+    """GX's validation results for the expectations, from a validator of the sample's DataFrame."""
+    context = gx.get_context(mode="ephemeral")
+    validator = context.sources.pandas_default.read_dataframe(SAMPLE)
+    return [getattr(validator, expectation_type)(**kwargs) for expectation_type, kwargs in EXPECTATIONS]
+
+
+def test_compiled_results_match_gx(gx_results):
+    expectation_configs = [
+        ExpectationConfiguration(expectation_type=expectation_type, kwargs=kwargs)
+        for expectation_type, kwargs in EXPECTATIONS
+    ]
+    compiled_results = query_compiled_suite(expectation_configs)
+
+    for index, (expectation_type, kwargs) in enumerate(EXPECTATIONS):
+        success, result = compiled_results[index]
+        gx_result = gx_results[index]
+        assert success == gx_result.success, (expectation_type, kwargs)
+        for key, value in result.items():
+            if key in ["partial_unexpected_list", "partial_unexpected_counts"]:
+                continue  # no rows are fetched
+            assert is_same(value, gx_result.result[key]), (expectation_type, kwargs, key)
+
+
+def test_mostly_zero_always_succeeds():
+    config = ExpectationConfiguration(
+        expectation_type="expect_column_values_to_be_in_set", kwargs={"column": "name", "value_set": [], "mostly": 0}
+    )
+    _, _, evaluate = sql_validator.compile_expectation(config, 0)
+
+    assert evaluate({"row_count": 8, "nonnull:name": 7, "unexpected:0": 7}, [])[0]
+
+
+def test_uniqueness_reads_the_sample_once():
+    config = ExpectationConfiguration(expectation_type="expect_column_values_to_be_unique", kwargs={"column": "name"})
+    sql, _, _, _ = sql_validator.compile_suite(
+        ExpectationSuite(expectation_suite_name="test_suite", expectations=[config]),
+        "SELECT * FROM SAMPLE_TABLE LIMIT 5",
+    )
+
+    assert sql.count("FROM sample") == 1
+    assert sql.count("SELECT * FROM SAMPLE_TABLE LIMIT 5") == 1
+
+
+def test_quantiles_compile_to_percentile_disc():
+    config = ExpectationConfiguration(
+        expectation_type="expect_column_quantile_values_to_be_between",
+        kwargs={"column": "amount", "quantile_ranges": {"quantiles": [0.25, 0.5], "value_ranges": [[0, 30], [20, 40]]}},
+    )
+    metrics, _, evaluate = sql_validator.compile_expectation(config, 0)
+
+    assert metrics["quantile:amount:0.5"] == 'PERCENTILE_DISC(0.5) WITHIN GROUP (ORDER BY "AMOUNT")'
+    success, result = evaluate({"quantile:amount:0.25": 20.0, "quantile:amount:0.5": 40.25}, [])
+    assert not success
+    assert result["details"]["success_details"] == [True, False]
+
+
+def test_nothing_compiled_has_no_query():
+    config = ExpectationConfiguration(
+        expectation_type="expect_column_values_to_match_regex", kwargs={"column": "name", "regex": "^[a-z]$"}
+    )
+    sql, select_keys, compiled, not_compiled = sql_validator.compile_suite(
+        ExpectationSuite(expectation_suite_name="test_suite", expectations=[config]), "SELECT * FROM SAMPLE_TABLE"
+    )
+
+    assert sql is None
+    assert compiled == []
+    assert not_compiled == [0]
+
+
+@pytest.mark.parametrize("value", [math.inf, -math.inf, math.nan])
+def test_non_finite_floats_arent_compiled(value):
+    with pytest.raises(sql_validator.NotCompilableError):
+        sql_validator.sql_literal(value)
+
+    configs = [
+        ExpectationConfiguration(
+            expectation_type="expect_column_values_to_be_between",
+            kwargs={"column": "amount", "min_value": 0, "max_value": value},
+        ),
+        ExpectationConfiguration(
+            expectation_type="expect_column_values_to_be_in_set", kwargs={"column": "amount", "value_set": [1.5, value]}
+        ),
+    ]
+    sql, _, compiled, not_compiled = sql_validator.compile_suite(
+        ExpectationSuite(expectation_suite_name="test_suite", expectations=configs), "SELECT * FROM SAMPLE_TABLE"
+    )
+
+    # ... so they're validated by GX instead
+    assert (sql, compiled, not_compiled) == (None, [], [0, 1])
+
+
+@pytest.mark.parametrize("value, literal", [(True, "TRUE"), (3, "3"), (-2.5, "-2.5"), ("it's", "'it''s'")])
+def test_sql_literal(value, literal):
+    assert sql_validator.sql_literal(value) == literal
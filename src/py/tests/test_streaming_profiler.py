@@ -0,0 +1,272 @@
+"""Check the streaming profiler's sketches & accumulators against exact stats, and that merging them (or a table's
+partitions) is order-free."""
+import itertools
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pytest
+import snowflake_client
+import sql_builder
+import streaming_profiler
+
+RNG = np.random.default_rng(0)
+
+VALUES = pd.DataFrame(
+    {
+        "amount": np.where(RNG.random(3000) < 0.1, np.nan, RNG.normal(100, 15, 3000)),
+        "quantity": RNG.integers(0, 500, 3000),
+        "name": pd.Series(RNG.choice(["a", "b", "c", "d", None], 3000, p=[0.5, 0.2, 0.15, 0.1, 0.05])),
+        "empty": pd.Series([None] * 3000, dtype=object),
+    }
+)
+
+
+def hash_values(values):
+    return pd.util.hash_array(np.asarray(values, dtype=np.float64))
+
+
+@pytest.mark.parametrize("distinct_count", [1, 100, 5_000, 200_000])
+def test_hyperloglog_count_is_within_its_error(distinct_count):
+    hyperloglog = streaming_profiler.HyperLogLog()
+    hyperloglog.update(hash_values(np.arange(distinct_count)))
+    hyperloglog.update(hash_values(np.arange(distinct_count)))  # repeated values aren't counted again
+
+    # ~1.6% standard error - three of them, or (for small counts, which are linear counted) 1
+    assert abs(hyperloglog.count() - distinct_count) <= max(1, 0.05 * distinct_count)
+
+
+def test_hyperloglog_merge_is_the_union():
+    parts = [np.arange(0, 60_000), np.arange(40_000, 100_000), np.arange(90_000, 120_000)]
+    merged = streaming_profiler.HyperLogLog()
+    for part in parts:
+        hyperloglog = streaming_profiler.HyperLogLog()
+        hyperloglog.update(hash_values(part))
+        merged.merge(hyperloglog)
+    whole = streaming_profiler.HyperLogLog()
+    whole.update(hash_values(np.concatenate(parts)))
+
+    assert np.array_equal(merged.registers, whole.registers)
+    assert abs(merged.count() - 120_000) <= 0.05 * 120_000
+
+
+def test_empty_hyperloglog_counts_zero():
+    assert streaming_profiler.HyperLogLog().count() == 0
+
+
+def test_tdigest_quantiles_are_close_to_exact():
+    values = RNG.lognormal(0, 1, 50_000)
+    tdigest = streaming_profiler.TDigest()
+    for batch in np.array_split(values, 17):
+        tdigest.update(batch)
+
+    quantiles = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+    for quantile, estimate in zip(quantiles, tdigest.quantiles(quantiles)):
+        # t-digest's error is in rank, and smallest in the tails
+        assert abs(np.mean(values <= estimate) - quantile) < 0.005
+    assert tdigest.quantiles([0, 1]) == [values.min(), values.max()]
+    assert len(tdigest.means) <= streaming_profiler.TDIGEST_COMPRESSION
+
+
+def test_tdigest_merge_order_doesnt_change_the_quantiles():
+    parts = np.array_split(RNG.normal(0, 1, 30_000), 5)
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    estimates = []
+    for order in itertools.permutations(range(len(parts)), 3):
+        merged = streaming_profiler.TDigest()
+        for index in list(order) + [index for index in range(len(parts)) if index not in order]:
+            tdigest = streaming_profiler.TDigest()
+            tdigest.update(parts[index])
+            merged.merge(tdigest)
+        assert merged.weights.sum() == 30_000
+        estimates.append(merged.quantiles(quantiles))
+
+    assert np.ptp(estimates, axis=0).max() < 0.02
+
+
+def test_empty_tdigest_merges_as_a_no_op():
+    tdigest = streaming_profiler.TDigest()
+    tdigest.update(np.array([1.0, 2.0, 3.0]))
+    tdigest.update(np.empty(0))
+    tdigest.merge(streaming_profiler.TDigest())
+
+    assert tdigest.quantiles([0, 0.5, 1]) == [1.0, 2.0, 3.0]
+
+
+def test_top_k_counts_are_exact_within_its_capacity():
+    values = pd.Series(RNG.choice(list("abcdef"), 10_000))
+    top_k = streaming_profiler.TopK(capacity=10)
+    for batch in np.array_split(values, 7):
+        top_k.update(batch.value_counts())
+
+    assert dict(top_k.top(3)) == values.value_counts().iloc[:3].to_dict()
+
+
+def test_top_k_under_counts_by_at_most_its_error_bound():
+    # a few heavy hitters among many rare values
+    values = pd.Series(np.concatenate([np.repeat([1, 2, 3], [3000, 2000, 1000]), RNG.integers(100, 5_000, 4000)]))
+    values = values.sample(frac=1, random_state=0)
+    top_k = streaming_profiler.TopK(capacity=20)
+    for batch in np.array_split(values, 10):
+        top_k.update(batch.value_counts())
+
+    exact_counts = values.value_counts()
+    assert [value for value, _ in top_k.top(3)] == [1, 2, 3]
+    for value, count in top_k.counts.items():
+        assert exact_counts[value] - len(values) / (top_k.capacity + 1) <= count <= exact_counts[value]
+
+
+def test_top_k_merge_is_order_free_within_its_capacity():
+    batches = [pd.Series(list(batch)) for batch in ["aab", "bbc", "c", "ddda"]]
+    counts = []
+    for order in itertools.permutations(batches):
+        merged = streaming_profiler.TopK(capacity=10)
+        for batch in order:
+            top_k = streaming_profiler.TopK(capacity=10)
+            top_k.update(batch.value_counts())
+            merged.merge(top_k)
+        counts.append(merged.counts)
+
+    assert all(count == {"a": 3, "b": 3, "c": 2, "d": 3} for count in counts)
+
+
+def accumulate(column, batches):
+    column_accumulator = streaming_profiler.ColumnAccumulator(column, 100)
+    for batch in batches:
+        column_accumulator.update(batch)
+    return column_accumulator
+
+
+def get_stats(column_accumulator):
+    column_stats = column_accumulator.get_column_stats(len(VALUES), 10)
+    column_stats.pop("quantiles", None)  # the t-digest's centroids depend on the merge order
+    return column_stats
+
+
+@pytest.mark.parametrize("column", VALUES.columns)
+def test_column_accumulator_merge_is_associative_and_order_free(column):
+    batches = np.array_split(VALUES[column], 6)
+    whole = accumulate(column, batches)
+    expected_stats = get_stats(whole)
+
+    partitions = [accumulate(column, batches[:2]), accumulate(column, batches[2:5]), accumulate(column, batches[5:])]
+    for order in itertools.permutations(partitions):
+        # ((a + b) + c)
+        merged = streaming_profiler.ColumnAccumulator(column, 100)
+        for partition in order:
+            merged.merge(partition)
+        # (a + (b + c))
+        right = streaming_profiler.ColumnAccumulator(column, 100)
+        right.merge(order[1])
+        right.merge(order[2])
+        left = streaming_profiler.ColumnAccumulator(column, 100)
+        left.merge(order[0])
+        left.merge(right)
+
+        for column_accumulator in [merged, left]:
+            assert get_stats(column_accumulator) == pytest.approx(expected_stats)
+            assert column_accumulator.m2 == pytest.approx(whole.m2)
+
+
+def test_column_accumulator_stats_match_pandas():
+    stats = {
+        column: accumulate(column, np.array_split(VALUES[column], 6)).get_column_stats(3000, 3) for column in VALUES
+    }
+
+    amount = VALUES["amount"]
+    assert stats["amount"]["type"] == "float"
+    assert stats["amount"]["null_count"] == amount.isna().sum()
+    assert stats["amount"]["distinct_count"] == pytest.approx(amount.nunique(), rel=0.05)
+    assert stats["amount"]["mean"] == pytest.approx(amount.mean())
+    assert stats["amount"]["stdev"] == pytest.approx(amount.std())
+    assert stats["amount"]["quantiles"] == pytest.approx(amount.quantile([0.05, 0.25, 0.5, 0.75, 0.95]), rel=0.02)
+    assert (stats["quantity"]["type"], stats["quantity"]["min"], stats["quantity"]["max"]) == (
+        "int",
+        VALUES["quantity"].min(),
+        VALUES["quantity"].max(),
+    )
+    assert stats["name"]["top_values"] == list(VALUES["name"].value_counts().iloc[:3].items())
+
+
+def test_all_null_and_empty_columns():
+    all_null = accumulate("empty", np.array_split(VALUES["empty"], 3))
+    empty = accumulate("empty", [pd.Series([], dtype=object)])
+
+    assert all_null.get_column_stats(3000, 10) == {
+        "column": "empty",
+        "type": "unknown",
+        "type_name": "unknown",
+        "null_count": 3000,
+        "distinct_count": 0,
+    }
+    assert empty.get_column_stats(0, 10)["null_count"] == 0
+
+    # merging the nulls of a partition with no values (or a partition with no rows) keeps the other's stats
+    amount = accumulate("amount", [VALUES["amount"]])
+    expected_stats = get_stats(amount)
+    amount.merge(empty)
+    amount.merge(accumulate("amount", [pd.Series([None, None], dtype=float)]))
+    assert get_stats(amount) == pytest.approx(dict(expected_stats, null_count=expected_stats["null_count"] + 2))
+
+
+class FakeProcessPool:
+    """Runs each task in this process, when it's submitted."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class FakeConnection:
+    def close(self):
+        pass
+
+
+def test_profile_table_partitioned_merges_the_partitions(monkeypatch):
+    partition_count = 4
+    partition_indexes = {
+        sql_builder.build_partition_predicate(partition_index, partition_count, "quantity"): partition_index
+        for partition_index in range(partition_count)
+    }
+    queried = []
+
+    def snowflake_query_batches(conn, input_tbl, row_count_limit, fetch_mode, sampling, columns, batch_rows, where):
+        # a partition's rows, in batches
+        queried.append((partition_indexes[where], row_count_limit, columns))
+        partition = VALUES[VALUES["quantity"] % partition_count == partition_indexes[where]][columns]
+        yield from np.array_split(partition, 3)
+
+    merged_accumulators = []
+    build_profiling_results = streaming_profiler.TableAccumulator.build_profiling_results
+
+    def record_merged_accumulator(table_accumulator, input_table):
+        merged_accumulators.append(table_accumulator)
+        return build_profiling_results(table_accumulator, input_table)
+
+    monkeypatch.setattr(snowflake_client, "setup_snowflake_connection", FakeConnection)
+    monkeypatch.setattr(snowflake_client, "snowflake_query_batches", snowflake_query_batches)
+    monkeypatch.setattr(streaming_profiler.TableAccumulator, "build_profiling_results", record_merged_accumulator)
+
+    table_params = {"row_count_limit": 3001, "partitions": partition_count, "partition_by": "quantity", "top_k": 10}
+    columns = ["quantity", "amount", "name", "empty"]
+    _, validation_result = streaming_profiler.profile_table_partitioned(
+        FakeProcessPool(), "dim_a", table_params, columns
+    )
+
+    # each partition queries its share of the sample
+    assert queried == [(partition_index, 751, columns) for partition_index in range(partition_count)]
+    # ... and the merged profile is the whole table's
+    whole = streaming_profiler.TableAccumulator()
+    whole.update(VALUES[columns])
+    (merged,) = merged_accumulators
+    assert merged.row_count == len(VALUES)
+    assert list(merged.columns) == columns
+    for column in columns:
+        assert get_stats(merged.columns[column]) == pytest.approx(get_stats(whole.columns[column]))
+    row_count_result = next(
+        result
+        for result in validation_result.results
+        if result.expectation_config.expectation_type == "expect_table_row_count_to_be_between"
+    )
+    assert row_count_result.result["observed_value"] == len(VALUES)
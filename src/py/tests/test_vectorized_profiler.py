@@ -0,0 +1,100 @@
+"""Check the vectorized profiler's stats match BasicDatasetProfiler's, for a sample of mixed dtypes with nulls."""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+import vectorized_profiler
+from benchmarks import bench_vectorized_profiler
+from great_expectations.dataset.pandas_dataset import PandasDataset
+from great_expectations.profile.basic_dataset_profiler import BasicDatasetProfiler
+
+RNG = np.random.default_rng(0)
+ROWS = 200
+
+
+def with_nulls(series, fraction=0.1):
+    return series.mask(RNG.random(len(series)) < fraction)
+
+
+SAMPLE = pd.DataFrame(
+    {
+        "quantity": RNG.integers(0, 120, ROWS),
+        "amount": with_nulls(pd.Series(RNG.integers(0, 150, ROWS) / 4), 0.2),
+        "code": with_nulls(pd.Series(RNG.integers(0, 90, ROWS), dtype="Int64")),
+        "name": with_nulls(pd.Series(RNG.choice(["a", "b", "c"], ROWS), dtype=object)),
+        "created_at": with_nulls(
+            pd.Series(pd.Timestamp("2023-01-01") + pd.to_timedelta(RNG.integers(0, 100, ROWS), "h"))
+        ),
+        "flag": RNG.random(ROWS) < 0.5,
+        "mixed": pd.Series([1, "a"] * (ROWS // 2), dtype=object),
+        "all_null": pd.Series([None] * ROWS, dtype=object),
+        "all_nan": np.full(ROWS, np.nan),
+    }
+)
+
+
+def get_results(validation_result):
+    """Return {(expectation type, column): observed value} of the stats both profilers report - plus the columns' null
+    counts & (low cardinality columns') distinct values."""
+    results = bench_vectorized_profiler.get_observed_values(validation_result)
+    for evr in validation_result.results:
+        expectation_type, column = evr.expectation_config.expectation_type, evr.expectation_config.kwargs.get("column")
+        if expectation_type == "expect_column_values_to_not_be_null":
+            results[(expectation_type, column)] = evr.result["unexpected_count"]
+        elif expectation_type == "expect_column_distinct_values_to_be_in_set":
+            # BasicDatasetProfiler's are sorted - as strings, if they're of mixed types
+            results[(expectation_type, column)] = sorted(str(value) for value in evr.result["observed_value"])
+
+    return results
+
+
+@pytest.fixture(scope="module")
+def profiler_results():
+    logging.getLogger("great_expectations").setLevel(logging.WARNING)  # BasicDatasetProfiler logs a line per column
+    _, basic_result = PandasDataset(SAMPLE).profile(BasicDatasetProfiler)
+    _, vectorized_result = vectorized_profiler.profile_dataframe(SAMPLE, "dim_a")
+    return get_results(basic_result), get_results(vectorized_result)
+
+
+def test_the_profilers_stats_match(profiler_results):
+    basic_results, vectorized_results = profiler_results
+    # BasicDatasetProfiler only reports some stats for some cardinalities - so the stats both report are compared
+    compared_keys = [key for key in basic_results if key in vectorized_results]
+    differing_keys = [
+        key
+        for key in compared_keys
+        if not bench_vectorized_profiler.is_same(vectorized_results[key], basic_results[key])
+    ]
+
+    assert differing_keys == []
+    assert {column for _, column in compared_keys} == {None, *SAMPLE.columns}
+
+
+@pytest.mark.parametrize(
+    "expectation_type, column",
+    [
+        ("expect_column_mean_to_be_between", "quantity"),
+        ("expect_column_quantile_values_to_be_between", "amount"),
+        ("expect_column_stdev_to_be_between", "code"),
+        ("expect_column_max_to_be_between", "created_at"),
+        ("expect_column_distinct_values_to_be_in_set", "mixed"),
+        ("expect_column_values_to_not_be_null", "name"),
+        ("expect_column_values_to_not_be_null", "all_null"),
+        ("expect_column_values_to_not_be_null", "all_nan"),
+        ("expect_column_unique_value_count_to_be_between", "all_null"),
+    ],
+)
+def test_the_stats_of_each_kind_of_column_are_compared(profiler_results, expectation_type, column):
+    basic_results, vectorized_results = profiler_results
+
+    assert (expectation_type, column) in basic_results
+    assert (expectation_type, column) in vectorized_results
+
+
+def test_all_null_columns_have_no_values(profiler_results):
+    _, vectorized_results = profiler_results
+
+    for column in ["all_null", "all_nan"]:
+        assert vectorized_results[("expect_column_values_to_not_be_null", column)] == ROWS
+        assert vectorized_results[("expect_column_unique_value_count_to_be_between", column)] == 0
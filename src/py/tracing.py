@@ -0,0 +1,156 @@
+import contextvars
+import csv
+import io
+import json
+import os
+import resource
+import threading
+import uuid
+from contextlib import contextmanager
+from contextlib import nullcontext
+from datetime import datetime
+from time import perf_counter
+
+import common
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # OpenTelemetry is optional - without it, spans are only recorded in the run report
+    otel_trace = None
+
+# Set up logging
+logger = common.get_logger()
+
+RUN_REPORTS_DIR = "gx/uncommitted/run_reports"
+# the start time - and a random suffix, so runs started in the same second (e.g. by several workers) don't share one
+RUN_ID = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+REPORT_FIELDS = [
+    "run_id",
+    "span",
+    "table",
+    "started_at",
+    "duration_seconds",
+    "nested_seconds",
+    "rows",
+    "bytes",
+    "peak_rss_mb",
+    "error",
+]
+
+_spans = []
+_spans_lock = threading.Lock()
+# a context variable (rather than a thread-local), so asyncio tasks & the threads they hand work to keep their table
+_current_table = contextvars.ContextVar("current_table", default=None)
+# the innermost open span's record - a span opened within it adds its duration to the record's nested_seconds
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def get_peak_rss_mb():
+    """Return this process's peak resident set size, in MB."""
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def current_table(input_table):
+    """Attribute the spans recorded in this thread (or asyncio task) to input_table."""
+    token = _current_table.set(input_table)
+    try:
+        yield
+    finally:
+        _current_table.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a stage (e.g. 'query', 'render') of the current table's run, recording it for the run report.
+
+    The yielded dict's 'rows' and 'bytes' can be set by the caller. The time spent in spans opened within this one
+    (e.g. a 'query' within a 'profile') is recorded as its nested_seconds. If OpenTelemetry is installed, the stage is
+    also recorded as an OpenTelemetry span (a no-op unless an SDK & exporter are configured).
+    """
+    record = {
+        "run_id": RUN_ID,
+        "span": name,
+        "table": _current_table.get(),
+        "started_at": datetime.now().isoformat(timespec="milliseconds"),
+        "nested_seconds": 0.0,
+        "rows": None,
+        "bytes": None,
+        "error": None,
+    }
+    parent_record = _current_span.get()
+    otel_span_context = otel_trace.get_tracer(__name__).start_as_current_span(name) if otel_trace else nullcontext()
+
+    START_TIME = perf_counter()
+    span_token = _current_span.set(record)
+    with otel_span_context as otel_span:
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(span_token)
+            record["duration_seconds"] = round(perf_counter() - START_TIME, 4)
+            record["nested_seconds"] = round(record["nested_seconds"], 4)
+            record["peak_rss_mb"] = round(get_peak_rss_mb(), 1)
+            if otel_span is not None:
+                otel_span.set_attributes(
+                    {
+                        f"gx.{key}": record[key]
+                        for key in ["table", "rows", "bytes", "peak_rss_mb"]
+                        if record[key] is not None
+                    }
+                )
+            with _spans_lock:
+                _spans.append(record)
+                if parent_record is not None:
+                    parent_record["nested_seconds"] += record["duration_seconds"]
+
+
+def take_spans():
+    """Return (and forget) the spans recorded so far - e.g. to hand them from a process pool worker to its parent."""
+    with _spans_lock:
+        spans = list(_spans)
+        _spans.clear()
+    return spans
+
+
+def add_spans(spans):
+    """Add spans recorded in another process to this run."""
+    with _spans_lock:
+        _spans.extend({**record, "run_id": RUN_ID} for record in spans)
+
+
+def write_run_report(reports_dir=RUN_REPORTS_DIR, slowest_n=5):
+    """Write the run's spans to <run id>.json (with per-table totals by stage) and <run id>.csv.
+
+    A stage's total is its spans' own time - without the time spent in the spans nested within them, which are
+    totalled as stages of their own - so no time is counted twice.
+
+    In a gxbulk run, each stage re-writes the report, so it covers every stage run so far.
+    """
+    with _spans_lock:
+        spans = list(_spans)
+
+    table_times = {}  # table -> {span name: total seconds}
+    for record in spans:
+        if record["table"] is not None:
+            span_times = table_times.setdefault(record["table"], {})
+            own_seconds = record["duration_seconds"] - record.get("nested_seconds", 0)
+            span_times[record["span"]] = round(span_times.get(record["span"], 0) + own_seconds, 4)
+
+    report = {"run_id": RUN_ID, "peak_rss_mb": round(get_peak_rss_mb(), 1), "tables": table_times, "spans": spans}
+    common.write_file_atomically(os.path.join(reports_dir, f"{RUN_ID}.json"), json.dumps(report, indent=2, default=str))
+
+    csv_content = io.StringIO()
+    writer = csv.DictWriter(csv_content, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(spans)
+    common.write_file_atomically(os.path.join(reports_dir, f"{RUN_ID}.csv"), csv_content.getvalue())
+
+    logger.info(f"\nRun report written to {os.path.join(reports_dir, RUN_ID)}.json/.csv - slowest tables:")
+    for table in sorted(table_times, key=lambda table: sum(table_times[table].values()), reverse=True)[:slowest_n]:
+        span_times = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in table_times[table].items())
+        logger.info(f"{table}: {sum(table_times[table].values()):.2f} seconds ({span_times})")
@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+import profile_builder
+import streaming_profiler
+
+PROFILER_NAME = "VectorizedProfiler"
+
+# the largest int64 - nulls in a datetime block (NaT, the smallest int64) are replaced with it, so they sort last
+NULL_DATETIME = np.iinfo(np.int64).max
+
+
+def get_column_type(series):
+    """Return the profiler column type (int, float, string, datetime, bool or unknown) of a sample's column - from its
+    dtype, or for object columns, its non-null values' inferred type."""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(series.dtype):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return "datetime"
+    return streaming_profiler.INFERRED_TYPES.get(pd.api.types.infer_dtype(series, skipna=True), "unknown")
+
+
+def group_columns(df):
+    """Group the DataFrame's columns into blocks that are profiled together: {(block kind, column type): [column]}.
+
+    Block kinds: 'int64' (integer columns without nulls), 'float64' (the other numeric columns - nulls are NaN),
+    'bool', 'datetime' (as int64 nanoseconds), 'string' (str objects) and 'object' (anything else, one at a time).
+    """
+    column_groups = {}
+    for column in df.columns:
+        series = df[column]
+        column_type = get_column_type(series)
+        if (
+            column_type == "int"
+            and isinstance(series.dtype, np.dtype)
+            and series.dtype.kind in "iu"
+            and (series.dtype != np.uint64)
+        ):
+            block_kind = "int64"
+        elif column_type in ["int", "float"]:
+            block_kind = "float64"
+        elif column_type == "bool" and series.dtype == np.bool_:
+            block_kind = "bool"
+        elif column_type == "datetime":
+            block_kind = "datetime"
+        elif column_type == "string":
+            block_kind = "string"
+        else:
+            block_kind = "object"
+        column_groups.setdefault((block_kind, column_type), []).append(column)
+
+    return column_groups
+
+
+def get_datetime_block(df, columns):
+    """Return the columns as an int64 block of UTC nanoseconds, with nulls as NULL_DATETIME."""
+    block = np.empty((len(df), len(columns)), dtype=np.int64)
+    for column_index, column in enumerate(columns):
+        series = df[column]
+        if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = pd.to_datetime(series)
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert(None)
+        block[:, column_index] = series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    block[block == np.iinfo(np.int64).min] = NULL_DATETIME
+
+    return block
+
+
+def get_top_values(values, counts, column_indexes, column_count, top_k):
+    """Return each column's top_k (value, count) pairs, most frequent first (ties in the values' order), from the
+    values' counts - the values grouped by column, in column_indexes order."""
+    # sorted by column, then count (descending), then the values' order within each column
+    order = np.lexsort((np.arange(len(counts)), -counts, column_indexes))
+    column_starts = np.searchsorted(column_indexes[order], np.arange(column_count))
+    rank = np.arange(len(order)) - column_starts[column_indexes[order]]
+    top_values = [[] for _ in range(column_count)]
+    for index in order[rank < top_k]:
+        top_values[column_indexes[index]].append((values[index], int(counts[index])))
+
+    return top_values
+
+
+def profile_sorted_block(block, null_counts, top_k):
+    """Profile a 2-D block of columns (numeric, bool or datetime) whose nulls sort last, by sorting it once.
+
+    Returns {stat: a value per column} - null_count, distinct_count, min, max, quantiles & top_values - with min, max
+    & quantiles None for columns without values.
+    """
+    row_count, column_count = block.shape
+    nonnull_counts = row_count - null_counts
+    block = np.sort(block, axis=0)
+    column_positions = np.arange(column_count)
+
+    # each non-null value that differs from the one before it starts a run of equal values
+    run_starts = np.ones(block.shape, dtype=bool)
+    run_starts[1:] = block[1:] != block[:-1]
+    run_starts &= np.arange(row_count)[:, None] < nonnull_counts
+    distinct_counts = run_starts.sum(axis=0)
+
+    # value counts: the runs' lengths - each run ends where the column's next run starts, or its last non-null value
+    run_columns, run_rows = np.nonzero(run_starts.T)
+    is_last_run = np.append(run_columns[1:] != run_columns[:-1], True)
+    run_ends = np.where(is_last_run, nonnull_counts[run_columns], np.append(run_rows[1:], 0))
+    top_values = get_top_values(block[run_rows, run_columns], run_ends - run_rows, run_columns, column_count, top_k)
+
+    # BasicDatasetProfiler's quantiles are pandas' 'nearest' - the sorted value at the rounded (half to even) position
+    last_rows = np.maximum(nonnull_counts - 1, 0)
+    quantile_rows = np.around(np.outer(profile_builder.QUANTILES, last_rows)).astype(np.int64)
+    has_values = nonnull_counts > 0
+    quantiles = block[quantile_rows, column_positions] if row_count else None
+
+    def per_column(values):
+        return [value if column_has_values else None for value, column_has_values in zip(values, has_values)]
+
+    return {
+        "null_count": null_counts,
+        "distinct_count": distinct_counts,
+        "min": per_column(block[0]) if row_count else [None] * column_count,
+        "max": per_column(block[last_rows, column_positions]) if row_count else [None] * column_count,
+        "quantiles": per_column(quantiles.T) if row_count else [None] * column_count,
+        "top_values": top_values,
+    }
+
+
+def profile_factorized(values, column_count, top_k):
+    """Profile a block of hashable object values - raveled column by column - with a single hash pass over all of
+    them. Returns {stat: a value per column}: null_count, distinct_count & top_values."""
+    codes, uniques = pd.factorize(values)
+    row_count = len(values) // column_count if column_count else 0
+    column_indexes = np.repeat(np.arange(column_count), row_count)
+    is_null = codes < 0
+    null_counts = np.bincount(column_indexes[is_null], minlength=column_count)
+
+    # each (column, value code) pair is a distinct value of the column
+    keys, counts = np.unique(column_indexes[~is_null] * len(uniques) + codes[~is_null], return_counts=True)
+    key_columns = keys // max(len(uniques), 1)
+    return {
+        "null_count": null_counts,
+        "distinct_count": np.bincount(key_columns, minlength=column_count),
+        "top_values": get_top_values(
+            np.asarray(uniques, dtype=object)[keys % max(len(uniques), 1)], counts, key_columns, column_count, top_k
+        ),
+    }
+
+
+def profile_object_column(series, top_k):
+    """Profile an object column of mixed (or unhashable) values on its own - as strings, if they can't be hashed."""
+    try:
+        return profile_factorized(series.to_numpy(dtype=object), 1, top_k)
+    except TypeError:
+        return profile_factorized(series.map(str, na_action="ignore").to_numpy(dtype=object), 1, top_k)
+
+
+def profile_block(df, block_kind, columns, top_k):
+    """Profile a group of columns of the same block kind together. Returns {stat: a value per column}."""
+    if block_kind == "int64":
+        block = df[columns].to_numpy(dtype=np.int64)
+        block_stats = profile_sorted_block(block, np.zeros(len(columns), dtype=np.int64), top_k)
+    elif block_kind == "float64":
+        block = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        block_stats = profile_sorted_block(block, np.isnan(block).sum(axis=0), top_k)
+    elif block_kind == "bool":
+        block = df[columns].to_numpy(dtype=np.bool_)
+        block_stats = profile_sorted_block(block, np.zeros(len(columns), dtype=np.int64), top_k)
+    elif block_kind == "datetime":
+        block = get_datetime_block(df, columns)
+        block_stats = profile_sorted_block(block, (block == NULL_DATETIME).sum(axis=0), top_k)
+    elif block_kind == "string":
+        return profile_factorized(df[columns].to_numpy(dtype=object).ravel(order="F"), len(columns), top_k)
+    else:
+        columns_stats = [profile_object_column(df[column], top_k) for column in columns]
+        return {stat: [column_stats[stat][0] for column_stats in columns_stats] for stat in columns_stats[0]}
+
+    if block_kind in ["int64", "float64"]:
+        # NaNs are left out of the sums, and the squared deviations are from each column's own mean
+        nonnull_counts = len(block) - block_stats["null_count"]
+        float_block = block.astype(np.float64, copy=False)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.nansum(float_block, axis=0) / nonnull_counts
+            variances = np.nansum((float_block - means) ** 2, axis=0) / (nonnull_counts - 1)
+        block_stats["mean"] = [float(mean) if count else None for mean, count in zip(means, nonnull_counts)]
+        block_stats["stdev"] = [
+            float(np.sqrt(variance)) if count > 1 else None for variance, count in zip(variances, nonnull_counts)
+        ]
+
+    return block_stats
+
+
+def to_python(value, column_type, tz=None):
+    """Convert a block's value back to the column's Python type - e.g. int64 nanoseconds to a Timestamp."""
+    if value is None:
+        return None
+    if column_type == "datetime":
+        return pd.Timestamp(int(value), tz=tz)
+    if column_type == "int":
+        return int(value)
+    if column_type == "float":
+        return float(value)
+    if column_type == "bool":
+        return bool(value)
+    return value
+
+
+def profile_dataframe(df, input_table, top_k=10):
+    """Profile a sample's DataFrame, returning (expectation suite, validation result) in BasicDatasetProfiler's
+    format.
+
+    The columns are grouped by dtype, and each group is profiled as one block: numeric, bool & datetime blocks are
+    sorted once for every column's null & distinct counts, min/max, quantiles and value counts (plus a mean & stdev
+    pass for numeric ones), and string blocks are factorized with one hash pass. The stats are exact.
+    """
+    columns_stats = {}
+    for (block_kind, column_type), columns in group_columns(df).items():
+        block_stats = profile_block(df, block_kind, columns, top_k)
+        for column_index, column in enumerate(columns):
+            tz = getattr(df[column].dtype, "tz", None)
+            column_stats = {
+                "column": column,
+                "type": column_type,
+                "type_name": str(df[column].dtype),
+                "null_count": int(block_stats["null_count"][column_index]),
+                "distinct_count": int(block_stats["distinct_count"][column_index]),
+                "top_values": [
+                    (to_python(value, column_type, tz), count)
+                    for value, count in block_stats["top_values"][column_index]
+                ],
+            }
+            for stat in ["min", "max"]:
+                if stat in block_stats and column_type in ["int", "float", "datetime"]:
+                    column_stats[stat] = to_python(block_stats[stat][column_index], column_type, tz)
+            if column_type in ["int", "float"] and "mean" in block_stats:
+                column_stats["mean"] = block_stats["mean"][column_index]
+                column_stats["stdev"] = block_stats["stdev"][column_index]
+                column_quantiles = block_stats["quantiles"][column_index]
+                if column_quantiles is not None:
+                    column_stats["quantiles"] = [to_python(value, column_type) for value in column_quantiles]
+            columns_stats[column] = column_stats
+
+    return profile_builder.build_profiling_results(
+        input_table, len(df), [columns_stats[column] for column in df.columns], PROFILER_NAME
+    )